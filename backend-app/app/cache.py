@@ -0,0 +1,130 @@
+"""
+Внутрипроцессный кэш с TTL и вытеснением давно не использованных записей (LRU)
+и счетчики версий для инвалидации по записи.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Общий Redis для нескольких реплик бэкенда: счетчик версий живет в нем,
+# и запись на одной реплике инвалидирует кэши всех остальных
+REDIS_URL = os.getenv('REDIS_URL')
+TICKET_LIST_CACHE_SIZE = int(os.getenv('TICKET_LIST_CACHE_SIZE', 512))
+# Страховка на случай потерянного bump (например, Redis был недоступен)
+TICKET_LIST_CACHE_TTL = float(os.getenv('TICKET_LIST_CACHE_TTL', 60))
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires_at = item
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl: float = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+        return item[0] if item else default
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class VersionCounter:
+    """
+    Версия данных: любая запись делает bump(), а ключи кэша включают текущую версию,
+    так что старые записи просто перестают находиться и со временем вытесняются LRU.
+    С redis_client счетчик общий для всех реплик.
+    """
+    def __init__(self, name: str, redis_client=None):
+        self.key = f"helpdesk:version:{name}"
+        self.redis = redis_client
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Текущая версия; None — общий счетчик недоступен и кэшем пользоваться нельзя"""
+        if self.redis is None:
+            return self._value
+        try:
+            return int(self.redis.get(self.key) or 0)
+        except Exception as e:
+            logger.warning("Version counter %s unavailable: %s", self.key, e)
+            return None
+
+    def bump(self):
+        if self.redis is None:
+            with self._lock:
+                self._value += 1
+            return
+        try:
+            self.redis.incr(self.key)
+        except Exception as e:
+            logger.warning("Could not bump version counter %s: %s", self.key, e)
+
+    # Клиент Redis синхронный: из async-кода к нему ходим через пул потоков,
+    # чтобы медленный или недоступный Redis (до socket_timeout) не останавливал event loop
+    async def aget(self):
+        if self.redis is None:
+            return self._value
+        return await run_in_threadpool(self.get)
+
+    async def abump(self):
+        if self.redis is None:
+            self.bump()
+            return
+        await run_in_threadpool(self.bump)
+
+
+def _redis_client():
+    if not REDIS_URL:
+        return None
+    import redis
+    return redis.Redis.from_url(REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+
+# Кэш готовых JSON-ответов GET /tickets/ и версия, которую сбрасывает любая запись в заявки/отчеты
+tickets_version = VersionCounter("tickets", _redis_client())
+ticket_lists = TTLCache(maxsize=TICKET_LIST_CACHE_SIZE, ttl=TICKET_LIST_CACHE_TTL)
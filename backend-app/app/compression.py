@@ -0,0 +1,99 @@
+"""
+Сжатие ответов (gzip, brotli) по Accept-Encoding клиента.
+
+Сжимаются только готовые ответы целиком (одно тело без more_body) текстовых типов
+от COMPRESS_MIN_BYTES: мелкие ответы от сжатия не выигрывают, а потоковые (SSE-лента,
+выгрузка) отдаются как есть — буферизация сломала бы стриминг, у выгрузки есть свой gzip.
+brotli используется, если модуль установлен, иначе только gzip.
+"""
+import gzip
+import os
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 0 — сжатие выключено
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+# Уровни подобраны под время ответа, а не под максимальное сжатие
+COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 5))
+COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+STREAMING_TYPES = ("text/event-stream",)
+
+
+def choose_encoding(accept_encoding: str):
+    """br или gzip по Accept-Encoding (с учетом q=0), None — клиент сжатие не принимает"""
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    wildcard = accepted.get("*", 0.0)
+    supported = ("br", "gzip") if brotli is not None else ("gzip",)
+    # Больший q выигрывает, при равных — br (max берет первый из равных)
+    encoding = max(supported, key=lambda name: accepted.get(name, wildcard))
+    return encoding if accepted.get(encoding, wildcard) > 0 else None
+
+
+def compress(encoding: str, body: bytes) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL)
+
+
+def _compressible(headers: Headers, size: int) -> bool:
+    if size < COMPRESS_MIN_BYTES or "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "")
+    return content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith(STREAMING_TYPES)
+
+
+class CompressionMiddleware:
+    """ASGI-middleware: заголовки ответа придерживаются до первого куска тела, чтобы решить, сжимать ли"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESS_MIN_BYTES:
+            return await self.app(scope, receive, send)
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+
+        async def send_wrapper(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                return await send(message)
+
+            response_start, start = start, None
+            body = message.get("body", b"")
+            if message.get("more_body", False) or not _compressible(Headers(raw=response_start["headers"]), len(body)):
+                await send(response_start)
+                return await send(message)
+
+            compressed = compress(encoding, body)
+            headers = MutableHeaders(raw=list(response_start["headers"]))
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send({**response_start, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
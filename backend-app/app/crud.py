@@ -1,15 +1,53 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from passlib.context import CryptContext
-from app import models, schemas
+import base64
+import hashlib
+import os
+from collections import Counter
+from datetime import datetime, timezone
+from sqlalchemy.orm import Session, aliased, joinedload
+from sqlalchemy.ext.asyncio import async_session
+from pydantic import ValidationError
+from sqlalchemy import desc, and_, or_, func, case, select, update, delete, insert, text, true, literal, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from app import events, hashing, models, schemas, search
+from app.cache import tickets_version
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Вести таблицу ticket_counters: шапка дашборда читает готовые числа вместо GROUP BY по всей таблице
+STATS_COUNTERS = os.getenv("STATS_COUNTERS", "false").lower() == "true"
+
+# Флаг в Session.info: данные заявок изменились, версию списков сбросит crud_async после run_sync
+TICKETS_CHANGED = "tickets_changed"
+
+def _tickets_changed(db: Session):
+    """
+    Сбрасывает версию кэша списков после записи. Внутри AsyncSession.run_sync этот код
+    выполняется в event loop, и синхронный запрос к Redis его бы заблокировал —
+    там только ставим флаг, а bump делает crud_async уже после run_sync
+    """
+    if async_session(db) is not None:
+        db.info[TICKETS_CHANGED] = True
+    else:
+        tickets_version.bump()
 
 def get_user_by_username(db: Session, username: str):
     return db.query(models.User).filter(models.User.username == username).first()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = pwd_context.hash(user.password)
+def get_user(db: Session, user_id: int):
+    return db.query(models.User).filter(models.User.id == user_id).first()
+
+# Пользователи, которые TicketResponse сериализует вложенными объектами.
+# Грузим их тем же SELECT через JOIN, иначе каждая заявка в списке дает до трех ленивых запросов
+TICKET_USERS = (
+    joinedload(models.Ticket.creator),
+    joinedload(models.Ticket.assignee),
+    joinedload(models.Ticket.last_editor),
+)
+
+def hash_password(password: str):
+    return hashing.hash_password(password)
+
+def create_user(db: Session, user: schemas.UserCreate, password_hash: str = None):
+    # Хэш можно посчитать заранее вне сессии (bcrypt не должен занимать event loop)
+    hashed_password = password_hash or hash_password(user.password)
     # ИЗМЕНЕНО: Добавлена поддержка поля is_staff при создании пользователя
     db_user = models.User(
         username=user.username, 
@@ -23,78 +61,727 @@ def create_user(db: Session, user: schemas.UserCreate):
     return db_user
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing.verify_password(plain_password, hashed_password)
+
+def set_password_hash(db: Session, user_id: int, password_hash: str):
+    """Сохраняет пересчитанный хэш (при входе, если сменилась стоимость bcrypt)"""
+    db.query(models.User).filter(models.User.id == user_id).update(
+        {models.User.password_hash: password_hash}, synchronize_session=False
+    )
+    db.commit()
 
 def create_ticket(db: Session, ticket: schemas.TicketCreate):
     db_ticket = models.Ticket(**ticket.model_dump())
     db.add(db_ticket)
+    db.flush()
+    if STATS_COUNTERS:
+        apply_counters(db, counter_delta(db_ticket.status, db_ticket.assignee_id, created=_today()))
+    events.publish(db, [{"type": events.TICKET_CREATED, "ticket": events.ticket_payload(db_ticket)}])
     db.commit()
-    db.refresh(db_ticket)
-    return db_ticket
+    _tickets_changed(db)
+    return reload_ticket(db, db_ticket.id)
 
-# ИЗМЕНЕНО: Логика получения заявок теперь учитывает is_staff
-def get_tickets(db: Session, user_id: int = None, is_admin: bool = False, is_staff: bool = False):
-    query = db.query(models.Ticket)
+def encode_cursor(ticket: models.Ticket) -> str:
+    """Курсор страницы — позиция последней заявки в порядке (created_at, id)"""
+    raw = f"{ticket.created_at.isoformat()}|{ticket.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str):
+    """Обратная операция к encode_cursor. Бросает ValueError на мусорный курсор"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, ticket_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(ticket_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+def visible_to(model, user_id: int = None, is_admin: bool = False, is_staff: bool = False):
+    """
+    Условие "пользователь видит заявку" для Ticket и TicketArchive: админы и сотрудники видят все,
+    остальные — только свои и назначенные на них
+    """
+    if is_admin or is_staff:
+        return true()
+    return (model.creator_id == user_id) | (model.assignee_id == user_id)
+
+def filter_tickets(query, user_id: int = None, is_admin: bool = False, is_staff: bool = False,
+                   status: str = None, assignee_id: int = None, creator_id: int = None,
+                   created_from: datetime = None, created_to: datetime = None, model=models.Ticket):
+    # model — Ticket или TicketArchive: у архива те же колонки
     # Если не админ и не сотрудник — показываем только свои заявки
     if not (is_admin or is_staff):
-        query = query.filter((models.Ticket.creator_id == user_id) | (models.Ticket.assignee_id == user_id))
-    return query.order_by(desc(models.Ticket.created_at)).all()
+        query = query.filter(visible_to(model, user_id))
+    if status:
+        query = query.filter(model.status == status)
+    if assignee_id is not None:
+        query = query.filter(model.assignee_id == assignee_id)
+    if creator_id is not None:
+        query = query.filter(model.creator_id == creator_id)
+    if created_from:
+        query = query.filter(model.created_at >= created_from)
+    if created_to:
+        query = query.filter(model.created_at < created_to)
+    return query
+
+def _ticket_list_select():
+    """
+    Списки заявок — плоскими строками: колонки заявки и трех пользователей через LEFT JOIN,
+    без ORM-объектов (их сборка и валидация TicketResponse дороже самого запроса).
+    Строки превращает в JSON app/serialization.py
+    """
+    T = models.Ticket
+    columns = [T.id, T.title, T.description, T.status, T.creator_id, T.assignee_id, T.last_editor_id,
+               T.created_at, T.updated_at, T.version]
+    joins = []
+    for role, fk in (("creator", T.creator_id), ("assignee", T.assignee_id), ("last_editor", T.last_editor_id)):
+        user = aliased(models.User, name=role)
+        columns += [user.id.label(f"{role}_user_id"), user.username.label(f"{role}_username"),
+                    user.is_admin.label(f"{role}_is_admin"), user.is_staff.label(f"{role}_is_staff")]
+        joins.append((user, user.id == fk))
+    query = select(*columns).select_from(T)
+    for user, on in joins:
+        query = query.outerjoin(user, on)
+    return query
+
+# ИЗМЕНЕНО: Логика получения заявок теперь учитывает is_staff
+# и отдает данные страницами (keyset по (created_at, id)) вместо всей таблицы.
+# Возвращает строки _ticket_list_select, а не ORM-объекты
+def get_tickets(db: Session, user_id: int = None, is_admin: bool = False, is_staff: bool = False,
+                status: str = None, assignee_id: int = None, creator_id: int = None,
+                created_from: datetime = None, created_to: datetime = None,
+                cursor: str = None, limit: int = 50):
+    query = filter_tickets(
+        _ticket_list_select(), user_id=user_id, is_admin=is_admin, is_staff=is_staff,
+        status=status, assignee_id=assignee_id, creator_id=creator_id,
+        created_from=created_from, created_to=created_to,
+    )
+    if cursor:
+        last_created_at, last_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            models.Ticket.created_at < last_created_at,
+            and_(models.Ticket.created_at == last_created_at, models.Ticket.id < last_id),
+        ))
+    # Берем на одну строку больше, чтобы понять, есть ли следующая страница
+    # Через соединение, а не Session.execute: строкам не нужна ORM-обработка результата
+    rows = db.connection().execute(
+        query.order_by(desc(models.Ticket.created_at), desc(models.Ticket.id)).limit(limit + 1)
+    ).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def search_tickets(db: Session, q: str, user_id: int = None, is_admin: bool = False, is_staff: bool = False,
+                   limit: int = 20, offset: int = 0):
+    """Полнотекстовый поиск (см. app/search.py): заявки по убыванию релевантности и offset следующей страницы"""
+    ranked = search.ranked_ticket_ids(db, q, user_id=user_id, privileged=is_admin or is_staff,
+                                      limit=limit + 1, offset=offset)
+    next_offset = offset + limit if len(ranked) > limit else None
+    ids = [ticket_id for ticket_id, _ in ranked[:limit]]
+    if not ids:
+        return [], None
+    tickets = db.connection().execute(_ticket_list_select().where(models.Ticket.id.in_(ids))).all()
+    by_id = {t.id: t for t in tickets}
+    return [by_id[i] for i in ids if i in by_id], next_offset
 
 # НОВАЯ ФУНКЦИЯ: Получить все заявки (для совместимости с роутером)
 def get_all_tickets(db: Session):
-    return db.query(models.Ticket).order_by(desc(models.Ticket.created_at)).all()
+    return db.query(models.Ticket).options(*TICKET_USERS).order_by(desc(models.Ticket.created_at)).all()
+
+def get_ticket(db: Session, ticket_id: int, user_id: int = None, is_admin: bool = False, is_staff: bool = False):
+    return (
+        db.query(models.Ticket)
+        .options(*TICKET_USERS)
+        .filter(models.Ticket.id == ticket_id, visible_to(models.Ticket, user_id, is_admin, is_staff))
+        .first()
+    )
 
-def get_ticket(db: Session, ticket_id: int):
-    return db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
+def reload_ticket(db: Session, ticket_id: int):
+    """
+    Перечитывает заявку после commit вместе с пользователями.
+    Ответ сериализуется уже вне сессии (в async-режиме ленивые загрузки там запрещены),
+    поэтому все, что нужно TicketResponse, должно быть загружено здесь.
+    """
+    return (
+        db.query(models.Ticket)
+        .options(*TICKET_USERS)
+        .populate_existing()
+        .filter(models.Ticket.id == ticket_id)
+        .first()
+    )
 
 # НОВАЯ ФУНКЦИЯ: Редактирование (заменяет логику удаления)
-def update_ticket(db: Session, ticket_id: int, ticket_update: schemas.TicketUpdate, user_id: int, is_staff: bool, is_admin: bool):
-    db_ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
-    if not db_ticket:
-        return None
+class TicketVersionConflict(Exception):
+    """Заявку успели изменить: версия в запросе не совпала с версией в базе"""
 
-    # Фиксируем, кто последний редактировал заявку
-    db_ticket.last_editor_id = user_id
+def update_ticket(db: Session, ticket_id: int, ticket_update: schemas.TicketUpdate, user_id: int, is_staff: bool, is_admin: bool):
+    """
+    Правка заявки одним условным UPDATE ... RETURNING: правила ролей выражены в самом SQL,
+    поэтому строку не нужно предварительно читать. Если передана ticket_update.version,
+    UPDATE проходит только при совпадении версии, иначе — TicketVersionConflict.
+    Возвращает снимок TicketResponse или None, если заявки нет или пользователь ее не видит.
+    """
+    T = models.Ticket
+    # Фиксируем, кто последний редактировал заявку; любая правка увеличивает версию
+    values = {T.last_editor_id: user_id, T.version: T.version + 1}
 
     # Логика для сотрудников и админов
     if is_staff or is_admin:
         if ticket_update.status:
-            db_ticket.status = ticket_update.status
+            values[T.status] = ticket_update.status
             # Если сотрудник меняет статус на "in_progress", назначаем его исполнителем автоматически
-            if ticket_update.status == "in_progress" and db_ticket.assignee_id is None:
-                db_ticket.assignee_id = user_id
-    
+            if ticket_update.status == "in_progress":
+                values[T.assignee_id] = func.coalesce(T.assignee_id, user_id)
+
     # Логика для автора (может править текст, пока не закрыто)
-    elif db_ticket.creator_id == user_id:
-        if db_ticket.status != "closed":
-            if ticket_update.title:
-                db_ticket.title = ticket_update.title
-            if ticket_update.description:
-                db_ticket.description = ticket_update.description
+    else:
+        editable = and_(T.creator_id == user_id, T.status != "closed")
+        if ticket_update.title:
+            values[T.title] = case((editable, ticket_update.title), else_=T.title)
+        if ticket_update.description:
+            values[T.description] = case((editable, ticket_update.description), else_=T.description)
 
+    # Счетчики зависят только от статуса и исполнителя, а их меняет лишь сотрудник
+    counted = STATS_COUNTERS and (is_staff or is_admin) and ticket_update.status
+    old = lock_counted(db, [ticket_id]) if counted else {}
+
+    visible = visible_to(T, user_id, is_admin, is_staff)
+    # Чужую заявку UPDATE не трогает вовсе: иначе он поднял бы ей версию и last_editor
+    stmt = update(T).where(T.id == ticket_id, visible)
+    if ticket_update.version is not None:
+        stmt = stmt.where(T.version == ticket_update.version)
+    stmt = stmt.values(values).returning(T).execution_options(synchronize_session=False)
+    db_ticket = db.execute(stmt).scalars().first()
+
+    if db_ticket is None:
+        db.rollback()
+        if ticket_update.version is not None and db.query(T.id).filter(T.id == ticket_id, visible).first():
+            raise TicketVersionConflict(f"Ticket {ticket_id} was modified, expected version {ticket_update.version}")
+        return None
+
+    if counted:
+        apply_counters(db, sum_counters([counter_delta(*old[ticket_id], sign=-1),
+                                         counter_delta(db_ticket.status, db_ticket.assignee_id)]))
+    # Снимок делаем до commit, пока объекты не истекли
+    snapshot, = snapshot_tickets(db, [db_ticket])
+    events.publish(db, [{"type": events.TICKET_UPDATED, "ticket": events.ticket_payload(snapshot)}])
+    db.commit()
+    _tickets_changed(db)
+    return snapshot
+
+def snapshot_tickets(db: Session, tickets):
+    """
+    TicketResponse для заявок, полученных через UPDATE ... RETURNING.
+    Пользователи грузятся одним запросом в identity map, и связи берутся оттуда без SQL
+    (identity map держит объекты по слабым ссылкам, поэтому список users нужен до снимка)
+    """
+    user_ids = {uid for t in tickets for uid in (t.creator_id, t.assignee_id, t.last_editor_id)} - {None}
+    users = db.query(models.User).filter(models.User.id.in_(user_ids)).all() if user_ids else []
+    snapshots = [schemas.TicketResponse.model_validate(t) for t in tickets]
+    del users
+    return snapshots
+
+def claim_tickets(db: Session, user_id: int, limit: int = 1):
+    """
+    Сотрудник забирает самые старые свободные заявки (status=new, без исполнителя).
+    Один UPDATE: подзапрос выбирает кандидатов с FOR UPDATE SKIP LOCKED, так что параллельные
+    сотрудники не ждут друг друга и получают разные заявки. Условие повторяется во внешнем
+    WHERE — на SQLite (где FOR UPDATE не поддерживается) заявку тоже нельзя забрать дважды
+    """
+    T = models.Ticket
+    free = and_(T.status == "new", T.assignee_id.is_(None))
+    candidates = (
+        select(T.id).where(free)
+        .order_by(T.created_at, T.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        update(T)
+        .where(T.id.in_(candidates), free)
+        .values({T.assignee_id: user_id, T.status: "in_progress", T.last_editor_id: user_id,
+                 T.version: T.version + 1})
+        .returning(T)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = sorted(db.execute(stmt).scalars().all(), key=lambda t: (t.created_at, t.id))
+    if STATS_COUNTERS and claimed:
+        # До UPDATE все они были свободными: status=new без исполнителя
+        apply_counters(db, Counter({"status:new": -len(claimed), "assignee:none": -len(claimed),
+                                    "status:in_progress": len(claimed), f"assignee:{user_id}": len(claimed)}))
+    snapshots = snapshot_tickets(db, claimed)
+    events.publish(db, [{"type": events.TICKET_UPDATED, "ticket": events.ticket_payload(t)} for t in snapshots])
+    db.commit()
+    if claimed:
+        _tickets_changed(db)
+    return snapshots
+
+# --- Массовые операции: одна транзакция, set-based SQL, результат по каждой позиции ---
+
+# Что возвращают массовые UPDATE/DELETE: хватает и для счетчиков, и для событий ленты
+EVENT_COLUMNS = (models.Ticket.id, models.Ticket.title, models.Ticket.status, models.Ticket.creator_id,
+                 models.Ticket.assignee_id, models.Ticket.version)
+
+def _publish_rows(db: Session, kind: str, rows):
+    """События по строкам RETURNING; имена пользователей — одним запросом"""
+    user_ids = {uid for row in rows for uid in (row.creator_id, row.assignee_id)} - {None}
+    names = dict(db.execute(select(models.User.id, models.User.username).where(models.User.id.in_(user_ids))).all()) if user_ids else {}
+    events.publish(db, [{"type": kind, "ticket": events.ticket_payload(row, names)} for row in rows])
+
+IMPORT_BATCH_SIZE = 1000
+
+def _bulk_result(ids, done_ids, error="Ticket not found"):
+    results = [
+        schemas.BulkItemResult(index=i, id=ticket_id, ok=ticket_id in done_ids,
+                               error=None if ticket_id in done_ids else error)
+        for i, ticket_id in enumerate(ids)
+    ]
+    succeeded = sum(r.ok for r in results)
+    return schemas.BulkResult(succeeded=succeeded, failed=len(results) - succeeded, results=results)
+
+def bulk_update_status(db: Session, ids, status: str, user_id: int):
+    T = models.Ticket
+    values = {T.status: status, T.last_editor_id: user_id, T.version: T.version + 1}
+    # Как и при одиночной правке: "in_progress" назначает сотрудника на заявки без исполнителя
+    if status == "in_progress":
+        values[T.assignee_id] = func.coalesce(T.assignee_id, user_id)
+    old = lock_counted(db, ids) if STATS_COUNTERS else {}
+    stmt = (
+        update(T).where(T.id.in_(ids)).values(values)
+        .returning(*EVENT_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    rows = db.execute(stmt).all()
+    done_ids = {row.id for row in rows}
+    if STATS_COUNTERS:
+        apply_counters(db, _changed_counters(old, rows))
+    _publish_rows(db, events.TICKET_UPDATED, rows)
+    db.commit()
+    _tickets_changed(db)
+    return _bulk_result(ids, done_ids)
+
+def bulk_assign(db: Session, ids, assignee_id, user_id: int):
+    if assignee_id is not None and not db.query(models.User.id).filter(models.User.id == assignee_id).first():
+        return _bulk_result(ids, set(), error="Assignee not found")
+    T = models.Ticket
+    stmt = (
+        update(T).where(T.id.in_(ids))
+        .values({T.assignee_id: assignee_id, T.last_editor_id: user_id, T.version: T.version + 1})
+        .returning(*EVENT_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    old = lock_counted(db, ids) if STATS_COUNTERS else {}
+    rows = db.execute(stmt).all()
+    done_ids = {row.id for row in rows}
+    if STATS_COUNTERS:
+        apply_counters(db, _changed_counters(old, rows))
+    _publish_rows(db, events.TICKET_UPDATED, rows)
+    db.commit()
+    _tickets_changed(db)
+    return _bulk_result(ids, done_ids)
+
+def bulk_delete(db: Session, ids):
+    # Bulk DELETE не проходит через ORM-каскад, поэтому отчеты удаляем явно
+    db.execute(delete(models.Report).where(models.Report.ticket_id.in_(ids)).execution_options(synchronize_session=False))
+    T = models.Ticket
+    stmt = (
+        delete(T).where(T.id.in_(ids))
+        .returning(*EVENT_COLUMNS, T.created_at)
+        .execution_options(synchronize_session=False)
+    )
+    rows = db.execute(stmt).all()
+    done_ids = {row.id for row in rows}
+    if STATS_COUNTERS:
+        apply_counters(db, sum_counters(counter_delta(r.status, r.assignee_id, created=_day(r.created_at), sign=-1)
+                                        for r in rows))
+    _publish_rows(db, events.TICKET_DELETED, rows)
     db.commit()
-    db.refresh(db_ticket)
-    return db_ticket
+    _tickets_changed(db)
+    return _bulk_result(ids, done_ids)
+
+def bulk_import(db: Session, rows, user_id: int):
+    """
+    Импорт заявок из списка словарей (JSON или строки CSV). Некорректные строки попадают
+    в результат с ошибкой, корректные вставляются пачками по IMPORT_BATCH_SIZE через executemany
+    в одной транзакции
+    """
+    results = []
+    valid = []
+    for i, row in enumerate(rows):
+        try:
+            item = schemas.TicketImport.model_validate(row)
+        except ValidationError as e:
+            results.append(schemas.BulkItemResult(index=i, ok=False, error=e.errors()[0]["msg"]))
+            continue
+        valid.append((i, {
+            "title": item.title,
+            "description": item.description,
+            "creator_id": item.creator_id or user_id,
+            "assignee_id": item.assignee_id,
+            "status": item.status,
+        }))
+
+    user_ids = {r["creator_id"] for _, r in valid} | {r["assignee_id"] for _, r in valid if r["assignee_id"]}
+    known = set(db.execute(select(models.User.id).where(models.User.id.in_(user_ids))).scalars()) if user_ids else set()
+    insertable = []
+    for i, row in valid:
+        if row["creator_id"] not in known or (row["assignee_id"] and row["assignee_id"] not in known):
+            results.append(schemas.BulkItemResult(index=i, ok=False, error="User not found"))
+        else:
+            insertable.append((i, row))
+
+    stmt = insert(models.Ticket).returning(models.Ticket.id, sort_by_parameter_order=True)
+    for start in range(0, len(insertable), IMPORT_BATCH_SIZE):
+        batch = insertable[start:start + IMPORT_BATCH_SIZE]
+        new_ids = db.execute(stmt, [row for _, row in batch]).scalars().all()
+        results.extend(schemas.BulkItemResult(index=i, id=new_id, ok=True) for (i, _), new_id in zip(batch, new_ids))
+    if STATS_COUNTERS and insertable:
+        today = _today()
+        apply_counters(db, sum_counters(counter_delta(row["status"], row["assignee_id"], created=today)
+                                        for _, row in insertable))
+    # Одно событие на весь импорт вместо тысяч строк в ленте
+    if insertable:
+        events.publish(db, [{"type": events.TICKETS_IMPORTED, "count": len(insertable)}])
+    db.commit()
+    if insertable:
+        _tickets_changed(db)
+
+    results.sort(key=lambda r: r.index)
+    succeeded = sum(r.ok for r in results)
+    return schemas.BulkResult(succeeded=succeeded, failed=len(results) - succeeded, results=results)
 
 # ИЗМЕНЕНО: Простое удаление для админа (без проверки на "последнюю заявку")
 def delete_ticket_force(db: Session, ticket_id: int):
     db_ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
     if db_ticket:
+        if STATS_COUNTERS:
+            apply_counters(db, counter_delta(db_ticket.status, db_ticket.assignee_id,
+                                             created=_day(db_ticket.created_at), sign=-1))
+        events.publish(db, [{"type": events.TICKET_DELETED, "ticket": events.ticket_payload(db_ticket)}])
         db.delete(db_ticket)
         db.commit()
+        _tickets_changed(db)
         return True
     return False
 
-def create_report(db: Session, ticket_id: int, comment: str, file_path: str = None):
-    db_report = models.Report(ticket_id=ticket_id, comment=comment, file_path=file_path)
+# --- Статистика для шапки дашборда ---
+
+def _day(value: datetime) -> str:
+    # Postgres отдает timestamptz в часовом поясе сессии, SQLite — наивное UTC-время
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date().isoformat()
+
+def _today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+def counter_delta(status: str, assignee_id: int = None, created: str = None, sign: int = 1) -> Counter:
+    """Вклад одной заявки в ticket_counters (sign=-1 — вычесть)"""
+    delta = Counter({f"status:{status}": sign})
+    if status != "closed":
+        delta[f"assignee:{assignee_id or 'none'}"] += sign
+    if created:
+        delta[f"created:{created}"] += sign
+    return delta
+
+def sum_counters(deltas) -> Counter:
+    # Не через "+": сложение Counter отбрасывает отрицательные значения
+    total = Counter()
+    for delta in deltas:
+        total.update(delta)
+    return total
+
+def _changed_counters(old, rows) -> Counter:
+    return sum_counters(
+        delta for row in rows
+        for delta in (counter_delta(*old[row.id], sign=-1), counter_delta(row.status, row.assignee_id))
+    )
+
+def lock_counted(db: Session, ids):
+    """
+    Статус и исполнитель заявок до правки, строки блокируются до конца транзакции
+    (FOR UPDATE), чтобы параллельная правка не исказила разницу для счетчиков
+    """
+    T = models.Ticket
+    rows = db.execute(select(T.id, T.status, T.assignee_id).where(T.id.in_(ids)).with_for_update())
+    return {row.id: (row.status, row.assignee_id) for row in rows}
+
+def apply_counters(db: Session, delta: Counter):
+    """
+    Прибавляет delta к ticket_counters одним INSERT ... ON CONFLICT DO UPDATE в текущей транзакции.
+    Ключи идут в одном порядке, поэтому параллельные транзакции не блокируют друг друга крест-накрест
+    """
+    rows = [{"key": key, "value": value} for key, value in sorted(delta.items()) if value]
+    if not rows:
+        return
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(models.TicketCounter)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.TicketCounter.key],
+        set_={"value": models.TicketCounter.value + stmt.excluded.value},
+    )
+    db.execute(stmt, rows)
+
+def rebuild_counters(db: Session):
+    """Пересчитывает ticket_counters с нуля (после включения STATS_COUNTERS или для сверки)"""
+    T = models.Ticket
+    if db.get_bind().dialect.name == "postgresql":
+        # Запись в tickets ждет окончания пересчета, иначе ее вклад потеряется
+        db.execute(text("LOCK TABLE tickets IN SHARE MODE"))
+    delta = Counter()
+    for status, count in db.execute(select(T.status, func.count()).group_by(T.status)):
+        delta[f"status:{status}"] += count
+    open_rows = select(T.assignee_id, func.count()).where(T.status != "closed").group_by(T.assignee_id)
+    for assignee_id, count in db.execute(open_rows):
+        delta[f"assignee:{assignee_id or 'none'}"] += count
+    for day, count in db.execute(select(func.date(T.created_at), func.count()).group_by(func.date(T.created_at))):
+        delta[f"created:{day}"] += count
+    db.execute(delete(models.TicketCounter))
+    apply_counters(db, delta)
+    db.commit()
+
+def counters_empty(db: Session) -> bool:
+    return db.query(models.TicketCounter.key).first() is None
+
+def get_ticket_stats(db: Session, user_id: int = None, is_admin: bool = False, is_staff: bool = False):
+    """
+    Заявки по статусам, открытые по исполнителям и созданные сегодня (UTC).
+    Сотрудникам при STATS_COUNTERS — из ticket_counters (размер не зависит от числа заявок),
+    иначе GROUP BY в базе; обычный пользователь видит статистику только по своим заявкам
+    """
+    T = models.Ticket
+    today = _today()
+    if STATS_COUNTERS and (is_admin or is_staff):
+        counters = dict(db.execute(select(models.TicketCounter.key, models.TicketCounter.value)).all())
+        by_status = {k.split(":", 1)[1]: v for k, v in counters.items() if k.startswith("status:") and v}
+        by_assignee = {k.split(":", 1)[1]: v for k, v in counters.items() if k.startswith("assignee:") and v}
+        by_assignee = {None if k == "none" else int(k): v for k, v in by_assignee.items()}
+        created_today = counters.get(f"created:{today}", 0)
+        source = "counters"
+    else:
+        scoped = lambda query: filter_tickets(query, user_id=user_id, is_admin=is_admin, is_staff=is_staff)
+        by_status = dict(db.execute(scoped(select(T.status, func.count())).group_by(T.status)).all())
+        by_assignee = dict(db.execute(
+            scoped(select(T.assignee_id, func.count())).where(T.status != "closed").group_by(T.assignee_id)
+        ).all())
+        start = datetime.fromisoformat(today).replace(tzinfo=timezone.utc)
+        created_today = db.execute(scoped(select(func.count()).select_from(T)).where(T.created_at >= start)).scalar()
+        source = "query"
+
+    user_ids = [uid for uid in by_assignee if uid is not None]
+    names = dict(db.execute(select(models.User.id, models.User.username).where(models.User.id.in_(user_ids))).all()) if user_ids else {}
+    load = [
+        schemas.AssigneeLoad(assignee_id=uid, username=names.get(uid), open=count)
+        for uid, count in sorted(by_assignee.items(), key=lambda item: -item[1])
+    ]
+    return schemas.TicketStats(total=sum(by_status.values()), by_status=by_status, by_assignee=load,
+                               created_today=created_today, source=source)
+
+def create_report(db: Session, ticket_id: int, comment: str, file_path: str = None, attachment_state: str = None,
+                  file_name: str = None, file_size: int = None, content_type: str = None, content_hash: str = None):
+    """
+    Отчет к рабочей заявке. None — заявки в tickets нет (удалена или уже в архиве).
+    Строка заявки берется FOR SHARE: перенос в архив ее пропустит (SKIP LOCKED), пока отчет не записан
+    """
+    ticket = db.execute(select(*EVENT_COLUMNS).where(models.Ticket.id == ticket_id).with_for_update(read=True)).first()
+    if ticket is None:
+        db.rollback()
+        return None
+    db_report = models.Report(ticket_id=ticket_id, comment=comment, file_path=file_path,
+                              attachment_state=attachment_state, file_name=file_name, file_size=file_size,
+                              content_type=content_type, content_hash=content_hash)
     db.add(db_report)
+    db.flush()
+    events.publish(db, [{"type": events.REPORT_CREATED, "ticket": events.ticket_payload(ticket),
+                         "report_id": db_report.id}])
     db.commit()
+    _tickets_changed(db)
+    db.refresh(db_report)
     return db_report
 
+def blob_is_stored(db: Session, content_hash: str) -> bool:
+    """Файл с таким хэшем уже загружен для какого-то отчета — повторно грузить не нужно"""
+    return db.query(
+        db.query(models.Report.id)
+        .filter(models.Report.content_hash == content_hash,
+                models.Report.attachment_state == models.ATTACHMENT_DONE)
+        .exists()
+    ).scalar()
+
+def set_attachment_state(db: Session, report_id: int, state: str):
+    db.query(models.Report).filter(models.Report.id == report_id).update(
+        {models.Report.attachment_state: state}, synchronize_session=False
+    )
+    db.commit()
+
+def get_stalled_uploads(db: Session, stale_before: datetime):
+    """
+    Отчеты с незавершенной загрузкой вложения (см. uploads.UploadQueue.recover):
+    id, ключ и тип файла, stale — отчет создан раньше stale_before
+    """
+    R = models.Report
+    return db.execute(
+        select(R.id, R.file_path, R.content_type, (R.created_at < stale_before).label("stale"))
+        .where(R.attachment_state.in_(UPLOADS_IN_FLIGHT))
+        .order_by(R.id)
+    ).all()
+
+def fail_uploads(db: Session, report_ids):
+    """Помечает потерянные загрузки failed, если за это время их не дописал воркер"""
+    db.execute(
+        update(models.Report)
+        .where(models.Report.id.in_(report_ids), models.Report.attachment_state.in_(UPLOADS_IN_FLIGHT))
+        .values(attachment_state=models.ATTACHMENT_FAILED)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+def get_ticket_etag(db: Session, ticket_id: int, user_id: int = None, is_admin: bool = False,
+                    is_staff: bool = False):
+    """
+    Сильный ETag страницы заявки одним агрегирующим запросом, без загрузки самих данных.
+    Меняется при правке заявки (version), новом отчете и смене статуса загрузки вложений.
+    None — заявки нет или пользователь ее не видит
+    """
+    done = func.sum(case((models.Report.attachment_state == models.ATTACHMENT_DONE, 1), else_=0))
+    failed = func.sum(case((models.Report.attachment_state == models.ATTACHMENT_FAILED, 1), else_=0))
+    row = (
+        db.query(models.Ticket.id, models.Ticket.version, models.Ticket.created_at, models.Ticket.updated_at,
+                 func.count(models.Report.id), func.max(models.Report.id), done, failed)
+        .outerjoin(models.Report, models.Report.ticket_id == models.Ticket.id)
+        .filter(models.Ticket.id == ticket_id, visible_to(models.Ticket, user_id, is_admin, is_staff))
+        .group_by(models.Ticket.id, models.Ticket.version, models.Ticket.created_at, models.Ticket.updated_at)
+        .first()
+    )
+    if row is None:
+        # Архивная заявка не меняется — ее версия это момент переноса
+        A = models.TicketArchive
+        row = db.execute(select(A.id, A.archived_at)
+                         .where(A.id == ticket_id, visible_to(A, user_id, is_admin, is_staff))).first()
+    if row is None:
+        return None
+    return '"%s"' % hashlib.sha256(repr(tuple(row)).encode()).hexdigest()[:32]
+
+def get_ticket_view(db: Session, ticket_id: int, user_id: int = None, is_admin: bool = False,
+                    is_staff: bool = False):
+    """Заявка с пользователями и ее отчеты — все, что нужно странице заявки (в том числе архивной)"""
+    ticket = get_ticket(db, ticket_id, user_id, is_admin, is_staff)
+    if ticket is None:
+        archived = get_archived_ticket(db, ticket_id, user_id, is_admin, is_staff)
+        if archived is None:
+            return None
+        return {"ticket": archived, "reports": merge_reports(get_reports(db, ticket_id), archived.reports)}
+    return {"ticket": ticket, "reports": get_reports(db, ticket_id)}
+
+def get_report(db: Session, report_id: int):
+    return db.query(models.Report).filter(models.Report.id == report_id).first()
+
 def get_reports(db: Session, ticket_id: int):
-    return db.query(models.Report).filter(models.Report.ticket_id == ticket_id).all()
+    return db.query(models.Report).filter(models.Report.ticket_id == ticket_id).order_by(models.Report.id).all()
+
+
+def get_reports_by_ticket(db: Session, ticket_id: int, user_id: int = None, is_admin: bool = False,
+                          is_staff: bool = False):
+    """Получает все отчеты и файлы, привязанные к конкретному тикету. None — заявки нет или она не видна"""
+    state = ticket_state(db, ticket_id, user_id, is_admin, is_staff)
+    if state is None:
+        return None
+    reports = get_reports(db, ticket_id)
+    if state == TICKET_ARCHIVED:
+        archived = db.execute(select(models.TicketArchive.reports).where(models.TicketArchive.id == ticket_id)).scalar()
+        return merge_reports(reports, archived)
+    return reports
+
+def merge_reports(reports, archived_reports):
+    """
+    Отчеты из reports и из архивной строки (словари) одним списком по id. В reports у архивной
+    заявки остается то, что записали, пока ее переносили, — такой отчет не должен пропасть
+    """
+    by_id = {report["id"]: report for report in archived_reports or ()}
+    by_id.update((report.id, report) for report in reports)
+    return [by_id[report_id] for report_id in sorted(by_id)]
+
+# --- Архив закрытых заявок ---
+
+# Отчеты заявки, которые еще загружаются: заявку не переносим, пока очередь не допишет их состояние
+UPLOADS_IN_FLIGHT = (models.ATTACHMENT_PENDING, models.ATTACHMENT_UPLOADING)
+ARCHIVED_REPORT_FIELDS = ("id", "comment", "file_path", "file_name", "file_size", "content_type",
+                          "content_hash", "attachment_state", "created_at")
+
+def _archived_report(row) -> dict:
+    report = {field: getattr(row, field) for field in ARCHIVED_REPORT_FIELDS}
+    if report["created_at"] is not None:
+        report["created_at"] = report["created_at"].isoformat()
+    return report
+
+def archive_closed_tickets(db: Session, closed_before: datetime, batch_size: int) -> int:
+    """
+    Переносит до batch_size заявок, закрытых раньше closed_before, вместе с отчетами в tickets_archive.
+    Момент закрытия — последняя правка (updated_at). Одна транзакция на пачку; возвращает число
+    перенесенных заявок — меньше batch_size значит, что переносить больше нечего.
+    На Postgres заявки, которые сейчас правят, пропускаются (SKIP LOCKED) и уйдут в следующий раз
+    """
+    T, R = models.Ticket, models.Report
+    uploading = select(R.id).where(R.ticket_id == T.id, R.attachment_state.in_(UPLOADS_IN_FLIGHT)).exists()
+    stmt = (
+        select(T.__table__)
+        .where(T.status == "closed", func.coalesce(T.updated_at, T.created_at) < closed_before, ~uploading)
+        .order_by(T.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    tickets = db.execute(stmt).all()
+    if not tickets:
+        return 0
+    ids = [t.id for t in tickets]
+    reports = {}
+    for row in db.execute(select(R.__table__).where(R.ticket_id.in_(ids)).order_by(R.id)):
+        reports.setdefault(row.ticket_id, []).append(_archived_report(row))
+
+    db.execute(insert(models.TicketArchive), [{**t._mapping, "reports": reports.get(t.id, [])} for t in tickets])
+    db.execute(delete(R).where(R.ticket_id.in_(ids)).execution_options(synchronize_session=False))
+    db.execute(delete(T).where(T.id.in_(ids)).execution_options(synchronize_session=False))
+    if STATS_COUNTERS:
+        # Счетчики описывают рабочую таблицу — как и GROUP BY без них
+        apply_counters(db, sum_counters(counter_delta(t.status, t.assignee_id, created=_day(t.created_at), sign=-1)
+                                        for t in tickets))
+    db.commit()
+    _tickets_changed(db)
+    return len(ids)
+
+def get_archived_ticket(db: Session, ticket_id: int, user_id: int = None, is_admin: bool = False,
+                        is_staff: bool = False):
+    """Архивная заявка с пользователями; reports — список словарей"""
+    A = models.TicketArchive
+    return (
+        db.query(A)
+        .options(joinedload(A.creator), joinedload(A.assignee), joinedload(A.last_editor))
+        .filter(A.id == ticket_id, visible_to(A, user_id, is_admin, is_staff))
+        .first()
+    )
+
+def get_ticket_or_archived(db: Session, ticket_id: int, user_id: int = None, is_admin: bool = False,
+                           is_staff: bool = False):
+    return (get_ticket(db, ticket_id, user_id, is_admin, is_staff)
+            or get_archived_ticket(db, ticket_id, user_id, is_admin, is_staff))
+
+TICKET_ACTIVE = "active"
+TICKET_ARCHIVED = "archived"
 
+def ticket_state(db: Session, ticket_id: int, user_id: int = None, is_admin: bool = False,
+                 is_staff: bool = False):
+    """
+    Где лежит заявка, которую видит пользователь: TICKET_ACTIVE, TICKET_ARCHIVED или None —
+    заявки нет или она чужая (для пользователя это одно и то же). Один запрос на обе таблицы
+    """
+    T, A = models.Ticket, models.TicketArchive
+    stmt = union_all(
+        select(literal(TICKET_ACTIVE)).where(T.id == ticket_id, visible_to(T, user_id, is_admin, is_staff)),
+        select(literal(TICKET_ARCHIVED)).where(A.id == ticket_id, visible_to(A, user_id, is_admin, is_staff)),
+    ).limit(1)
+    return db.execute(stmt).scalar()
 
-def get_reports_by_ticket(db: Session, ticket_id: int):
-    """Получает все отчеты и файлы, привязанные к конкретному тикету"""
-    return db.query(models.Report).filter(models.Report.ticket_id == ticket_id).all()
\ No newline at end of file
+def get_archived_report(db: Session, ticket_id: int, report_id: int):
+    reports = db.execute(select(models.TicketArchive.reports).where(models.TicketArchive.id == ticket_id)).scalar()
+    for report in reports or ():
+        if report["id"] == report_id:
+            return schemas.ArchivedReport(ticket_id=ticket_id, **report)
+    return None
\ No newline at end of file
@@ -0,0 +1,51 @@
+"""
+Асинхронные версии функций crud.
+
+Запросы те же самые (одна реализация в crud.py), но выполняются через database.run:
+на AsyncSession — через run_sync поверх async-драйвера, на обычной Session — в пуле потоков.
+"""
+import functools
+from app import crud
+from app.cache import tickets_version
+from app.database import run
+
+def _async(fn):
+    @functools.wraps(fn)
+    async def wrapper(db, *args, **kwargs):
+        try:
+            return await run(db, fn, *args, **kwargs)
+        finally:
+            # На AsyncSession crud только отмечает запись (см. crud._tickets_changed)
+            if db.info.pop(crud.TICKETS_CHANGED, False):
+                await tickets_version.abump()
+    return wrapper
+
+get_user_by_username = _async(crud.get_user_by_username)
+get_user = _async(crud.get_user)
+create_user = _async(crud.create_user)
+set_password_hash = _async(crud.set_password_hash)
+create_ticket = _async(crud.create_ticket)
+get_tickets = _async(crud.get_tickets)
+search_tickets = _async(crud.search_tickets)
+get_all_tickets = _async(crud.get_all_tickets)
+get_ticket = _async(crud.get_ticket)
+get_ticket_or_archived = _async(crud.get_ticket_or_archived)
+ticket_state = _async(crud.ticket_state)
+get_ticket_etag = _async(crud.get_ticket_etag)
+get_ticket_view = _async(crud.get_ticket_view)
+get_ticket_stats = _async(crud.get_ticket_stats)
+rebuild_counters = _async(crud.rebuild_counters)
+update_ticket = _async(crud.update_ticket)
+claim_tickets = _async(crud.claim_tickets)
+delete_ticket_force = _async(crud.delete_ticket_force)
+bulk_update_status = _async(crud.bulk_update_status)
+bulk_assign = _async(crud.bulk_assign)
+bulk_delete = _async(crud.bulk_delete)
+bulk_import = _async(crud.bulk_import)
+create_report = _async(crud.create_report)
+set_attachment_state = _async(crud.set_attachment_state)
+blob_is_stored = _async(crud.blob_is_stored)
+get_report = _async(crud.get_report)
+get_archived_report = _async(crud.get_archived_report)
+get_reports = _async(crud.get_reports)
+get_reports_by_ticket = _async(crud.get_reports_by_ticket)
@@ -0,0 +1,201 @@
+"""
+Лента изменений заявок для дашборда (Server-Sent Events).
+
+crud публикует события в транзакции записи: с Postgres — через NOTIFY (уходит только при commit
+и приходит всем репликам, каждая слушает канал через LISTEN), иначе событие ждет commit сессии
+и раздается только подписчикам этого процесса.
+
+Подписчики — asyncio.Queue на event loop'е; поток на соединение не нужен, простаивающее
+SSE-соединение стоит только памяти под очередь.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import threading
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.database import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+# memory — только в пределах процесса, postgres — LISTEN/NOTIFY между репликами, auto — по DATABASE_URL
+EVENTS_BACKEND = os.getenv('EVENTS_BACKEND', 'auto')
+if EVENTS_BACKEND == 'auto':
+    EVENTS_BACKEND = 'postgres' if DATABASE_URL.startswith(('postgresql', 'postgres:')) else 'memory'
+EVENTS_CHANNEL = os.getenv('EVENTS_CHANNEL', 'ticket_events')
+# LISTEN держит серверное соединение, через PgBouncer в режиме transaction он не работает —
+# тогда слушаем базу напрямую
+EVENTS_DATABASE_URL = os.getenv('EVENTS_DATABASE_URL', DATABASE_URL)
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', 1000))
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv('EVENTS_MAX_SUBSCRIBERS', 1000))
+# Комментарий-пинг, чтобы прокси не закрывали молчащее соединение
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv('EVENTS_KEEPALIVE_SECONDS', 15))
+
+# Полезная нагрузка NOTIFY ограничена 8000 байт — длинные заголовки обрезаем
+TITLE_MAX_LENGTH = 200
+
+TICKET_CREATED = "ticket.created"
+TICKET_UPDATED = "ticket.updated"
+TICKET_DELETED = "ticket.deleted"
+REPORT_CREATED = "report.created"
+TICKETS_IMPORTED = "tickets.imported"
+# Подписчик не успевал читать и пропустил события — клиенту нужно перечитать список
+RESYNC = "resync"
+
+
+class Subscriber:
+    def __init__(self, user_id: int, privileged: bool):
+        self.user_id = user_id
+        self.privileged = privileged
+        self.queue = asyncio.Queue(maxsize=EVENTS_QUEUE_SIZE)
+
+    def can_see(self, data: dict) -> bool:
+        # RESYNC данных не несет, а перечитать список нужно всем
+        if self.privileged or data.get("type") == RESYNC:
+            return True
+        ticket = data.get("ticket")
+        # События без заявки (импорт) — только для сотрудников
+        return ticket is not None and self.user_id in (ticket.get("creator_id"), ticket.get("assignee_id"))
+
+    def put(self, data: dict):
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            # Очередь переполнена: старые события бесполезны, оставляем только сигнал перечитать.
+            # id — того события, на котором переполнились: клиент продолжит с него
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": RESYNC, "id": data.get("id")})
+
+
+class Broadcaster:
+    def __init__(self):
+        self.subscribers = set()
+        self.delivered = 0
+        self._ids = itertools.count(1)
+        self._loop = None
+        self._loop_thread = None
+        self._listener = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        if EVENTS_BACKEND == 'postgres':
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+        self._loop = None
+
+    def subscribe(self, user_id: int, privileged: bool) -> Subscriber:
+        if len(self.subscribers) >= EVENTS_MAX_SUBSCRIBERS:
+            raise OverflowError("Too many event subscribers")
+        subscriber = Subscriber(user_id, privileged)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def dispatch(self, data: dict):
+        """Раздает событие подписчикам этого процесса (только из потока event loop)"""
+        data = {**data, "id": next(self._ids)}
+        for subscriber in list(self.subscribers):
+            if subscriber.can_see(data):
+                subscriber.put(data)
+                self.delivered += 1
+
+    def dispatch_threadsafe(self, data: dict):
+        loop = self._loop
+        if loop is None:
+            return  # лента не запущена (скрипты, миграции)
+        if self._loop_thread == threading.get_ident():
+            self.dispatch(data)
+        else:
+            loop.call_soon_threadsafe(self.dispatch, data)
+
+    async def _listen(self):
+        """LISTEN на канал событий; при обрыве соединения переподключается"""
+        import asyncpg
+
+        scheme, rest = EVENTS_DATABASE_URL.split('://', 1)
+        dsn = f"{scheme.split('+')[0]}://{rest}"
+        delay = 1.0
+        while True:
+            try:
+                conn = await asyncpg.connect(dsn)
+                try:
+                    await conn.add_listener(EVENTS_CHANNEL, self._on_notify)
+                    delay = 1.0
+                    # Пропущенные за время обрыва события не восстановить — просим клиентов перечитать
+                    self.dispatch({"type": RESYNC})
+                    # asyncpg не замечает обрыв молчащего соединения, поэтому периодически пингуем
+                    while True:
+                        await asyncio.sleep(EVENTS_KEEPALIVE_SECONDS)
+                        await conn.execute("SELECT 1")
+                finally:
+                    await conn.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("LISTEN %s failed: %s, retrying in %.0fs", EVENTS_CHANNEL, e, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self.dispatch(json.loads(payload))
+
+    def stats(self):
+        return {"backend": EVENTS_BACKEND, "subscribers": len(self.subscribers), "delivered": self.delivered}
+
+
+broadcaster = Broadcaster()
+
+
+def ticket_payload(ticket, names: dict = None) -> dict:
+    """
+    Краткое представление заявки для события: ORM-объект, TicketResponse или строка RETURNING.
+    Имена пользователей берутся из связей, если они загружены, иначе из names (id -> username)
+    """
+    data = {
+        "id": ticket.id,
+        "title": (getattr(ticket, "title", None) or "")[:TITLE_MAX_LENGTH] or None,
+        "status": getattr(ticket, "status", None),
+        "creator_id": getattr(ticket, "creator_id", None),
+        "assignee_id": getattr(ticket, "assignee_id", None),
+        "version": getattr(ticket, "version", None),
+    }
+    for role in ("creator", "assignee"):
+        user = getattr(ticket, role, None)
+        data[role] = user.username if user is not None else (names or {}).get(data[f"{role}_id"])
+    return data
+
+
+def publish(db: Session, events):
+    """
+    Публикует события в транзакции сессии db: они дойдут до подписчиков только после commit.
+    events — список словарей {"type": ..., "ticket": {...}, ...}
+    """
+    if not events:
+        return
+    if EVENTS_BACKEND == 'postgres':
+        db.execute(text("SELECT pg_notify(:channel, :payload)"),
+                   [{"channel": EVENTS_CHANNEL, "payload": json.dumps(e, default=str)} for e in events])
+    else:
+        db.info.setdefault("pending_events", []).extend(events)
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_pending(session):
+    for data in session.info.pop("pending_events", ()):
+        broadcaster.dispatch_threadsafe(data)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session):
+    session.info.pop("pending_events", None)
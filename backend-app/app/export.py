@@ -0,0 +1,141 @@
+"""
+Потоковая выгрузка заявок в CSV / NDJSON для отчетности.
+
+Строки читаются серверным курсором (yield_per) и сразу уходят клиенту кусками,
+поэтому память не зависит от размера таблицы. Отчеты догружаются одним запросом
+на каждую пачку заявок, а не на каждую заявку.
+
+Заявки, перенесенные в архив (tickets_archive), выгружаются только с include_archived:
+после рабочих, с дополнительной колонкой archived_at.
+"""
+import csv
+import io
+import json
+import os
+import zlib
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from app import crud, models
+from app.database import SessionLocal
+
+# Сколько строк за раз тянуть из курсора
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+# Сколько байт копить перед отправкой очередного куска клиенту
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+TICKET_FIELDS = [
+    "id", "title", "description", "status", "created_at", "updated_at",
+    "creator_id", "creator", "assignee_id", "assignee", "version",
+]
+ARCHIVE_FIELDS = TICKET_FIELDS + ["archived_at"]
+REPORT_FIELDS = ["id", "comment", "file_name", "file_size", "content_type", "attachment_state", "created_at"]
+
+def _ticket_query(model=models.Ticket, *extra, **filters):
+    creator = aliased(models.User)
+    assignee = aliased(models.User)
+    T = model
+    query = (
+        select(
+            T.id, T.title, T.description, T.status, T.created_at, T.updated_at,
+            T.creator_id, creator.username, T.assignee_id, assignee.username, T.version, *extra,
+        )
+        .outerjoin(creator, creator.id == T.creator_id)
+        .outerjoin(assignee, assignee.id == T.assignee_id)
+    )
+    return crud.filter_tickets(query, model=model, **filters).order_by(T.id)
+
+def _reports_for(db, ticket_ids):
+    R = models.Report
+    rows = db.execute(
+        select(R.ticket_id, *(getattr(R, f) for f in REPORT_FIELDS))
+        .where(R.ticket_id.in_(ticket_ids))
+        .order_by(R.ticket_id, R.id)
+    )
+    reports = {}
+    for ticket_id, *values in rows:
+        reports.setdefault(ticket_id, []).append(dict(zip(REPORT_FIELDS, values)))
+    return reports
+
+def iter_records(include_reports: bool = False, include_archived: bool = False, **filters):
+    """
+    Словари заявок (с ключом reports при include_reports) в порядке id.
+    С include_archived после них идут архивные, у всех записей есть archived_at
+    """
+    fields = ARCHIVE_FIELDS if include_archived else TICKET_FIELDS
+    db = SessionLocal()
+    try:
+        result = db.execute(_ticket_query(**filters).execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for batch in result.partitions():
+            # У рабочей заявки archived_at пустой; без include_archived лишний None zip отбросит
+            records = [dict(zip(fields, (*row, None))) for row in batch]
+            if include_reports:
+                reports = _reports_for(db, [r["id"] for r in records])
+                for record in records:
+                    record["reports"] = reports.get(record["id"], [])
+            yield from records
+        if not include_archived:
+            return
+        # Отчеты архивной заявки лежат в той же строке — отдельный запрос не нужен
+        A = models.TicketArchive
+        extra = (A.archived_at, A.reports) if include_reports else (A.archived_at,)
+        result = db.execute(_ticket_query(A, *extra, **filters).execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for row in result:
+            record = dict(zip(ARCHIVE_FIELDS, row))
+            if include_reports:
+                record["reports"] = [{f: report.get(f) for f in REPORT_FIELDS} for report in row[-1]]
+            yield record
+    finally:
+        db.close()
+
+def _value(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+def _csv_lines(records, include_reports, fields=TICKET_FIELDS):
+    header = fields + ([f"report_{f}" for f in REPORT_FIELDS] if include_reports else [])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for record in records:
+        ticket = [_value(record[f]) for f in fields]
+        if not include_reports:
+            writer.writerow(ticket)
+        else:
+            # Одна строка на отчет; заявка без отчетов — одна строка с пустыми колонками
+            for report in record["reports"] or [None]:
+                writer.writerow(ticket + [_value(report[f]) if report else None for f in REPORT_FIELDS])
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+def _ndjson_lines(records):
+    chunk = []
+    size = 0
+    for record in records:
+        line = json.dumps(record, default=_value, ensure_ascii=False).encode() + b"\n"
+        chunk.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield b"".join(chunk)
+            chunk, size = [], 0
+    yield b"".join(chunk)
+
+def _gzip(chunks):
+    # wbits=31 — gzip-заголовок и контрольная сумма, как у обычного .gz файла
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def stream(fmt: str = "csv", include_reports: bool = False, include_archived: bool = False, gzip: bool = False,
+           **filters):
+    """Генератор байтов выгрузки для StreamingResponse."""
+    records = iter_records(include_reports=include_reports, include_archived=include_archived, **filters)
+    fields = ARCHIVE_FIELDS if include_archived else TICKET_FIELDS
+    chunks = _csv_lines(records, include_reports, fields) if fmt == "csv" else _ndjson_lines(records)
+    return _gzip(chunks) if gzip else chunks
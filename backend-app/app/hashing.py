@@ -0,0 +1,102 @@
+"""
+Хэширование паролей (bcrypt) в отдельном пуле процессов.
+
+bcrypt — чистый CPU: в потоках бэкенда всплеск логинов в начале смены съедает ядро пода,
+и обычные запросы по заявкам встают в очередь за ним. Пул процессов ограничен HASH_WORKERS,
+а число ожидающих операций — HASH_MAX_PENDING: сверх него логин сразу получает 503
+(HashPoolBusy) вместо бесконечной очереди.
+
+Модуль импортируется дочерними процессами пула, поэтому здесь только passlib и stdlib.
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from passlib.context import CryptContext
+
+# Стоимость bcrypt. При смене значения старые хэши пересчитываются при следующем входе
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+# 0 — без отдельных процессов, в пуле потоков (локальный запуск)
+HASH_WORKERS = int(os.getenv('HASH_WORKERS', 2))
+HASH_MAX_PENDING = int(os.getenv('HASH_MAX_PENDING', 32))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class HashPoolBusy(Exception):
+    """Очередь хэширования заполнена — клиенту стоит повторить позже"""
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    return pwd_context.verify(password, password_hash)
+
+
+def verify_and_update(password: str, password_hash: str):
+    """(пароль верный, новый хэш или None) — новый хэш, если параметры стоимости изменились"""
+    return pwd_context.verify_and_update(password, password_hash)
+
+
+_pool = None
+_pending = 0
+# Хэш случайного пароля для входа под несуществующим логином (см. verify_missing_user_async)
+_dummy_hash = None
+
+
+def start():
+    global _pool
+    if _pool is None and HASH_WORKERS > 0:
+        # spawn, а не fork: форк процесса с потоками (uvicorn, очередь загрузок) небезопасен
+        _pool = ProcessPoolExecutor(HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def _run(operation: str, fn, *args):
+    # Метрики импортируются только здесь, в процессе бэкенда — дочерним процессам они не нужны
+    from app import metrics
+
+    # Счетчик трогается только из event loop, блокировка не нужна
+    global _pending
+    if _pending >= HASH_MAX_PENDING:
+        raise HashPoolBusy(f"{_pending} password operations are already pending")
+    _pending += 1
+    started = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_pool, fn, *args)
+    finally:
+        _pending -= 1
+        metrics.PASSWORD_HASH_DURATION.labels(operation).observe(time.perf_counter() - started)
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run("hash", hash_password, password)
+
+
+async def verify_and_update_async(password: str, password_hash: str):
+    return await _run("verify", verify_and_update, password, password_hash)
+
+
+async def verify_missing_user_async(password: str):
+    """
+    Проверка пароля для логина, которого нет: всегда неуспешна, но идет через тот же bcrypt
+    той же стоимости — по времени ответа не понять, существует ли пользователь.
+    Хэш создается при первом таком входе и дальше не меняется
+    """
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = await hash_password_async(os.urandom(16).hex())
+    await verify_and_update_async(password, _dummy_hash)
+
+
+def stats():
+    return {"workers": HASH_WORKERS, "pending": _pending, "max_pending": HASH_MAX_PENDING, "rounds": BCRYPT_ROUNDS}
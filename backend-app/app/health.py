@@ -0,0 +1,74 @@
+"""
+Проверки для readiness-пробы: база и object storage.
+
+Результат каждой проверки кэшируется на HEALTH_CACHE_TTL секунд — пробы kubelet'а
+со всех подов не превращаются в постоянный поток запросов к базе и к bucket'у,
+а зависшая зависимость не держит пробу дольше HEALTH_CHECK_TIMEOUT.
+"""
+import asyncio
+import os
+import time
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from app import database, storage
+from app.cache import TTLCache
+
+HEALTH_CACHE_TTL = float(os.getenv('HEALTH_CACHE_TTL', 5))
+HEALTH_CHECK_TIMEOUT = float(os.getenv('HEALTH_CHECK_TIMEOUT', 2))
+# Без bucket'а не работают только вложения — по умолчанию это не повод выводить под из балансировки
+HEALTH_REQUIRE_STORAGE = os.getenv('HEALTH_REQUIRE_STORAGE', 'false').lower() == 'true'
+
+_results = TTLCache(maxsize=8, ttl=HEALTH_CACHE_TTL)
+
+
+def _ping_sync_engine():
+    with database.engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+async def _check_db():
+    """Пингуем движок, который обслуживает запросы: при DB_ASYNC это async-драйвер и его пул"""
+    if database.DB_ASYNC:
+        async with database.async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    else:
+        await run_in_threadpool(_ping_sync_engine)
+
+
+def _check_storage():
+    if not storage.OCI_BUCKET_NAME:
+        return "skipped"
+    storage.check_bucket()
+
+
+# Синхронные проверки выполняются в пуле потоков
+CHECKS = {"database": _check_db, "storage": _check_storage}
+
+
+async def _run_check(name: str) -> dict:
+    cached = _results.get(name)
+    if cached is not None:
+        return cached
+    started = time.perf_counter()
+    try:
+        check = CHECKS[name]
+        pending = check() if asyncio.iscoroutinefunction(check) else run_in_threadpool(check)
+        status = await asyncio.wait_for(pending, HEALTH_CHECK_TIMEOUT) or "ok"
+        result = {"status": status}
+    except asyncio.TimeoutError:
+        result = {"status": "error", "error": f"timed out after {HEALTH_CHECK_TIMEOUT}s"}
+    except Exception as e:
+        result = {"status": "error", "error": f"{type(e).__name__}: {e}"[:300]}
+    result["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    _results.set(name, result)
+    return result
+
+
+async def readiness():
+    """(готов ли под, результаты проверок)"""
+    results = dict(zip(CHECKS, await asyncio.gather(*(_run_check(name) for name in CHECKS))))
+    required = ["database"] + (["storage"] if HEALTH_REQUIRE_STORAGE else [])
+    ready = all(results[name]["status"] != "error" for name in required)
+    return ready, results
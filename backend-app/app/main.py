@@ -1,35 +1,86 @@
-from fastapi import FastAPI
-from app.database import engine, Base, SessionLocal
-from app.routers import auth, tickets
-from app import crud, schemas, models  # <--- Добавь импорт models здесь!
+import logging
+import os
+from fastapi import Depends, FastAPI, Response
+from app.database import pool_status
+from app.routers import auth, events as events_router, tickets
+from app import cache, compression, events, hashing, health, metrics, storage, uploads
+from app.security import require_metrics_token
 
-# Теперь SQLAlchemy "увидит" классы Ticket и User внутри models
-Base.metadata.create_all(bind=engine)
+# Логи приложения (app.*) в stderr рядом с логами uvicorn
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+                    format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
 
+# Схема базы и администратор по умолчанию — не на импорте, а миграциями:
+# python -m app.manage init (в Kubernetes — initContainer пода)
 app = FastAPI(title="Service Desk API")
+# Последний добавленный — внешний: метрики видят время ответа вместе со сжатием
+app.add_middleware(compression.CompressionMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 
 app.include_router(auth.router)
 app.include_router(tickets.router)
+app.include_router(events_router.router)
 
 @app.on_event("startup")
-def create_default_admin():
-    db = SessionLocal()
-    if not crud.get_user_by_username(db, "admin"):
-        # Добавляем is_staff=True, чтобы админ тоже считался сотрудником
-        admin_user = schemas.UserCreate(
-            username="admin", 
-            password="adminpassword", 
-            is_admin=True,
-            is_staff=True  
-        )
-        crud.create_user(db, admin_user)
-        print("--- ADMIN / STAFF CREATED ---")
-    db.close()
+def start_upload_workers():
+    uploads.upload_queue.start()
+
+@app.on_event("startup")
+def start_hash_pool():
+    hashing.start()
+
+@app.on_event("startup")
+async def start_event_feed():
+    await events.broadcaster.start()
+
+@app.on_event("shutdown")
+def stop_upload_workers():
+    uploads.upload_queue.stop()
+
+@app.on_event("shutdown")
+async def stop_event_feed():
+    await events.broadcaster.stop()
+
+@app.on_event("shutdown")
+def stop_hash_pool():
+    hashing.shutdown()
+
+@app.get("/cache/stats", dependencies=[Depends(require_metrics_token)])
+async def cache_stats():
+    """Попадания/промахи внутрипроцессных кэшей"""
+    return {
+        "ticket_lists": {**cache.ticket_lists.stats(), "version": await cache.tickets_version.aget(),
+                         "shared": cache.tickets_version.redis is not None},
+        "presigned_urls": storage.presigned_urls.stats(),
+    }
+
+@app.get("/db/pool", dependencies=[Depends(require_metrics_token)])
+def db_pool_stats():
+    """Заполненность пулов соединений и время ожидания соединения (основная база и реплика)"""
+    return pool_status()
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
 
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
 
+@app.get("/health/live")
+async def liveness():
+    """Процесс жив и отвечает; зависимости не проверяются, чтобы их сбой не вызывал рестарты"""
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+async def readiness(response: Response):
+    """Под готов принимать запросы: база доступна (и bucket, если HEALTH_REQUIRE_STORAGE)"""
+    ready, checks = await health.readiness()
+    if not ready:
+        response.status_code = 503
+    return {"status": "ok" if ready else "unavailable", "checks": checks}
+
 @app.get("/")
 def read_root():
     return {"message": "Service Desk API is running"}
@@ -0,0 +1,135 @@
+"""
+Служебные команды, которые раньше выполнялись при каждом старте приложения:
+
+    python -m app.manage migrate        # alembic upgrade head
+    python -m app.manage create-admin   # администратор по умолчанию, если его нет
+    python -m app.manage init           # все вместе + счетчики дашборда (initContainer в Helm)
+    python -m app.manage archive        # перенос давно закрытых заявок в архив (CronJob в Helm)
+
+archive сбрасывает кэш списков заявок на подах через общий счетчик версий в Redis (REDIS_URL).
+Без Redis поды узнают о переносе только по истечении TICKET_LIST_CACHE_TTL.
+
+Несколько подов могут запустить init одновременно — на Postgres команды сериализуются
+advisory-блокировкой, остальные ждут и находят все уже сделанным.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import cache, crud, schemas
+from app.database import SessionLocal, engine
+
+logger = logging.getLogger("app.manage")
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+ADMIN_USERNAME = os.getenv('ADMIN_USERNAME', 'admin')
+ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', 'adminpassword')
+# Произвольный, но постоянный ключ pg_advisory_xact_lock
+INIT_LOCK_KEY = 72_413_001
+# Архив: заявки, закрытые больше ARCHIVE_AFTER_DAYS дней назад, переносятся пачками
+# по ARCHIVE_BATCH_SIZE с паузой между ними, чтобы не забирать базу у рабочего трафика
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 180))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', 500))
+ARCHIVE_BATCH_PAUSE = float(os.getenv('ARCHIVE_BATCH_PAUSE', 0.2))
+
+
+def migrate(connection):
+    config = Config(ALEMBIC_INI)
+    config.attributes["connection"] = connection
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+
+
+def create_admin(connection):
+    db = Session(bind=connection)
+    try:
+        if crud.get_user_by_username(db, ADMIN_USERNAME):
+            return
+        # is_staff=True, чтобы админ тоже считался сотрудником
+        crud.create_user(db, schemas.UserCreate(
+            username=ADMIN_USERNAME, password=ADMIN_PASSWORD, is_admin=True, is_staff=True,
+        ))
+        logger.info("Admin user %r created", ADMIN_USERNAME)
+    finally:
+        db.close()
+
+
+def init_ticket_counters(connection):
+    # Таблица счетчиков пуста при первом включении STATS_COUNTERS — заполняем по текущим заявкам
+    if not crud.STATS_COUNTERS:
+        return
+    db = Session(bind=connection)
+    try:
+        if crud.counters_empty(db):
+            crud.rebuild_counters(db)
+            logger.info("Ticket counters rebuilt")
+    finally:
+        db.close()
+
+
+def archive(days: int, batch_size: int, max_batches: int = None):
+    """
+    Переносит закрытые заявки в tickets_archive, по транзакции на пачку: блокировки короткие,
+    а прерванный запуск просто продолжится в следующий раз
+    """
+    closed_before = datetime.now(timezone.utc) - timedelta(days=days)
+    total = batches = 0
+    db = SessionLocal()
+    try:
+        while max_batches is None or batches < max_batches:
+            moved = crud.archive_closed_tickets(db, closed_before, batch_size)
+            total += moved
+            batches += 1
+            if moved < batch_size:
+                break
+            time.sleep(ARCHIVE_BATCH_PAUSE)
+    finally:
+        db.close()
+    logger.info("Archived %d tickets closed before %s", total, closed_before.date())
+    if total and cache.tickets_version.redis is None:
+        # Без Redis версия списков живет в памяти этого процесса: поды bump команды не видят
+        logger.warning("REDIS_URL is not set: backend pods may list archived tickets from their cache "
+                       "for up to %.0f s (TICKET_LIST_CACHE_TTL)", cache.TICKET_LIST_CACHE_TTL)
+    return total
+
+
+COMMANDS = {
+    "migrate": [migrate],
+    "create-admin": [create_admin],
+    "init": [migrate, create_admin, init_ticket_counters],
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    parser.add_argument("command", choices=sorted([*COMMANDS, "archive"]))
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS,
+                        help="archive: tickets closed more than this many days ago")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--max-batches", type=int, help="archive: stop after this many batches")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s [%(name)s] %(message)s")
+
+    if args.command == "archive":
+        archive(args.older_than_days, args.batch_size, args.max_batches)
+        return 0
+
+    # Одна транзакция на все шаги: Session внутри присоединяется к ней, commit — в конце
+    with engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": INIT_LOCK_KEY})
+        for step in COMMANDS[args.command]:
+            step(connection)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""
+Метрики Prometheus (GET /metrics) и журнал медленных запросов.
+
+- HTTP: гистограмма задержки и счетчик ответов по шаблону маршрута (/tickets/{ticket_id},
+  а не по каждой заявке), число запросов в обработке;
+- SQL: число запросов к базе и их суммарное время на один HTTP-запрос (события движка
+  SQLAlchemy), пулы соединений и ожидание соединения (app/database.py);
+- object storage: длительность операций и загруженные байты;
+- bcrypt: время хэширования и проверки паролей, очередь пула процессов.
+
+SLOW_REQUEST_MS > 0 включает журнал: запрос дольше порога пишется в лог вместе с SQL,
+который он выполнил.
+"""
+import contextvars
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import database
+
+logger = logging.getLogger(__name__)
+
+# 0 — журнал медленных запросов выключен
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 0))
+# Сколько SQL-запросов и символов каждого попадает в запись журнала
+SLOW_REQUEST_MAX_STATEMENTS = int(os.getenv('SLOW_REQUEST_MAX_STATEMENTS', 50))
+SLOW_REQUEST_STATEMENT_LENGTH = 500
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP responses", ["method", "route", "status"])
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ["method", "route"],
+                         buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being processed")
+SQL_PER_REQUEST = Histogram("http_request_sql_statements", "SQL statements per HTTP request", ["route"],
+                            buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 500))
+SQL_TIME_PER_REQUEST = Histogram("http_request_sql_seconds", "Time spent in SQL per HTTP request", ["route"],
+                                 buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+SQL_STATEMENTS = Counter("db_statements_total", "SQL statements executed", ["engine"])
+SQL_TIME = Counter("db_statement_seconds_total", "Time spent executing SQL", ["engine"])
+STORAGE_DURATION = Histogram("storage_operation_duration_seconds", "Object storage call latency",
+                             ["operation", "outcome"],
+                             buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+STORAGE_BYTES = Counter("storage_transferred_bytes_total", "Bytes sent to / received from object storage",
+                        ["direction"])
+PASSWORD_HASH_DURATION = Histogram("password_hash_duration_seconds",
+                                   "bcrypt hash/verify time including the wait for a pool worker", ["operation"],
+                                   buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10))
+
+
+class RequestStats:
+    __slots__ = ("statements", "seconds", "log")
+
+    def __init__(self, keep_log: bool):
+        self.statements = 0
+        self.seconds = 0.0
+        self.log = [] if keep_log else None
+
+
+# SQL текущего HTTP-запроса. Пул потоков (run_in_threadpool) и run_sync получают копию контекста
+# со ссылкой на тот же объект, так что запросы из crud учитываются тоже
+_request_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Время старта — на контексте выполнения: он свой у каждого statement и уходит вместе с ним,
+    # даже если запрос упал и after_cursor_execute не вызывался
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+
+def _record_statement(conn, statement, context):
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    name = getattr(conn.engine.pool, "_orig_logging_name", None) or "default"
+    SQL_STATEMENTS.labels(name).inc()
+    SQL_TIME.labels(name).inc(elapsed)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.seconds += elapsed
+        if stats.log is not None and len(stats.log) < SLOW_REQUEST_MAX_STATEMENTS:
+            stats.log.append((round(elapsed * 1000, 2), " ".join(statement.split())[:SLOW_REQUEST_STATEMENT_LENGTH]))
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record_statement(conn, statement, context)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # Упавший запрос тоже занимал базу — считаем его так же, как успешный
+    if exception_context.connection is not None and exception_context.statement is not None:
+        _record_statement(exception_context.connection, exception_context.statement,
+                          exception_context.execution_context)
+
+
+@contextmanager
+def storage_call(operation: str):
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        STORAGE_DURATION.labels(operation, outcome).observe(time.perf_counter() - started)
+
+
+class _RuntimeCollector:
+    """Снимается в момент scrape: пулы соединений, очередь bcrypt, очередь загрузок"""
+
+    def collect(self):
+        from app import hashing, uploads
+
+        size = GaugeMetricFamily("db_pool_size", "Configured pool size", labels=["engine"])
+        checked_out = GaugeMetricFamily("db_pool_checked_out", "Connections in use", labels=["engine"])
+        overflow = GaugeMetricFamily("db_pool_overflow", "Connections above pool_size", labels=["engine"])
+        checkouts = CounterMetricFamily("db_pool_checkouts", "Connection checkouts", labels=["engine"])
+        timeouts = CounterMetricFamily("db_pool_timeouts", "Checkouts that hit pool_timeout", labels=["engine"])
+        waited = CounterMetricFamily("db_pool_wait_seconds", "Total time waiting for a connection",
+                                     labels=["engine"])
+        for name, pool in database.pool_status().items():
+            if "size" in pool:
+                size.add_metric([name], pool["size"])
+                checked_out.add_metric([name], pool["checked_out"])
+                overflow.add_metric([name], max(pool["overflow"], 0))
+            stats = database.pool_stats[name]
+            checkouts.add_metric([name], stats.checkouts)
+            timeouts.add_metric([name], stats.timeouts)
+            waited.add_metric([name], stats.wait_total)
+        yield from (size, checked_out, overflow, checkouts, timeouts, waited)
+
+        hash_stats = hashing.stats()
+        yield GaugeMetricFamily("password_hash_pending", "Password operations waiting or running",
+                                value=hash_stats["pending"])
+        yield GaugeMetricFamily("upload_queue_size", "Attachments waiting for upload",
+                                value=uploads.upload_queue.qsize())
+
+
+REGISTRY.register(_RuntimeCollector())
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware (не BaseHTTPMiddleware: тот буферизует контекст и мешает стримингу).
+    Маршрут берется по endpoint, который роутер кладет в scope
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes = None
+
+    def _route_name(self, scope) -> str:
+        if self._routes is None:
+            self._routes = {getattr(route, "endpoint", None): route.path for route in scope["app"].routes}
+        return self._routes.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(keep_log=SLOW_REQUEST_MS > 0)
+        token = _request_stats.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            _request_stats.reset(token)
+            elapsed = time.perf_counter() - started
+            route = self._route_name(scope)
+            method = scope["method"]
+            HTTP_REQUESTS.labels(method, route, str(status)).inc()
+            HTTP_LATENCY.labels(method, route).observe(elapsed)
+            SQL_PER_REQUEST.labels(route).observe(stats.statements)
+            SQL_TIME_PER_REQUEST.labels(route).observe(stats.seconds)
+            if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+                logger.warning(
+                    "Slow request %s %s -> %s in %.0f ms, %d SQL statements (%.0f ms):\n%s",
+                    method, scope["path"], status, elapsed * 1000, stats.statements, stats.seconds * 1000,
+                    "\n".join(f"  [{ms} ms] {sql}" for ms, sql in stats.log) or "  (no SQL)",
+                )
+
+
+def render():
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,8 +1,17 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Boolean, ForeignKey, Index, JSON
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
 
+# SQLite (локальный запуск) хранит server_default CURRENT_TIMESTAMP без микросекунд,
+# а параметры по умолчанию биндит с ними — тогда сравнение строк ломает keyset-пагинацию.
+# Приводим оба к одному формату; Postgres не затрагивается.
+Timestamp = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite",
+)
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
@@ -20,14 +29,16 @@ class Ticket(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     description = Column(Text)
-    status = Column(String, default="new")
+    status = Column(String, default="new", index=True)
     
-    creator_id = Column(Integer, ForeignKey("users.id"))
-    assignee_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    creator_id = Column(Integer, ForeignKey("users.id"), index=True)
+    assignee_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     last_editor_id = Column(Integer, ForeignKey("users.id"), nullable=True)
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now()) 
+    created_at = Column(Timestamp, server_default=func.now())
+    updated_at = Column(Timestamp, onupdate=func.now())
+    # Оптимистическая блокировка: каждая правка увеличивает версию (см. crud.update_ticket)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     creator = relationship("User", foreign_keys=[creator_id], back_populates="created_tickets")
     assignee = relationship("User", foreign_keys=[assignee_id], back_populates="assigned_tickets")
@@ -37,13 +48,68 @@ class Ticket(Base):
     # cascade="all, delete-orphan" означает: если удалишь тикет, удалятся и все его отчеты
     reports = relationship("Report", back_populates="ticket", cascade="all, delete-orphan")
 
+    # Порядок списка и keyset-курсор — (created_at, id).
+    # На SQLite без AUTOINCREMENT id заявок, перенесенных в архив, выдавались бы заново (миграция 0004)
+    __table_args__ = (Index("ix_tickets_created_at_id", "created_at", "id"), {"sqlite_autoincrement": True})
+
+# Состояния вложения отчета: файл догружается в bucket фоновой очередью (app/uploads.py)
+ATTACHMENT_PENDING = "pending"
+ATTACHMENT_UPLOADING = "uploading"
+ATTACHMENT_DONE = "done"
+ATTACHMENT_FAILED = "failed"
+
 class Report(Base):
     __tablename__ = "reports"
     id = Column(Integer, primary_key=True, index=True)
-    ticket_id = Column(Integer, ForeignKey("tickets.id"))
+    ticket_id = Column(Integer, ForeignKey("tickets.id"), index=True)
     comment = Column(Text)
+    # Ключ объекта в bucket. Файлы хранятся по хэшу содержимого (blobs/sha256/..),
+    # один и тот же файл в разных отчетах — один объект
     file_path = Column(String, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    file_name = Column(String, nullable=True)
+    file_size = Column(BigInteger, nullable=True)
+    content_type = Column(String, nullable=True)
+    content_hash = Column(String(64), nullable=True, index=True)
+    # None — отчет без файла
+    attachment_state = Column(String, nullable=True)
+    created_at = Column(Timestamp, server_default=func.now())
 
     # ДОБАВЛЕНО: Обратная связь для отчета
-    ticket = relationship("Ticket", back_populates="reports")
\ No newline at end of file
+    ticket = relationship("Ticket", back_populates="reports")
+
+    # id отчетов архивных заявок тоже не должны повторяться (см. Ticket)
+    __table_args__ = {"sqlite_autoincrement": True}
+
+class TicketArchive(Base):
+    """
+    Закрытая давно заявка, перенесенная из tickets (см. crud.archive_closed_tickets).
+    Колонки те же, что у Ticket, отчеты — JSON-массив полей ReportResponse.
+    Строка больше не меняется: правки и новые отчеты для архивной заявки не принимаются
+    """
+    __tablename__ = "tickets_archive"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    title = Column(String, nullable=False)
+    description = Column(Text)
+    status = Column(String)
+    creator_id = Column(Integer, ForeignKey("users.id"))
+    assignee_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    last_editor_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(Timestamp)
+    updated_at = Column(Timestamp)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    archived_at = Column(Timestamp, server_default=func.now())
+    reports = Column(JSON, nullable=False, default=list)
+
+    creator = relationship("User", foreign_keys=[creator_id])
+    assignee = relationship("User", foreign_keys=[assignee_id])
+    last_editor = relationship("User", foreign_keys=[last_editor_id])
+
+class TicketCounter(Base):
+    """
+    Готовые агрегаты для шапки дашборда (при STATS_COUNTERS=true).
+    Ключи: status:<статус>, assignee:<id|none> (открытые заявки исполнителя), created:<YYYY-MM-DD>.
+    Обновляются в той же транзакции, что и сами заявки (см. crud.apply_counters)
+    """
+    __tablename__ = "ticket_counters"
+    key = Column(String, primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
@@ -1,8 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from app.database import get_db
-from app import crud, schemas
+from app.database import DbSession, get_db
+from app import crud_async, hashing, schemas, security
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -10,16 +9,49 @@ class LoginRequest(BaseModel):
     username: str
     password: str
 
-@router.post("/login", response_model=schemas.UserResponse)
-def login(login_data: LoginRequest, db: Session = Depends(get_db)):
-    user = crud.get_user_by_username(db, login_data.username)
-    if not user or not crud.verify_password(login_data.password, user.password_hash):
+def _busy(e: hashing.HashPoolBusy):
+    # Всплеск логинов: отказываем сразу, а не копим очередь, которая задержит и заявки
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e),
+                         headers={"Retry-After": "1"})
+
+@router.post("/login", response_model=schemas.LoginResponse)
+async def login(login_data: LoginRequest, db: DbSession = Depends(get_db)):
+    user = await crud_async.get_user_by_username(db, login_data.username)
+    # bcrypt — чистый CPU, он уходит в пул процессов (app/hashing.py), а не в потоки бэкенда
+    try:
+        if not user:
+            # Без проверки пароля неизвестный логин отвечал бы заметно быстрее известного
+            await hashing.verify_missing_user_async(login_data.password)
+            raise HTTPException(status_code=401, detail="Incorrect username or password")
+        valid, new_hash = await hashing.verify_and_update_async(login_data.password, user.password_hash)
+    except hashing.HashPoolBusy as e:
+        raise _busy(e)
+    if not valid:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
-    return user
+    if new_hash:
+        # Сменилась стоимость bcrypt (BCRYPT_ROUNDS) — пароль известен только сейчас, пересчитываем
+        await crud_async.set_password_hash(db, user.id, new_hash)
+
+    principal = security.principal_from_user(user)
+    return schemas.LoginResponse(
+        id=principal.id, username=principal.username, is_admin=principal.is_admin, is_staff=principal.is_staff,
+        access_token=security.issue_token(principal.id), expires_in=security.TOKEN_TTL,
+    )
+
+@router.get("/me", response_model=schemas.UserResponse)
+async def read_me(principal: security.Principal = Depends(security.get_current_principal)):
+    return principal
 
 @router.post("/users", response_model=schemas.UserResponse)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_username(db, username=user.username)
+async def create_user(user: schemas.UserCreate, db: DbSession = Depends(get_db),
+                      principal: security.Principal = Depends(security.get_current_principal)):
+    if not principal.is_admin:
+        raise HTTPException(status_code=403, detail="Only admins can create users")
+    db_user = await crud_async.get_user_by_username(db, username=user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    return crud.create_user(db=db, user=user)
+    try:
+        password_hash = await hashing.hash_password_async(user.password)
+    except hashing.HashPoolBusy as e:
+        raise _busy(e)
+    return await crud_async.create_user(db, user=user, password_hash=password_hash)
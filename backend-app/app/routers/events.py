@@ -0,0 +1,49 @@
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from app import events
+from app.security import Principal, get_current_principal, require_metrics_token
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+# Через сколько браузер переподключается после обрыва
+RECONNECT_MS = 3000
+
+def format_event(data: dict) -> str:
+    """Событие в формате SSE. Строку id: пишем, только если у события есть id"""
+    lines = [f"id: {data['id']}"] if data.get("id") is not None else []
+    lines += [f"event: {data['type']}", f"data: {json.dumps(data, default=str)}"]
+    return "\n".join(lines) + "\n\n"
+
+@router.get("/stream")
+async def stream_events(principal: Principal = Depends(get_current_principal)):
+    """
+    SSE-лента изменений заявок, которые пользователь может видеть.
+    Генератор живет на event loop и ждет очередь подписчика — поток на соединение не занимается
+    """
+    try:
+        subscriber = events.broadcaster.subscribe(principal.id, privileged=principal.privileged)
+    except OverflowError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    async def body():
+        try:
+            yield f"retry: {RECONNECT_MS}\n\n"
+            while True:
+                try:
+                    data = await asyncio.wait_for(subscriber.queue.get(), events.EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_event(data)
+        finally:
+            # Starlette отменяет генератор при отключении клиента
+            events.broadcaster.unsubscribe(subscriber)
+
+    return StreamingResponse(body(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/stats", dependencies=[Depends(require_metrics_token)])
+def events_stats():
+    return events.broadcaster.stats()
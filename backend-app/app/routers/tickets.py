@@ -1,75 +1,279 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from typing import List, Optional
-import os
-import boto3
-from app.database import get_db
-from app import crud, schemas
-
-router = APIRouter(prefix="/tickets", tags=["tickets"])
-
-# Конфигурация OCI Object Storage
-OCI_ACCESS_KEY = os.getenv('OCI_ACCESS_KEY')
-OCI_SECRET_KEY = os.getenv('OCI_SECRET_KEY')
-OCI_REGION = os.getenv('OCI_REGION', 'il-jerusalem-1')
-OCI_NAMESPACE = os.getenv('OCI_NAMESPACE')
-OCI_BUCKET_NAME = os.getenv('OCI_BUCKET_NAME')
-
-# Инициализация клиента S3 для Oracle
-s3_client = boto3.client(
-    's3',
-    aws_access_key_id=OCI_ACCESS_KEY,
-    aws_secret_access_key=OCI_SECRET_KEY,
-    region_name=OCI_REGION,
-    endpoint_url=f"https://{OCI_NAMESPACE}.compat.objectstorage.{OCI_REGION}.oraclecloud.com"
-)
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Response, Header
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+import csv
+import io
+import queue
+from app.database import DbSession, get_db, get_read_db, reads_from_replica, DB_REPLICA_CACHE_TTL
+from app.security import Principal, get_current_principal
+from app import cache, crud, crud_async, export, models, schemas, serialization, storage, uploads
+
+# SpoolRoute: вложения из формы сразу ложатся в каталог очереди загрузок (app/uploads.py)
+router = APIRouter(prefix="/tickets", tags=["tickets"], route_class=uploads.SpoolRoute)
+
+IMPORT_MAX_ROWS = 50000
+
+def _require_staff(principal: Principal):
+    if not principal.privileged:
+        raise HTTPException(status_code=403, detail="Only staff can do bulk operations")
+
+def _scope(principal: Principal) -> dict:
+    """Кто смотрит: crud отдает только видимые ему заявки, чужие — как несуществующие (404)"""
+    return {"user_id": principal.id, "is_admin": principal.is_admin, "is_staff": principal.is_staff}
+
+async def _require_active(db: DbSession, ticket_id: int, principal: Principal):
+    """Архивная заявка только для чтения (409), чужая или несуществующая — 404"""
+    state = await crud_async.ticket_state(db, ticket_id, **_scope(principal))
+    if state is None:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    if state == crud.TICKET_ARCHIVED:
+        raise HTTPException(status_code=409, detail="Ticket is archived and read-only")
+
+def _read_csv(fileobj):
+    """CSV с заголовком (title,description,creator_id,assignee_id,status) -> список словарей"""
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        rows = []
+        for row in csv.DictReader(text):
+            if len(rows) >= IMPORT_MAX_ROWS:
+                raise HTTPException(status_code=413, detail=f"Import is limited to {IMPORT_MAX_ROWS} rows")
+            # Пустые ячейки — как отсутствующие поля
+            rows.append({k: v for k, v in row.items() if k and v not in (None, "")})
+        return rows
+    finally:
+        text.detach()
 
 @router.post("/", response_model=schemas.TicketResponse)
-def create_ticket(ticket: schemas.TicketCreate, db: Session = Depends(get_db)):
-    return crud.create_ticket(db, ticket)
-
-@router.get("/", response_model=List[schemas.TicketResponse])
-def read_tickets(
-    user_id: int, 
-    is_admin: bool = False, 
-    is_staff: bool = False,
-    db: Session = Depends(get_db)
+async def create_ticket(ticket: schemas.TicketCreate, db: DbSession = Depends(get_db),
+                        principal: Principal = Depends(get_current_principal)):
+    # Автор — всегда тот, кто вошел, а не creator_id из тела запроса
+    ticket = ticket.model_copy(update={"creator_id": principal.id})
+    return await crud_async.create_ticket(db, ticket)
+
+@router.get("/", response_model=schemas.TicketPage)
+async def read_tickets(
+    status: Optional[str] = None,
+    assignee_id: Optional[int] = None,
+    creator_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: DbSession = Depends(get_read_db),
+    principal: Principal = Depends(get_current_principal)
+):
+    privileged = principal.privileged
+    # Ключ — фактический запрос: сотрудники видят одно и то же, остальные — только свое
+    key = (
+        None if privileged else principal.id, privileged,
+        status, assignee_id, creator_id, created_from, created_to, cursor, limit,
+    )
+    version = await cache.tickets_version.aget()
+    if version is not None:
+        body = cache.ticket_lists.get((version, key))
+        if body is not None:
+            return Response(content=body, media_type="application/json")
+
+    try:
+        items, next_cursor = await crud_async.get_tickets(
+            db, user_id=principal.id, is_admin=principal.is_admin, is_staff=principal.is_staff,
+            status=status, assignee_id=assignee_id, creator_id=creator_id,
+            created_from=created_from, created_to=created_to,
+            cursor=cursor, limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Строки из базы сразу в JSON, без ORM-объектов и TicketResponse (см. app/serialization.py)
+    body = serialization.ticket_page(items, next_cursor)
+    # Версия взята до запроса: если запись успела пройти параллельно, ответ ляжет под старой версией.
+    # С реплики — ненадолго: она могла еще не получить запись, ради которой версия сменилась
+    if version is not None:
+        cache.ticket_lists.set((version, key), body, ttl=DB_REPLICA_CACHE_TTL if reads_from_replica() else None)
+    return Response(content=body, media_type="application/json")
+
+# Статические пути объявляются раньше /{ticket_id}, иначе он перехватит их с 422
+@router.get("/search", response_model=schemas.TicketSearchPage)
+async def search_tickets(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    db: DbSession = Depends(get_db),
+    principal: Principal = Depends(get_current_principal)
 ):
-    return crud.get_tickets(db, user_id=user_id, is_admin=is_admin, is_staff=is_staff)
+    """Поиск по заголовку, описанию заявок и комментариям отчетов, с ранжированием"""
+    items, next_offset = await crud_async.search_tickets(
+        db, q, user_id=principal.id, is_admin=principal.is_admin, is_staff=principal.is_staff,
+        limit=limit, offset=offset
+    )
+    return Response(content=serialization.ticket_search_page(items, next_offset), media_type="application/json")
+
+@router.get("/stats", response_model=schemas.TicketStats)
+async def ticket_stats(db: DbSession = Depends(get_db), principal: Principal = Depends(get_current_principal)):
+    return await crud_async.get_ticket_stats(db, user_id=principal.id, is_admin=principal.is_admin,
+                                             is_staff=principal.is_staff)
+
+@router.post("/stats/rebuild", response_model=schemas.TicketStats)
+async def rebuild_ticket_stats(db: DbSession = Depends(get_db), principal: Principal = Depends(get_current_principal)):
+    if not principal.is_admin:
+        raise HTTPException(status_code=403, detail="Only admin can rebuild counters")
+    if not crud.STATS_COUNTERS:
+        raise HTTPException(status_code=409, detail="Counters are disabled (STATS_COUNTERS=false)")
+    await crud_async.rebuild_counters(db)
+    return await crud_async.get_ticket_stats(db, user_id=principal.id, is_admin=True)
+
+@router.get("/export")
+def export_tickets(
+    status: Optional[str] = None,
+    assignee_id: Optional[int] = None,
+    creator_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    format: str = "csv",
+    include_reports: bool = False,
+    include_archived: bool = False,
+    gzip: bool = False,
+    principal: Principal = Depends(get_current_principal),
+):
+    """
+    Потоковая выгрузка (app/export.py). По умолчанию — только рабочие заявки: перенесенные
+    в архив попадают в нее лишь с include_archived=true (после рабочих, с колонкой archived_at)
+    """
+    if format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format, use one of: {', '.join(export.FORMATS)}")
+    # Своя сессия внутри генератора: ответ стримится уже после выхода из обработчика
+    body = export.stream(
+        fmt=format, include_reports=include_reports, include_archived=include_archived, gzip=gzip,
+        user_id=principal.id, is_admin=principal.is_admin, is_staff=principal.is_staff,
+        status=status, assignee_id=assignee_id, creator_id=creator_id,
+        created_from=created_from, created_to=created_to,
+    )
+    filename = f"tickets.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        body,
+        media_type="application/gzip" if gzip else export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.post("/claim", response_model=List[schemas.TicketResponse])
+async def claim_tickets(
+    batch: int = Query(1, ge=1, le=50),
+    db: DbSession = Depends(get_db),
+    principal: Principal = Depends(get_current_principal)
+):
+    """Взять в работу самые старые свободные заявки (до batch штук). Пустой список — очередь пуста"""
+    if not principal.privileged:
+        raise HTTPException(status_code=403, detail="Only staff can claim tickets")
+    return await crud_async.claim_tickets(db, user_id=principal.id, limit=batch)
+
+# --- Массовые операции ---
+
+@router.post("/bulk/status", response_model=schemas.BulkResult)
+async def bulk_update_status(body: schemas.BulkStatusUpdate, db: DbSession = Depends(get_db),
+                             principal: Principal = Depends(get_current_principal)):
+    _require_staff(principal)
+    return await crud_async.bulk_update_status(db, body.ids, body.status, principal.id)
+
+@router.post("/bulk/assign", response_model=schemas.BulkResult)
+async def bulk_assign(body: schemas.BulkAssign, db: DbSession = Depends(get_db),
+                      principal: Principal = Depends(get_current_principal)):
+    _require_staff(principal)
+    return await crud_async.bulk_assign(db, body.ids, body.assignee_id, principal.id)
+
+@router.post("/bulk/delete", response_model=schemas.BulkResult)
+async def bulk_delete(body: schemas.BulkIds, db: DbSession = Depends(get_db),
+                      principal: Principal = Depends(get_current_principal)):
+    if not principal.is_admin:
+        raise HTTPException(status_code=403, detail="Only admins can delete tickets")
+    return await crud_async.bulk_delete(db, body.ids)
+
+@router.post("/bulk/import", response_model=schemas.BulkResult)
+async def bulk_import(rows: List[Dict[str, Any]], db: DbSession = Depends(get_db),
+                      principal: Principal = Depends(get_current_principal)):
+    """Импорт из JSON-массива; строки валидируются по отдельности и получают свой результат"""
+    if not principal.is_admin:
+        raise HTTPException(status_code=403, detail="Only admins can import tickets")
+    if len(rows) > IMPORT_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Import is limited to {IMPORT_MAX_ROWS} rows")
+    return await crud_async.bulk_import(db, rows, principal.id)
+
+@router.post("/bulk/import/csv", response_model=schemas.BulkResult)
+async def bulk_import_csv(file: UploadFile = File(...), db: DbSession = Depends(get_db),
+                          principal: Principal = Depends(get_current_principal)):
+    if not principal.is_admin:
+        raise HTTPException(status_code=403, detail="Only admins can import tickets")
+    try:
+        rows = await run_in_threadpool(_read_csv, file.file)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV must be UTF-8")
+    return await crud_async.bulk_import(db, rows, principal.id)
 
 @router.get("/{ticket_id}", response_model=schemas.TicketResponse)
-def read_ticket(ticket_id: int, db: Session = Depends(get_db)):
-    return crud.get_ticket(db, ticket_id)
+async def read_ticket(ticket_id: int, db: DbSession = Depends(get_read_db),
+                      principal: Principal = Depends(get_current_principal)):
+    # Закрытые давно заявки лежат в архиве (tickets_archive) — ищем и там
+    ticket = await crud_async.get_ticket_or_archived(db, ticket_id, **_scope(principal))
+    if ticket is None:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    return ticket
+
+@router.get("/{ticket_id}/view", response_model=schemas.TicketView)
+async def read_ticket_view(
+    ticket_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: DbSession = Depends(get_db),
+    principal: Principal = Depends(get_current_principal)
+):
+    """
+    Заявка и ее отчеты за один запрос, с ETag.
+    Если клиент прислал актуальный If-None-Match — отвечаем 304 без загрузки и сериализации данных
+    """
+    etag = await crud_async.get_ticket_etag(db, ticket_id, **_scope(principal))
+    if etag is None:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    view = await crud_async.get_ticket_view(db, ticket_id, **_scope(principal))
+    if view is None:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    response.headers.update(headers)
+    return view
 
 @router.put("/{ticket_id}", response_model=schemas.TicketResponse)
-def update_ticket(
+async def update_ticket(
     ticket_id: int, 
     ticket_update: schemas.TicketUpdate,
-    user_id: int,
-    is_admin: bool = False,
-    is_staff: bool = False,
-    db: Session = Depends(get_db)
+    db: DbSession = Depends(get_db),
+    principal: Principal = Depends(get_current_principal)
 ):
-    db_ticket = crud.get_ticket(db, ticket_id)
-    if not db_ticket:
+    try:
+        updated_ticket = await crud_async.update_ticket(
+            db, 
+            ticket_id=ticket_id, 
+            ticket_update=ticket_update,
+            user_id=principal.id,
+            is_staff=principal.is_staff,
+            is_admin=principal.is_admin
+        )
+    except crud.TicketVersionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if updated_ticket is None:
+        if await crud_async.ticket_state(db, ticket_id, **_scope(principal)) == crud.TICKET_ARCHIVED:
+            raise HTTPException(status_code=409, detail="Ticket is archived and read-only")
         raise HTTPException(status_code=404, detail="Ticket not found")
-
-    updated_ticket = crud.update_ticket(
-        db, 
-        ticket_id=ticket_id, 
-        ticket_update=ticket_update,
-        user_id=user_id,
-        is_staff=is_staff,
-        is_admin=is_admin
-    )
     return updated_ticket
 
 @router.delete("/{ticket_id}")
-def delete_ticket(ticket_id: int, is_admin: bool = False, db: Session = Depends(get_db)):
-    if not is_admin:
+async def delete_ticket(ticket_id: int, db: DbSession = Depends(get_db),
+                        principal: Principal = Depends(get_current_principal)):
+    if not principal.is_admin:
         raise HTTPException(status_code=403, detail="Only admins can delete tickets")
     
-    success = crud.delete_ticket_force(db, ticket_id)
+    success = await crud_async.delete_ticket_force(db, ticket_id)
     if not success:
         raise HTTPException(status_code=404, detail="Ticket not found")
     return {"status": "deleted"}
@@ -77,29 +281,89 @@ def delete_ticket(ticket_id: int, is_admin: bool = False, db: Session = Depends(
 # --- ВОТ ЭТОТ БЛОК МЫ ИСПРАВИЛИ И ДОБАВИЛИ ---
 
 @router.post("/{ticket_id}/reports")
-def add_report(
+async def add_report(
     ticket_id: int,
     comment: str = Form(...), # Получаем текст из формы
     file: Optional[UploadFile] = File(None), # Получаем файл из формы (если есть)
-    db: Session = Depends(get_db)
+    db: DbSession = Depends(get_db),
+    principal: Principal = Depends(get_current_principal)
 ):
-    """Эндпоинт для ЗАГРУЗКИ отчета и файла (POST)"""
+    """
+    Эндпоинт для ЗАГРУЗКИ отчета и файла (POST).
+    Отчет сохраняется сразу, файл догружается в bucket фоновой очередью (app/uploads.py)
+    """
+    # До приема файла: к чужой, несуществующей или архивной заявке ничего не спулим
+    await _require_active(db, ticket_id, principal)
     file_path = None
-    if file:
-        file_path = f"tickets/{ticket_id}/{file.filename}"
+    spool_path = None
+    content_hash = None
+    file_size = None
+    attachment_state = None
+    # Пустой input type=file тоже приходит частью формы — но без имени
+    if file and file.filename:
+        if storage.file_size(file.file) > storage.UPLOAD_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"File is larger than {storage.UPLOAD_MAX_BYTES} bytes")
+        spool_path, content_hash, file_size = await run_in_threadpool(uploads.spool, file.file)
+        file_path = storage.blob_key(content_hash)
+        if await crud_async.blob_is_stored(db, content_hash):
+            # Такой файл уже лежит в bucket — отчет просто ссылается на него
+            uploads.discard(spool_path)
+            spool_path = None
+            attachment_state = models.ATTACHMENT_DONE
+        else:
+            attachment_state = models.ATTACHMENT_PENDING
+
+    report = await crud_async.create_report(
+        db, ticket_id, comment, file_path, attachment_state,
+        file_name=file.filename if file_path else None,
+        file_size=file_size,
+        content_type=file.content_type if file_path else None,
+        content_hash=content_hash,
+    )
+    if report is None:
+        # Заявку удалили или перенесли в архив, пока принимали файл
+        if spool_path:
+            uploads.discard(spool_path)
+        await _require_active(db, ticket_id, principal)
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    if spool_path:
         try:
-            s3_client.upload_fileobj(file.file, OCI_BUCKET_NAME, file_path)
-        except Exception as e:
-            print(f"Error uploading to OCI: {e}")
-            raise HTTPException(status_code=500, detail="Could not upload file to cloud storage")
-            
-    crud.create_report(db, ticket_id, comment, file_path)
-    return {"status": "ok"}
+            spool_path = await run_in_threadpool(uploads.keep, spool_path, report.id)
+            uploads.upload_queue.submit(uploads.UploadJob(report.id, spool_path, file_path, file.content_type))
+        except queue.Full:
+            # Комментарий не теряем, но вложение сохранить не удалось
+            uploads.discard(spool_path)
+            attachment_state = models.ATTACHMENT_FAILED
+            await crud_async.set_attachment_state(db, report.id, attachment_state)
+    return {"status": "ok", "report_id": report.id, "attachment_state": attachment_state}
 
 @router.get("/{ticket_id}/reports", response_model=List[schemas.ReportResponse])
-def get_reports(ticket_id: int, db: Session = Depends(get_db)):
+async def get_reports(ticket_id: int, db: DbSession = Depends(get_read_db),
+                      principal: Principal = Depends(get_current_principal)):
     """
     ЭТОГО НЕ БЫЛО! Эндпоинт для ПОЛУЧЕНИЯ списка отчетов (GET).
     Именно из-за отсутствия этой функции ты получал ошибку 405 и пустой список.
     """
-    return crud.get_reports_by_ticket(db, ticket_id=ticket_id)
\ No newline at end of file
+    reports = await crud_async.get_reports_by_ticket(db, ticket_id=ticket_id, **_scope(principal))
+    if reports is None:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    return reports
+
+@router.get("/{ticket_id}/reports/{report_id}/attachment", response_model=schemas.AttachmentURL)
+async def get_attachment_url(ticket_id: int, report_id: int, response: Response, db: DbSession = Depends(get_db),
+                             principal: Principal = Depends(get_current_principal)):
+    """Подписанная ссылка на скачивание вложения отчета"""
+    if await crud_async.ticket_state(db, ticket_id, **_scope(principal)) is None:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    report = await crud_async.get_report(db, report_id)
+    if report is None:
+        report = await crud_async.get_archived_report(db, ticket_id, report_id)
+    if not report or report.ticket_id != ticket_id or not report.file_path:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    if report.attachment_state not in (None, models.ATTACHMENT_DONE):
+        raise HTTPException(status_code=409, detail=f"Attachment is {report.attachment_state}")
+
+    url, expires_in = storage.presigned_get_url(report.file_path, report.file_name, report.content_type)
+    # Браузер может переиспользовать ссылку, пока она гарантированно не протухла
+    response.headers["Cache-Control"] = f"private, max-age={max(expires_in - 60, 0)}"
+    return {"url": url, "expires_in": expires_in}
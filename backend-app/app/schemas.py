@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, List
 from datetime import datetime
 
 class UserBase(BaseModel):
@@ -17,23 +17,45 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True
 
+class LoginResponse(UserResponse):
+    # Передается в Authorization: Bearer <access_token> во всех остальных запросах
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
+
 class ReportResponse(BaseModel):
     id: int
     comment: Optional[str]
     file_path: Optional[str]
+    file_name: Optional[str] = None
+    file_size: Optional[int] = None
+    content_type: Optional[str] = None
+    attachment_state: Optional[str] = None
     created_at: datetime
     class Config:
         from_attributes = True
 
+class ArchivedReport(ReportResponse):
+    """Отчет архивной заявки (элемент tickets_archive.reports)"""
+    ticket_id: int
+    content_hash: Optional[str] = None
+
+class AttachmentURL(BaseModel):
+    url: str
+    expires_in: int
+
 class TicketCreate(BaseModel):
     title: str
     description: str
-    creator_id: int
+    # Заполняется из токена; значение из запроса игнорируется
+    creator_id: Optional[int] = None
 
 class TicketUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
     status: Optional[str] = None
+    # Версия, которую видел клиент; если задана и устарела — 409 Conflict
+    version: Optional[int] = None
 
 class TicketResponse(BaseModel):
     id: int
@@ -45,6 +67,9 @@ class TicketResponse(BaseModel):
     last_editor_id: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
+    version: int = 1
+    # Заявка перенесена в архив (только чтение); None — рабочая заявка
+    archived_at: Optional[datetime] = None
     
     # --- МАГИЯ ЗДЕСЬ ---
     # Эти поля позволят фронтенду обращаться к именам: ticket.creator.username
@@ -53,4 +78,65 @@ class TicketResponse(BaseModel):
     last_editor: Optional[UserResponse] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class TicketPage(BaseModel):
+    items: List[TicketResponse]
+    # Передается обратно в GET /tickets/?cursor=... для следующей страницы; None — страниц больше нет
+    next_cursor: Optional[str] = None
+
+class TicketSearchPage(BaseModel):
+    items: List[TicketResponse]
+    # offset следующей страницы результатов; None — это последняя
+    next_offset: Optional[int] = None
+
+class TicketView(BaseModel):
+    """Все для страницы заявки одним ответом: заявка, вложенные пользователи и отчеты"""
+    ticket: TicketResponse
+    reports: List[ReportResponse]
+
+# --- Массовые операции ---
+
+class BulkIds(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=5000)
+
+class BulkStatusUpdate(BulkIds):
+    status: str
+
+class BulkAssign(BulkIds):
+    # None — снять исполнителя
+    assignee_id: Optional[int] = None
+
+class TicketImport(BaseModel):
+    """Строка импорта; creator_id по умолчанию — тот, кто импортирует"""
+    title: str = Field(..., min_length=1)
+    description: str = ""
+    creator_id: Optional[int] = None
+    assignee_id: Optional[int] = None
+    status: str = "new"
+
+class BulkItemResult(BaseModel):
+    # Позиция в запросе (id для операций над заявками, номер строки для импорта)
+    index: int
+    id: Optional[int] = None
+    ok: bool
+    error: Optional[str] = None
+
+class BulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
+
+class AssigneeLoad(BaseModel):
+    assignee_id: Optional[int] = None  # None — заявки без исполнителя
+    username: Optional[str] = None
+    open: int
+
+class TicketStats(BaseModel):
+    total: int
+    by_status: Dict[str, int]
+    # Открытые (не closed) заявки по исполнителям
+    by_assignee: List[AssigneeLoad]
+    created_today: int
+    # "counters" — из таблицы ticket_counters, "query" — GROUP BY по tickets
+    source: str
@@ -0,0 +1,69 @@
+"""
+Полнотекстовый поиск по заявкам (title, description) и отчетам (comment).
+
+Postgres: генерируемые tsvector-колонки с GIN-индексами — база сама держит их актуальными при записи.
+SQLite (локальный запуск): FTS5-таблицы с внешним содержимым, синхронизируемые триггерами.
+И то и другое создает миграция migrations/versions/0001d.
+"""
+import os
+import re
+from sqlalchemy import text
+
+# Конфигурация текстового поиска Postgres. 'simple' не делает стемминг,
+# зато одинаково работает для смешанного русского и английского текста.
+# Должна совпадать с той, с которой применялась миграция 0001d (генерируемые колонки)
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', 'simple')
+# Совпадение в отчете весит меньше, чем в самой заявке
+REPORT_RANK_WEIGHT = 0.5
+
+# Общая часть: лучший ранг на заявку, ограничение видимости и страница
+_RANKED = """
+    SELECT hits.ticket_id, max(hits.rank) AS rank
+    FROM ({hits}) AS hits
+    JOIN tickets t ON t.id = hits.ticket_id
+    WHERE :privileged OR t.creator_id = :user_id OR t.assignee_id = :user_id
+    GROUP BY hits.ticket_id
+    ORDER BY rank DESC, hits.ticket_id DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+_POSTGRES_HITS = """
+    SELECT id AS ticket_id, ts_rank(search_vector, websearch_to_tsquery(CAST(:cfg AS regconfig), :q)) AS rank
+    FROM tickets WHERE search_vector @@ websearch_to_tsquery(CAST(:cfg AS regconfig), :q)
+    UNION ALL
+    SELECT ticket_id, ts_rank(search_vector, websearch_to_tsquery(CAST(:cfg AS regconfig), :q)) * :report_weight
+    FROM reports WHERE search_vector @@ websearch_to_tsquery(CAST(:cfg AS regconfig), :q)
+"""
+
+# bm25() в FTS5 тем лучше, чем меньше — разворачиваем знак, чтобы сортировать как в Postgres
+_SQLITE_HITS = """
+    SELECT rowid AS ticket_id, -bm25(tickets_fts) AS rank FROM tickets_fts WHERE tickets_fts MATCH :q
+    UNION ALL
+    SELECT r.ticket_id, -bm25(reports_fts) * :report_weight
+    FROM reports_fts JOIN reports r ON r.id = reports_fts.rowid WHERE reports_fts MATCH :q
+"""
+
+
+def _fts5_query(q: str) -> str:
+    """Пользовательский ввод -> FTS5: каждое слово в кавычках (без синтаксиса FTS5), все слова обязательны"""
+    words = re.findall(r"\w+", q)
+    return " ".join('"%s"' % w for w in words)
+
+
+def ranked_ticket_ids(db, q: str, user_id: int = None, privileged: bool = False, limit: int = 20, offset: int = 0):
+    """[(ticket_id, rank)] по убыванию релевантности"""
+    params = {"user_id": user_id, "privileged": privileged, "limit": limit, "offset": offset,
+              "report_weight": REPORT_RANK_WEIGHT}
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        sql = _RANKED.format(hits=_POSTGRES_HITS)
+        params.update(q=q, cfg=SEARCH_CONFIG)
+    elif dialect == "sqlite":
+        query = _fts5_query(q)
+        if not query:
+            return []
+        sql = _RANKED.format(hits=_SQLITE_HITS)
+        params.update(q=query)
+    else:
+        raise NotImplementedError(f"Full-text search is not supported on {dialect}")
+    return [(row.ticket_id, row.rank) for row in db.execute(text(sql), params)]
@@ -0,0 +1,119 @@
+"""
+Токены сессии и текущий пользователь запроса.
+
+После логина бэкенд выдает подписанный HMAC токен (id пользователя и срок действия).
+Последующие запросы присылают его в Authorization: Bearer ..., а пользователь берется
+из TTL-кэша по id — без запроса к users и без доверия к user_id/is_admin из параметров.
+"""
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Depends, Header, HTTPException
+
+from app import crud_async
+from app.cache import TTLCache
+from app.database import DbSession, get_db
+
+logger = logging.getLogger(__name__)
+
+# dev — локальный запуск: там можно без AUTH_SECRET
+APP_ENV = os.getenv('APP_ENV', 'production')
+# Общий для всех реплик секрет подписи. Случайный секрет свой у каждого процесса — токен одной
+# реплики другая не примет, а после рестарта все сессии сбрасываются. Поэтому вне dev без него не стартуем
+AUTH_SECRET = os.getenv('AUTH_SECRET')
+if not AUTH_SECRET:
+    if APP_ENV != 'dev':
+        raise RuntimeError("AUTH_SECRET is not set (set APP_ENV=dev to use a random per-process secret)")
+    logger.warning("AUTH_SECRET is not set, using a random per-process secret")
+    AUTH_SECRET = secrets.token_urlsafe(32)
+TOKEN_TTL = int(os.getenv('TOKEN_TTL', 12 * 3600))
+# Служебные эндпоинты (/metrics, /cache/stats, /db/pool, /events/stats) — только с
+# Authorization: Bearer <METRICS_TOKEN> (bearer_token в конфиге scrape Prometheus).
+# Без токена они выключены; открыты только в dev
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+# Как быстро до реплики доходят изменения прав пользователя
+PRINCIPAL_CACHE_TTL = float(os.getenv('PRINCIPAL_CACHE_TTL', 60))
+PRINCIPAL_CACHE_SIZE = int(os.getenv('PRINCIPAL_CACHE_SIZE', 4096))
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    username: str
+    is_admin: bool
+    is_staff: bool
+
+    @property
+    def privileged(self) -> bool:
+        return self.is_admin or self.is_staff
+
+
+principals = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _sign(payload: str) -> str:
+    return _b64(hmac.new(AUTH_SECRET.encode(), payload.encode(), hashlib.sha256).digest())
+
+
+def issue_token(user_id: int) -> str:
+    """Токен вида <user_id>.<expires_at>.<подпись>"""
+    payload = f"{user_id}.{int(time.time()) + TOKEN_TTL}"
+    return f"{payload}.{_sign(payload)}"
+
+
+def read_token(token: str) -> Optional[int]:
+    """id пользователя из токена или None, если подпись неверна или срок вышел"""
+    payload, _, signature = token.rpartition(".")
+    if not payload or not hmac.compare_digest(signature.encode(), _sign(payload).encode()):
+        return None
+    try:
+        user_id, expires_at = (int(part) for part in payload.split("."))
+    except ValueError:
+        return None
+    return user_id if expires_at > time.time() else None
+
+
+def principal_from_user(user) -> Principal:
+    principal = Principal(id=user.id, username=user.username,
+                          is_admin=bool(user.is_admin), is_staff=bool(user.is_staff))
+    principals.set(user.id, principal)
+    return principal
+
+
+def require_metrics_token(authorization: Optional[str] = Header(None)):
+    if not METRICS_TOKEN:
+        if APP_ENV == 'dev':
+            return
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest((authorization or "").encode(), f"Bearer {METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+
+async def get_current_principal(authorization: Optional[str] = Header(None),
+                                db: DbSession = Depends(get_db)) -> Principal:
+    scheme, _, token = (authorization or "").partition(" ")
+    user_id = read_token(token) if scheme.lower() == "bearer" else None
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Not authenticated",
+                            headers={"WWW-Authenticate": "Bearer"})
+    principal = principals.get(user_id)
+    if principal is None:
+        user = await crud_async.get_user(db, user_id)
+        if user is None:
+            raise HTTPException(status_code=401, detail="User no longer exists",
+                                headers={"WWW-Authenticate": "Bearer"})
+        principal = principal_from_user(user)
+    return principal
+
@@ -0,0 +1,55 @@
+"""
+Быстрая сериализация списков заявок.
+
+Списки строятся не из ORM-объектов через TicketResponse, а прямо из строк SELECT
+(см. crud._ticket_list_select): данные из своей базы повторно не валидируются, словари
+собираются вручную в порядке полей TicketResponse, JSON кодирует orjson.
+Формат ответа тот же, что у model_dump_json (в том числе "Z" у времени в UTC).
+"""
+import orjson
+
+# OPT_UTC_Z — как pydantic: 2026-01-01T00:00:00Z, а не +00:00
+_OPTIONS = orjson.OPT_UTC_Z
+
+
+def dumps(obj) -> bytes:
+    return orjson.dumps(obj, option=_OPTIONS)
+
+
+def _user(user_id, username, is_admin, is_staff):
+    if user_id is None:
+        return None
+    return {"username": username, "id": user_id, "is_admin": is_admin, "is_staff": is_staff}
+
+
+def ticket_item(row) -> dict:
+    """Строка crud._ticket_list_select -> словарь в форме TicketResponse"""
+    # Распаковка по позиции заметно дешевле доступа к полям Row по имени — на 10k строк это половина времени
+    (ticket_id, title, description, status, creator_id, assignee_id, last_editor_id, created_at, updated_at,
+     version, *users) = row
+    return {
+        "id": ticket_id,
+        "title": title,
+        "description": description,
+        "status": status,
+        "creator_id": creator_id,
+        "assignee_id": assignee_id,
+        "last_editor_id": last_editor_id,
+        "created_at": created_at,
+        "updated_at": updated_at,
+        "version": version,
+        "archived_at": None,
+        "creator": _user(*users[0:4]),
+        "assignee": _user(*users[4:8]),
+        "last_editor": _user(*users[8:12]),
+    }
+
+
+def ticket_page(rows, next_cursor) -> bytes:
+    """Тело TicketPage"""
+    return dumps({"items": [ticket_item(row) for row in rows], "next_cursor": next_cursor})
+
+
+def ticket_search_page(rows, next_offset) -> bytes:
+    """Тело TicketSearchPage"""
+    return dumps({"items": [ticket_item(row) for row in rows], "next_offset": next_offset})
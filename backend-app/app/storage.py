@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from urllib.parse import quote
+from botocore.exceptions import ClientError
+from app import metrics
+from app.cache import TTLCache
+
+# Конфигурация OCI Object Storage
+OCI_ACCESS_KEY = os.getenv('OCI_ACCESS_KEY')
+OCI_SECRET_KEY = os.getenv('OCI_SECRET_KEY')
+OCI_REGION = os.getenv('OCI_REGION', 'il-jerusalem-1')
+OCI_NAMESPACE = os.getenv('OCI_NAMESPACE')
+OCI_BUCKET_NAME = os.getenv('OCI_BUCKET_NAME')
+# Переопределение endpoint-а (локальный S3: moto, minio)
+S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL', f"https://{OCI_NAMESPACE}.compat.objectstorage.{OCI_REGION}.oraclecloud.com")
+
+# Лимиты загрузки вложений
+UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', 100 * 1024 * 1024))
+# Файлы больше одной части идут multipart-загрузкой, части грузятся параллельно.
+# Память на загрузку ограничена примерно UPLOAD_PART_SIZE * UPLOAD_CONCURRENCY независимо от размера файла
+UPLOAD_PART_SIZE = int(os.getenv('UPLOAD_PART_SIZE', 8 * 1024 * 1024))
+UPLOAD_CONCURRENCY = int(os.getenv('UPLOAD_CONCURRENCY', 4))
+
+# Presigned-ссылки на скачивание: живут PRESIGN_TTL секунд, в кэше держатся половину этого срока,
+# так что выданная из кэша ссылка всегда действительна еще минимум PRESIGN_TTL / 2
+PRESIGN_TTL = int(os.getenv('PRESIGN_TTL', 3600))
+PRESIGN_CACHE_SIZE = int(os.getenv('PRESIGN_CACHE_SIZE', 2048))
+
+# Клиент S3 для Oracle создается при первом обращении: импорт boto3 и boto3.client
+# (описания сервисов botocore) — заметная доля холодного старта, а нужны они только вложениям
+_s3_client = None
+_s3_client_lock = threading.Lock()
+transfer_config = None
+
+def s3_client():
+    global _s3_client, transfer_config
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                import boto3
+                from boto3.s3.transfer import TransferConfig
+
+                transfer_config = TransferConfig(
+                    multipart_threshold=UPLOAD_PART_SIZE,
+                    multipart_chunksize=UPLOAD_PART_SIZE,
+                    max_concurrency=UPLOAD_CONCURRENCY,
+                    io_chunksize=256 * 1024,
+                )
+                _s3_client = boto3.client(
+                    's3',
+                    aws_access_key_id=OCI_ACCESS_KEY,
+                    aws_secret_access_key=OCI_SECRET_KEY,
+                    region_name=OCI_REGION,
+                    endpoint_url=S3_ENDPOINT_URL
+                )
+    return _s3_client
+
+class UploadTooLarge(Exception):
+    pass
+
+def file_size(fileobj) -> int:
+    """Размер файла без чтения в память (UploadFile хранит большие тела на диске)"""
+    pos = fileobj.tell()
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(pos)
+    return size
+
+def upload_fileobj(fileobj, key: str, content_type: str = None):
+    """Потоковая загрузка в bucket частями, без буферизации файла целиком"""
+    size = file_size(fileobj)
+    if size > UPLOAD_MAX_BYTES:
+        raise UploadTooLarge(f"File is larger than {UPLOAD_MAX_BYTES} bytes")
+    extra_args = {'ContentType': content_type} if content_type else None
+    client = s3_client()
+    with metrics.storage_call("upload"):
+        client.upload_fileobj(fileobj, OCI_BUCKET_NAME, key, ExtraArgs=extra_args, Config=transfer_config)
+    metrics.STORAGE_BYTES.labels("upload").inc(size)
+    return size
+
+def blob_key(content_hash: str) -> str:
+    """Ключ объекта по SHA-256 содержимого; префикс из двух символов раскладывает объекты по "папкам" """
+    return f"blobs/sha256/{content_hash[:2]}/{content_hash}"
+
+def blob_exists(key: str) -> bool:
+    # 404 — обычный ответ "такого объекта нет", в метриках это не ошибка
+    with metrics.storage_call("head"):
+        try:
+            s3_client().head_object(Bucket=OCI_BUCKET_NAME, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+presigned_urls = TTLCache(maxsize=PRESIGN_CACHE_SIZE, ttl=PRESIGN_TTL / 2)
+
+def presigned_get_url(key: str, file_name: str = None, content_type: str = None):
+    """
+    Подписанная GET-ссылка на объект (bucket может быть приватным).
+    Возвращает (url, сколько секунд ссылка еще действительна)
+    """
+    cache_key = (key, file_name, content_type)
+    cached = presigned_urls.get(cache_key)
+    if cached:
+        url, expires_at = cached
+        return url, int(expires_at - time.time())
+
+    params = {'Bucket': OCI_BUCKET_NAME, 'Key': key}
+    if file_name:
+        # Объекты лежат под хэшем, исходное имя файла отдаем через заголовок ответа
+        params['ResponseContentDisposition'] = f"inline; filename*=UTF-8''{quote(file_name)}"
+    if content_type:
+        params['ResponseContentType'] = content_type
+    expires_at = time.time() + PRESIGN_TTL
+    with metrics.storage_call("presign"):
+        url = s3_client().generate_presigned_url('get_object', Params=params, ExpiresIn=PRESIGN_TTL)
+    presigned_urls.set(cache_key, (url, expires_at))
+    return url, PRESIGN_TTL
+
+def check_bucket():
+    """Проверка готовности: bucket доступен с нашими ключами (исключение, если нет)"""
+    with metrics.storage_call("head_bucket"):
+        s3_client().head_bucket(Bucket=OCI_BUCKET_NAME)
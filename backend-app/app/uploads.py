@@ -0,0 +1,305 @@
+"""
+Фоновая очередь загрузки вложений в Object Storage.
+
+Отчет сохраняется сразу со статусом вложения "pending", файл остается во временном
+файле на диске, а загрузку в bucket делает ограниченный пул потоков с повторами.
+Тело файла пишется на диск один раз: разбор формы (SpoolRoute) сразу складывает его
+в UPLOAD_SPOOL_DIR и по пути считает хэш, spool() только забирает готовый файл.
+Так скорость ответа на POST /tickets/{id}/reports не зависит от задержек хранилища,
+а временный сбой хранилища не теряет комментарий.
+
+Очередь живет в памяти процесса. Загрузки, прерванные рестартом, подбирает recover()
+(при старте и затем каждые UPLOAD_SWEEP_INTERVAL секунд): если файл отчета еще лежит
+в UPLOAD_SPOOL_DIR (upload-report-<id>), задача ставится заново; если файла нет —
+через UPLOAD_STALE_AFTER секунд после создания отчета вложение помечается failed.
+Клиент видит attachment_state: pending/uploading — файл загружается (после рестарта
+дольше обычного), done — ссылку можно получить, failed — файл потерян, нужно приложить заново.
+"""
+import hashlib
+import logging
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from tempfile import SpooledTemporaryFile
+from typing import Optional
+
+from fastapi.routing import APIRoute
+from starlette.exceptions import HTTPException
+from starlette.formparsers import MultiPartException, MultiPartParser
+from starlette.requests import Request
+
+from app import crud, models, storage
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', 2))
+UPLOAD_QUEUE_SIZE = int(os.getenv('UPLOAD_QUEUE_SIZE', 100))
+UPLOAD_RETRIES = int(os.getenv('UPLOAD_RETRIES', 5))
+UPLOAD_BACKOFF_SECONDS = float(os.getenv('UPLOAD_BACKOFF_SECONDS', 1.0))
+UPLOAD_BACKOFF_MAX_SECONDS = float(os.getenv('UPLOAD_BACKOFF_MAX_SECONDS', 30.0))
+# Куда складываются файлы до загрузки. В k8s — emptyDir: он переживает рестарт контейнера,
+# и recover() доделывает загрузки, но не пересоздание пода
+UPLOAD_SPOOL_DIR = os.getenv('UPLOAD_SPOOL_DIR') or tempfile.gettempdir()
+# Через сколько секунд загрузка без файла в UPLOAD_SPOOL_DIR считается потерянной.
+# Должно быть больше, чем живет задача в очереди со всеми повторами: файл может лежать у другой реплики
+UPLOAD_STALE_AFTER = float(os.getenv('UPLOAD_STALE_AFTER', 1800))
+# Период recover(); 0 — только один проход при старте
+UPLOAD_SWEEP_INTERVAL = float(os.getenv('UPLOAD_SWEEP_INTERVAL', 300))
+
+
+@dataclass
+class UploadJob:
+    report_id: int
+    spool_path: str
+    key: str
+    content_type: Optional[str] = None
+
+
+class SpoolFile(SpooledTemporaryFile):
+    """
+    Тело загружаемого файла. Как у Starlette, держится в памяти до max_size, но на диск
+    уходит именованным файлом в UPLOAD_SPOOL_DIR, а не анонимным в /tmp — его можно
+    переименовать под отчет без копирования. SHA-256 и размер считаются по мере записи.
+    Незабранный (claim) файл удаляется при закрытии, как обычный временный
+    """
+    def __init__(self, max_size: int):
+        super().__init__(max_size=max_size)
+        self.path = None
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self._claimed = False
+
+    def write(self, data):
+        self.digest.update(data)
+        self.size += len(data)
+        return super().write(data)
+
+    def rollover(self):
+        if self._rolled:
+            return
+        buffered = self._file
+        fd, self.path = tempfile.mkstemp(prefix='upload-', dir=UPLOAD_SPOOL_DIR)
+        self._file = os.fdopen(fd, 'w+b')
+        self._file.write(buffered.getvalue())
+        self._file.seek(buffered.tell())
+        self._rolled = True
+
+    def claim(self) -> str:
+        """Путь к файлу с телом целиком; дальше файлом распоряжается вызывающий"""
+        self.rollover()
+        self._file.flush()
+        self._claimed = True
+        return self.path
+
+    def close(self):
+        super().close()
+        if self.path and not self._claimed:
+            discard(self.path)
+
+
+class _SpoolingMultiPartParser(MultiPartParser):
+    def on_headers_finished(self):
+        super().on_headers_finished()
+        upload = self._current_part.file
+        if upload is not None:
+            upload.file = self._files_to_close_on_error[-1] = SpoolFile(max_size=self.max_file_size)
+
+
+class _SpoolingRequest(Request):
+    async def _get_form(self, *, max_files=1000, max_fields=1000):
+        content_type = self.headers.get('content-type', '')
+        if self._form is None and content_type.startswith('multipart/form-data'):
+            parser = _SpoolingMultiPartParser(self.headers, self.stream(), max_files=max_files, max_fields=max_fields)
+            try:
+                self._form = await parser.parse()
+            except MultiPartException as exc:
+                raise HTTPException(status_code=400, detail=exc.message)
+        return await super()._get_form(max_files=max_files, max_fields=max_fields)
+
+
+class SpoolRoute(APIRoute):
+    """Роуты, у которых UploadFile.file — SpoolFile: см. spool()"""
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def spooling_handler(request: Request):
+            return await handler(_SpoolingRequest(request.scope, request.receive))
+        return spooling_handler
+
+
+def spool(fileobj):
+    """
+    Временный файл с телом UploadFile, который переживет запрос, и SHA-256 содержимого.
+    Возвращает (путь, хэш, размер). Тело из SpoolFile уже лежит в UPLOAD_SPOOL_DIR
+    (или в памяти — тогда пишется один раз), любой другой файл копируется
+    """
+    if isinstance(fileobj, SpoolFile):
+        return fileobj.claim(), fileobj.digest.hexdigest(), fileobj.size
+    fd, path = tempfile.mkstemp(prefix='upload-', dir=UPLOAD_SPOOL_DIR)
+    digest = hashlib.sha256()
+    size = 0
+    with os.fdopen(fd, 'wb') as out:
+        while True:
+            chunk = fileobj.read(256 * 1024)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+            out.write(chunk)
+    return path, digest.hexdigest(), size
+
+
+def spool_path(report_id: int) -> str:
+    return os.path.join(UPLOAD_SPOOL_DIR, f'upload-report-{report_id}')
+
+
+def keep(path: str, report_id: int) -> str:
+    """Переименовывает файл из spool() под id отчета — по этому имени его найдет recover()"""
+    target = spool_path(report_id)
+    os.replace(path, target)
+    return target
+
+
+def discard(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class UploadQueue:
+    def __init__(self, workers: int = UPLOAD_WORKERS, maxsize: int = UPLOAD_QUEUE_SIZE):
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._threads = []
+        # Отчеты, чьи задачи сейчас в очереди или у воркера
+        self._active = set()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._janitor = None
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'upload-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._stopping.clear()
+        self._janitor = threading.Thread(target=self._sweep, name='upload-janitor', daemon=True)
+        self._janitor.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Дает воркерам доработать текущие задачи; остальное остается в pending до recover()"""
+        self._stopping.set()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if self._janitor:
+            self._janitor.join(timeout)
+            self._janitor = None
+
+    def submit(self, job: UploadJob):
+        """
+        Не блокирует запрос: при переполненной очереди бросает queue.Full.
+        Отчет, чья задача уже в работе, второй раз не ставится — тогда возвращает False
+        """
+        with self._lock:
+            if job.report_id in self._active:
+                return False
+            self._queue.put_nowait(job)
+            self._active.add(job.report_id)
+            return True
+
+    def recover(self):
+        """
+        Подбирает загрузки, у которых нет задачи в этом процессе (прерваны рестартом):
+        с файлом в UPLOAD_SPOOL_DIR ставит заново, без файла и старше UPLOAD_STALE_AFTER — в failed.
+        Возвращает (поставлено заново, помечено failed)
+        """
+        stale_before = datetime.now(timezone.utc) - timedelta(seconds=UPLOAD_STALE_AFTER)
+        requeued, lost = 0, []
+        db = SessionLocal()
+        try:
+            for report in crud.get_stalled_uploads(db, stale_before):
+                path = spool_path(report.id)
+                if os.path.exists(path):
+                    try:
+                        requeued += self.submit(UploadJob(report.id, path, report.file_path, report.content_type))
+                    except queue.Full:
+                        break  # остальное — на следующем проходе
+                elif report.stale:
+                    # Если задача еще у воркера, fail_uploads не перепишет уже записанный им результат
+                    lost.append(report.id)
+            if lost:
+                crud.fail_uploads(db, lost)
+        finally:
+            db.close()
+        if requeued or lost:
+            logger.warning('Recovered interrupted uploads: %s requeued, %s marked failed', requeued, len(lost))
+        return requeued, len(lost)
+
+    def _sweep(self):
+        while True:
+            try:
+                self.recover()
+            except Exception:
+                logger.exception('Failed to recover interrupted uploads')
+            if UPLOAD_SWEEP_INTERVAL <= 0 or self._stopping.wait(UPLOAD_SWEEP_INTERVAL):
+                return
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                self._process(job)
+            except Exception:
+                logger.exception('Upload worker crashed on report %s', job.report_id)
+            finally:
+                with self._lock:
+                    self._active.discard(job.report_id)
+                self._queue.task_done()
+
+    def _process(self, job: UploadJob):
+        db = SessionLocal()
+        try:
+            crud.set_attachment_state(db, job.report_id, models.ATTACHMENT_UPLOADING)
+            for attempt in range(UPLOAD_RETRIES + 1):
+                try:
+                    # Объект адресуется содержимым: если он уже в bucket, грузить нечего
+                    if not storage.blob_exists(job.key):
+                        with open(job.spool_path, 'rb') as f:
+                            storage.upload_fileobj(f, job.key, job.content_type)
+                    crud.set_attachment_state(db, job.report_id, models.ATTACHMENT_DONE)
+                    return
+                except storage.UploadTooLarge:
+                    break
+                except Exception as e:
+                    if attempt == UPLOAD_RETRIES:
+                        logger.error('Error uploading %s to OCI, giving up: %s', job.key, e)
+                        break
+                    # Экспоненциальная задержка с джиттером, чтобы воркеры не били в хранилище синхронно
+                    delay = min(UPLOAD_BACKOFF_MAX_SECONDS, UPLOAD_BACKOFF_SECONDS * 2 ** attempt)
+                    logger.warning('Error uploading %s to OCI (attempt %s), retrying in %.1fs: %s',
+                                   job.key, attempt + 1, delay, e)
+                    time.sleep(delay * random.uniform(0.5, 1.0))
+            crud.set_attachment_state(db, job.report_id, models.ATTACHMENT_FAILED)
+        finally:
+            db.close()
+            discard(job.spool_path)
+
+
+upload_queue = UploadQueue()
@@ -0,0 +1,75 @@
+"""
+Сравнение двух отчетов benchmarks/load.py: было -> стало по каждому сценарию.
+
+    python benchmarks/compare.py results/before.json results/after.json --threshold 10
+
+Код выхода 1, если p95 какого-то сценария вырос или пропускная способность упала
+больше чем на --threshold процентов, либо появились ошибки.
+"""
+import argparse
+import json
+import sys
+
+# (метрика, больше — лучше)
+METRICS = (
+    ("throughput_rps", True),
+    ("p50_ms", False),
+    ("p95_ms", False),
+    ("p99_ms", False),
+    ("peak_rss_mb", False),
+)
+GATED = ("throughput_rps", "p95_ms")
+
+
+def _change(before, after):
+    if not before or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def compare(before: dict, after: dict, threshold: float):
+    rows, regressions = [], []
+    for name, new in after["scenarios"].items():
+        old = before["scenarios"].get(name)
+        if old is None:
+            continue
+        for metric, higher_is_better in METRICS:
+            change = _change(old.get(metric), new.get(metric))
+            rows.append((name, metric, old.get(metric), new.get(metric), change))
+            if metric in GATED and change is not None:
+                worse = -change if higher_is_better else change
+                if worse > threshold:
+                    regressions.append(f"{name}: {metric} {old[metric]} -> {new[metric]} ({change:+.1f}%)")
+        if sum(new["errors"].values()) > sum(old["errors"].values()):
+            regressions.append(f"{name}: errors {old['errors']} -> {new['errors']}")
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression, percent")
+    args = parser.parse_args()
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    for key in ("mode", "database", "tickets", "concurrency"):
+        if before["meta"].get(key) != after["meta"].get(key):
+            print(f"warning: {key} differs: {before['meta'].get(key)} vs {after['meta'].get(key)}", file=sys.stderr)
+
+    rows, regressions = compare(before, after, args.threshold)
+    print(f"{'scenario':<10} {'metric':<16} {'before':>10} {'after':>10} {'change':>8}")
+    for name, metric, old, new, change in rows:
+        change_text = f"{change:+.1f}%" if change is not None else "-"
+        print(f"{name:<10} {metric:<16} {old if old is not None else '-':>10} "
+              f"{new if new is not None else '-':>10} {change_text:>8}")
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
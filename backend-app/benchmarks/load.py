@@ -0,0 +1,372 @@
+"""
+Нагрузочный бенчмарк API заявок.
+
+Сценарии: list (GET /tickets/ с фильтрами, как дашборд), pages (весь список страницами
+по --page-limit через next_cursor), detail (GET /tickets/{id}), update (PUT /tickets/{id}),
+login (POST /auth/login, bcrypt), upload (POST /tickets/{id}/reports с файлом).
+Каждый сценарий гоняют --concurrency клиентов в течение --duration секунд. Для list/pages
+кэш списков обычно отвечает сам — TICKET_LIST_CACHE_SIZE=0 меряет запрос и сериализацию.
+
+Режимы:
+    inprocess — приложение в этом же процессе через httpx.ASGITransport (без сети и uvicorn);
+    http      — uvicorn в отдельном процессе, клиенты ходят по HTTP.
+Object storage — сервер moto (S3) в этом процессе.
+
+Запуск из backend-app/ (зависимости — benchmarks/requirements.txt):
+
+    python benchmarks/load.py --seed --tickets 100000 --mode http --output results/http-100k.json
+
+Результат — JSON: p50/p95/p99/max задержки, пропускная способность, ошибки и пиковый RSS
+процесса приложения по каждому сценарию (в режиме inprocess в него входят клиенты и moto —
+для оценки памяти используйте http). Сравнение двух прогонов — benchmarks/compare.py.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+SCENARIOS = ("list", "pages", "detail", "update", "login", "upload")
+BENCH_BUCKET = "helpdesk-bench"
+STATUS_FILTERS = (None, "new", "in_progress", "closed")
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+# --- Память процесса приложения ---
+
+def _proc_status(pid, field):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024  # kB -> MB
+    except OSError:
+        return None
+
+
+def reset_peak_rss(pid):
+    """Сбрасывает VmHWM (Linux), чтобы пик считался для каждого сценария отдельно"""
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb(pid):
+    value = _proc_status(pid, "VmHWM")
+    if value is None and pid == os.getpid():
+        import resource
+        value = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return round(value, 1) if value is not None else None
+
+
+# --- Сценарии: каждый делает один запрос и возвращает статус ответа ---
+
+class Context:
+    def __init__(self, ticket_ids, usernames, password, upload_bytes, page_limit):
+        self.ticket_ids = ticket_ids
+        self.usernames = usernames
+        self.password = password
+        self.upload_bytes = upload_bytes
+        self.page_limit = page_limit
+        self.headers = {}
+
+
+class WorkerRandom(random.Random):
+    """Случайные числа клиента и его состояние между запросами (курсор сценария pages)"""
+    cursor = None
+
+
+async def scenario_list(client, ctx, rnd):
+    params = {"limit": 50}
+    status = rnd.choice(STATUS_FILTERS)
+    if status:
+        params["status"] = status
+    return await client.get("/tickets/", params=params, headers=ctx.headers)
+
+
+async def scenario_pages(client, ctx, rnd):
+    # Курсор свой у каждого клиента; в конце списка начинаем сначала
+    params = {"limit": ctx.page_limit}
+    if rnd.cursor:
+        params["cursor"] = rnd.cursor
+    resp = await client.get("/tickets/", params=params, headers=ctx.headers)
+    rnd.cursor = resp.json().get("next_cursor") if resp.status_code == 200 else None
+    return resp
+
+
+async def scenario_detail(client, ctx, rnd):
+    return await client.get(f"/tickets/{rnd.choice(ctx.ticket_ids)}", headers=ctx.headers)
+
+
+async def scenario_update(client, ctx, rnd):
+    body = {"status": rnd.choice(("new", "in_progress", "closed"))}
+    return await client.put(f"/tickets/{rnd.choice(ctx.ticket_ids)}", json=body, headers=ctx.headers)
+
+
+async def scenario_login(client, ctx, rnd):
+    body = {"username": rnd.choice(ctx.usernames), "password": ctx.password}
+    return await client.post("/auth/login", json=body)
+
+
+async def scenario_upload(client, ctx, rnd):
+    # Случайное содержимое: одинаковые файлы бэкенд дедуплицирует и не грузит повторно
+    content = rnd.randbytes(ctx.upload_bytes)
+    return await client.post(f"/tickets/{rnd.choice(ctx.ticket_ids)}/reports", headers=ctx.headers,
+                             data={"comment": "benchmark"}, files={"file": ("bench.bin", content, "application/octet-stream")})
+
+
+SCENARIO_FUNCS = {
+    "list": scenario_list,
+    "pages": scenario_pages,
+    "detail": scenario_detail,
+    "update": scenario_update,
+    "login": scenario_login,
+    "upload": scenario_upload,
+}
+
+
+async def run_scenario(client, ctx, name, concurrency, duration, random_seed, app_pid):
+    fn = SCENARIO_FUNCS[name]
+    latencies = []
+    errors = {}
+    received = 0
+    reset_peak_rss(app_pid)
+    started = time.perf_counter()
+    deadline = started + duration
+
+    async def worker(n):
+        rnd = WorkerRandom(random_seed * 1000 + n)
+        nonlocal received
+        while time.perf_counter() < deadline:
+            t = time.perf_counter()
+            try:
+                resp = await fn(client, ctx, rnd)
+                status = resp.status_code
+                # Байты тела как они пришли по сети (сжатые, если сервер сжал)
+                received += resp.num_bytes_downloaded
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - t)
+            if not (isinstance(status, int) and status < 400):
+                errors[str(status)] = errors.get(str(status), 0) + 1
+
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def ms(seconds):
+        return round(seconds * 1000, 2)
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "max_ms": ms(latencies[-1]) if latencies else 0.0,
+        "avg_response_bytes": round(received / len(latencies)) if latencies else 0,
+        "peak_rss_mb": peak_rss_mb(app_pid),
+    }
+
+
+# --- Окружение: moto, приложение ---
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_s3():
+    from moto.server import ThreadedMotoServer
+    import boto3
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # журнал каждого запроса moto
+    port = _free_port()
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+    url = f"http://127.0.0.1:{port}"
+    boto3.client("s3", endpoint_url=url, region_name="us-east-1",
+                 aws_access_key_id="bench", aws_secret_access_key="bench").create_bucket(Bucket=BENCH_BUCKET)
+    return server, url
+
+
+def app_env(args, s3_url):
+    return {
+        "DATABASE_URL": args.database_url,
+        "S3_ENDPOINT_URL": s3_url,
+        "OCI_BUCKET_NAME": BENCH_BUCKET,
+        "OCI_REGION": "us-east-1",
+        "OCI_ACCESS_KEY": "bench",
+        "OCI_SECRET_KEY": "bench",
+        "AUTH_SECRET": os.getenv("AUTH_SECRET", "benchmark"),
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+    }
+
+
+def load_context(args):
+    from sqlalchemy import select
+
+    from app import models
+    from app.database import engine
+    from seed import BENCH_PASSWORD
+
+    with engine.connect() as conn:
+        ticket_ids = list(conn.execute(select(models.Ticket.id)).scalars())
+        usernames = list(conn.execute(
+            select(models.User.username).where(models.User.username.like("bench_user_%"))).scalars())
+    if not ticket_ids or not usernames:
+        raise SystemExit("The database has no benchmark data, run with --seed")
+    return Context(ticket_ids, usernames, BENCH_PASSWORD, args.upload_kb * 1024, args.page_limit)
+
+
+async def _login_admin(client, ctx, args):
+    # Сотрудник видит все заявки — как диспетчер на дашборде
+    resp = await client.post("/auth/login", json={"username": "bench_user_0", "password": ctx.password})
+    resp.raise_for_status()
+    ctx.headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+    if args.accept_encoding:
+        client.headers["Accept-Encoding"] = args.accept_encoding
+
+
+async def run_all(client, ctx, args, app_pid):
+    await _login_admin(client, ctx, args)
+    results = {}
+    for name in args.scenarios:
+        results[name] = await run_scenario(client, ctx, name, args.concurrency, args.duration,
+                                           args.random_seed, app_pid)
+        print(f"{name}: {json.dumps(results[name])}", file=sys.stderr)
+    return results
+
+
+async def run_inprocess(args, ctx):
+    import httpx
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            return await run_all(client, ctx, args, os.getpid())
+
+
+async def run_http(args, ctx, env):
+    import httpx
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, **env},
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+            for _ in range(300):
+                try:
+                    if (await client.get("/health/live")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise SystemExit("uvicorn did not start")
+            return await run_all(client, ctx, args, server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:////tmp/helpdesk-bench.db"))
+    parser.add_argument("--mode", choices=("inprocess", "http"), default="inprocess")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        type=lambda value: [s for s in value.split(",") if s])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--upload-kb", type=int, default=64)
+    parser.add_argument("--page-limit", type=int, default=200, help="page size for the pages scenario")
+    parser.add_argument("--accept-encoding", help="Accept-Encoding sent by clients (default: httpx's own)")
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--seed", action="store_true", help="seed an empty database first")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--tickets", type=int, default=10000)
+    parser.add_argument("--reports-per-ticket", type=float, default=2.0)
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    s3_server, s3_url = start_s3()
+    env = app_env(args, s3_url)
+    # Настройки приложения читаются на импорте — окружение задается до импорта app.*
+    os.environ.update(env)
+    try:
+        seed_result = None
+        if args.seed:
+            from seed import seed
+            seed_result = seed(args.users, args.tickets, args.reports_per_ticket, random_seed=args.random_seed)
+        ctx = load_context(args)
+        if args.mode == "inprocess":
+            results = asyncio.run(run_inprocess(args, ctx))
+        else:
+            results = asyncio.run(run_http(args, ctx, env))
+    finally:
+        s3_server.stop()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "mode": args.mode,
+            "database": args.database_url.split("://", 1)[0],
+            "tickets": len(ctx.ticket_ids),
+            "users": len(ctx.usernames),
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "upload_kb": args.upload_kb,
+            "page_limit": args.page_limit,
+            "accept_encoding": args.accept_encoding,
+            "seed": seed_result,
+        },
+        "scenarios": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
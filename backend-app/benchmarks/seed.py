@@ -0,0 +1,123 @@
+"""
+Синтетические данные для бенчмарков: пользователи, заявки и отчеты в базе DATABASE_URL
+(SQLite или локальный Postgres). Схема создается миграциями (app.manage init).
+
+Запуск из backend-app/:
+
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/seed.py --tickets 100000
+
+Заполняет только пустую базу; у всех пользователей bench_user_<n> пароль BENCH_PASSWORD.
+Генератор детерминирован (--random-seed), так что прогоны на одинаковых параметрах сравнимы.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+BENCH_PASSWORD = "benchpass"
+BATCH_SIZE = 5000
+STATUSES = ("new", "new", "in_progress", "in_progress", "closed", "closed", "closed")
+WORDS = ("printer", "network", "vpn", "password", "laptop", "monitor", "email", "access", "error", "slow",
+         "принтер", "сеть", "пароль", "ноутбук", "доступ", "ошибка", "почта", "монитор", "не", "работает")
+
+
+def _text(rnd: random.Random, words: int) -> str:
+    return " ".join(rnd.choice(WORDS) for _ in range(words))
+
+
+def _batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed(users: int = 200, tickets: int = 10000, reports_per_ticket: float = 2.0, days: int = 365,
+         random_seed: int = 42) -> dict:
+    from sqlalchemy import func, select
+
+    from app import crud, hashing, manage, models
+    from app.database import engine
+
+    manage.main(["init"])
+    with engine.connect() as conn:
+        existing = conn.execute(select(func.count()).select_from(models.Ticket)).scalar()
+    if existing:
+        return {"seeded": False, "tickets": existing}
+
+    rnd = random.Random(random_seed)
+    started = time.perf_counter()
+    password_hash = hashing.hash_password(BENCH_PASSWORD)
+    now = datetime.now(timezone.utc)
+
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            # Каждый десятый — сотрудник: они исполнители заявок
+            {"username": f"bench_user_{n}", "password_hash": password_hash, "is_admin": False, "is_staff": n % 10 == 0}
+            for n in range(users)
+        ])
+        rows = conn.execute(select(models.User.id, models.User.is_staff)).all()
+        user_ids = [row.id for row in rows]
+        staff_ids = [row.id for row in rows if row.is_staff]
+
+        def ticket_rows():
+            for n in range(tickets):
+                status = rnd.choice(STATUSES)
+                created_at = now - timedelta(seconds=rnd.uniform(0, days * 86400))
+                yield {
+                    "title": f"#{n} {_text(rnd, 4)}",
+                    "description": _text(rnd, 30),
+                    "status": status,
+                    "creator_id": rnd.choice(user_ids),
+                    "assignee_id": rnd.choice(staff_ids) if status != "new" and staff_ids else None,
+                    "created_at": created_at,
+                    "updated_at": created_at if status == "new" else created_at + timedelta(hours=rnd.uniform(1, 72)),
+                    "version": 1,
+                }
+
+        for batch in _batches(ticket_rows()):
+            conn.execute(models.Ticket.__table__.insert(), batch)
+        first_id, last_id = conn.execute(select(func.min(models.Ticket.id), func.max(models.Ticket.id))).one()
+
+        def report_rows():
+            for ticket_id in range(first_id, last_id + 1):
+                count = int(reports_per_ticket) + (rnd.random() < reports_per_ticket % 1)
+                for _ in range(count):
+                    yield {"ticket_id": ticket_id, "comment": _text(rnd, 15), "created_at": now}
+
+        report_count = 0
+        for batch in _batches(report_rows()):
+            conn.execute(models.Report.__table__.insert(), batch)
+            report_count += len(batch)
+
+    if crud.STATS_COUNTERS:
+        manage.main(["init"])  # счетчики пусты — init пересчитает их по заявкам
+    return {"seeded": True, "users": users, "tickets": tickets, "reports": report_count,
+            "seconds": round(time.perf_counter() - started, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--tickets", type=int, default=10000)
+    parser.add_argument("--reports-per-ticket", type=float, default=2.0)
+    parser.add_argument("--days", type=int, default=365, help="spread of created_at into the past")
+    parser.add_argument("--random-seed", type=int, default=42)
+    args = parser.parse_args()
+    result = seed(args.users, args.tickets, args.reports_per_ticket, args.days, args.random_seed)
+    json.dump(result, sys.stdout)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Окружение Alembic. Подключение — DATABASE_URL приложения, либо готовое соединение
+из config.attributes["connection"] (так миграции запускает app.manage под общей блокировкой).
+"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from app.database import Base, DATABASE_URL
+from app import models  # noqa: F401 — регистрирует таблицы в Base.metadata
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def _run(connection):
+    # batch-режим: SQLite не умеет большинство ALTER TABLE, alembic пересоздает таблицу
+    context.configure(connection=connection, target_metadata=target_metadata,
+                      render_as_batch=connection.dialect.name == "sqlite")
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    engine = create_engine(DATABASE_URL, poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        _run(connection)
+
+
+if context.is_offline_mode():
+    # Миграции смотрят на фактическую схему (базы, созданные create_all), без подключения это невозможно
+    raise SystemExit("Offline (--sql) mode is not supported: migrations inspect the live schema")
+run_migrations_online()
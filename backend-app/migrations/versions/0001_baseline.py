@@ -0,0 +1,64 @@
+"""Исходная схема: users, tickets, reports
+
+Раньше схему создавал Base.metadata.create_all на импорте приложения, поэтому
+в существующих базах эти таблицы уже есть — такие таблицы пропускаются.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("username", sa.String()),
+            sa.Column("password_hash", sa.String()),
+            sa.Column("is_admin", sa.Boolean()),
+            sa.Column("is_staff", sa.Boolean()),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    if "tickets" not in existing:
+        op.create_table(
+            "tickets",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("title", sa.String(), nullable=False),
+            sa.Column("description", sa.Text()),
+            sa.Column("status", sa.String()),
+            sa.Column("creator_id", sa.Integer(), sa.ForeignKey("users.id")),
+            sa.Column("assignee_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+            sa.Column("last_editor_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True)),
+        )
+        op.create_index("ix_tickets_id", "tickets", ["id"])
+
+    if "reports" not in existing:
+        op.create_table(
+            "reports",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("ticket_id", sa.Integer(), sa.ForeignKey("tickets.id")),
+            sa.Column("comment", sa.Text()),
+            sa.Column("file_path", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_reports_id", "reports", ["id"])
+
+
+def downgrade():
+    op.drop_table("reports")
+    op.drop_table("tickets")
+    op.drop_table("users")
@@ -0,0 +1,37 @@
+"""Индексы для фильтров и keyset-пагинации списка заявок
+
+Раньше входило в 0002. Базы, созданные create_all уже с этими моделями или
+обновленные до 0002, индексы имеют — каждый создается, только если его нет.
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001a"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+_INDEXES = [
+    ("ix_tickets_status", "tickets", ["status"]),
+    ("ix_tickets_creator_id", "tickets", ["creator_id"]),
+    ("ix_tickets_assignee_id", "tickets", ["assignee_id"]),
+    # Порядок списка и keyset-курсор
+    ("ix_tickets_created_at_id", "tickets", ["created_at", "id"]),
+    ("ix_reports_ticket_id", "reports", ["ticket_id"]),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in _INDEXES:
+        if name not in {i["name"] for i in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(_INDEXES):
+        op.drop_index(name, table_name=table)
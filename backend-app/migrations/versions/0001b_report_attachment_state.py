@@ -0,0 +1,27 @@
+"""Состояние загрузки вложения отчета: reports.attachment_state
+
+Раньше входило в 0002. Колонка добавляется, только если ее еще нет
+(базы, созданные create_all уже с этой моделью или обновленные до 0002).
+
+Revision ID: 0001b
+Revises: 0001a
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001b"
+down_revision = "0001a"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if "attachment_state" not in {c["name"] for c in sa.inspect(op.get_bind()).get_columns("reports")}:
+        # None — отчет без файла
+        op.add_column("reports", sa.Column("attachment_state", sa.String(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("reports") as batch:
+        batch.drop_column("attachment_state")
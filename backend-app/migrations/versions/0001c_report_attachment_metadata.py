@@ -0,0 +1,38 @@
+"""Метаданные вложений отчетов и хэш содержимого (файлы хранятся по SHA-256)
+
+Раньше входило в 0002. Колонки и индекс добавляются, только если их еще нет
+(базы, созданные create_all уже с этой моделью или обновленные до 0002).
+
+Revision ID: 0001c
+Revises: 0001b
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001c"
+down_revision = "0001b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    report_columns = {c["name"] for c in inspector.get_columns("reports")}
+    for column in (
+        sa.Column("file_name", sa.String(), nullable=True),
+        sa.Column("file_size", sa.BigInteger(), nullable=True),
+        sa.Column("content_type", sa.String(), nullable=True),
+        sa.Column("content_hash", sa.String(64), nullable=True),
+    ):
+        if column.name not in report_columns:
+            op.add_column("reports", column)
+    if "ix_reports_content_hash" not in {i["name"] for i in inspector.get_indexes("reports")}:
+        op.create_index("ix_reports_content_hash", "reports", ["content_hash"])
+
+
+def downgrade():
+    op.drop_index("ix_reports_content_hash", table_name="reports")
+    with op.batch_alter_table("reports") as batch:
+        for column in ("content_hash", "content_type", "file_size", "file_name"):
+            batch.drop_column(column)
@@ -0,0 +1,94 @@
+"""Полнотекстовый поиск: tsvector + GIN на Postgres, FTS5 на SQLite
+
+Раньше входило в 0002. Все шаги идемпотентны (IF NOT EXISTS) — базы, обновленные
+до 0002, ничего не заметят.
+
+Revision ID: 0001d
+Revises: 0001c
+Create Date: 2026-10-17
+"""
+import os
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001d"
+down_revision = "0001c"
+branch_labels = None
+depends_on = None
+
+# Конфигурация текстового поиска Postgres для генерируемых колонок (см. app/search.py)
+SEARCH_CONFIG = os.getenv("SEARCH_CONFIG", "simple")
+
+_POSTGRES_SEARCH_DDL = [
+    """ALTER TABLE tickets ADD COLUMN IF NOT EXISTS search_vector tsvector
+       GENERATED ALWAYS AS (to_tsvector('{cfg}', coalesce(title, '') || ' ' || coalesce(description, ''))) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_tickets_search_vector ON tickets USING GIN (search_vector)",
+    """ALTER TABLE reports ADD COLUMN IF NOT EXISTS search_vector tsvector
+       GENERATED ALWAYS AS (to_tsvector('{cfg}', coalesce(comment, ''))) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_reports_search_vector ON reports USING GIN (search_vector)",
+]
+
+# FTS5-таблицы с внешним содержимым, синхронизируемые триггерами
+_SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tickets_fts USING fts5(title, description, content='tickets', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS tickets_fts_ai AFTER INSERT ON tickets BEGIN
+         INSERT INTO tickets_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS tickets_fts_ad AFTER DELETE ON tickets BEGIN
+         INSERT INTO tickets_fts(tickets_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS tickets_fts_au AFTER UPDATE OF title, description ON tickets BEGIN
+         INSERT INTO tickets_fts(tickets_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+         INSERT INTO tickets_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+       END""",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(comment, content='reports', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS reports_fts_ai AFTER INSERT ON reports BEGIN
+         INSERT INTO reports_fts(rowid, comment) VALUES (new.id, new.comment);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS reports_fts_ad AFTER DELETE ON reports BEGIN
+         INSERT INTO reports_fts(reports_fts, rowid, comment) VALUES ('delete', old.id, old.comment);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS reports_fts_au AFTER UPDATE OF comment ON reports BEGIN
+         INSERT INTO reports_fts(reports_fts, rowid, comment) VALUES ('delete', old.id, old.comment);
+         INSERT INTO reports_fts(rowid, comment) VALUES (new.id, new.comment);
+       END""",
+]
+
+
+def _install_search(bind):
+    if bind.dialect.name == "postgresql":
+        if not re.fullmatch(r"[a-z_]+", SEARCH_CONFIG):
+            raise ValueError(f"Invalid SEARCH_CONFIG: {SEARCH_CONFIG}")
+        for ddl in _POSTGRES_SEARCH_DDL:
+            op.execute(ddl.format(cfg=SEARCH_CONFIG))
+    elif bind.dialect.name == "sqlite":
+        created = not bind.execute(sa.text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tickets_fts'"
+        )).first()
+        for ddl in _SQLITE_SEARCH_DDL:
+            op.execute(ddl)
+        if created:
+            # Индексируем строки, которые появились до поискового индекса
+            op.execute("INSERT INTO tickets_fts(tickets_fts) VALUES ('rebuild')")
+            op.execute("INSERT INTO reports_fts(reports_fts) VALUES ('rebuild')")
+
+
+def upgrade():
+    _install_search(op.get_bind())
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_reports_search_vector")
+        op.execute("ALTER TABLE reports DROP COLUMN IF EXISTS search_vector")
+        op.execute("DROP INDEX IF EXISTS ix_tickets_search_vector")
+        op.execute("ALTER TABLE tickets DROP COLUMN IF EXISTS search_vector")
+    elif bind.dialect.name == "sqlite":
+        for trigger in ("tickets_fts_ai", "tickets_fts_ad", "tickets_fts_au",
+                        "reports_fts_ai", "reports_fts_ad", "reports_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS reports_fts")
+        op.execute("DROP TABLE IF EXISTS tickets_fts")
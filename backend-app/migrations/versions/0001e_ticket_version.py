@@ -0,0 +1,26 @@
+"""Версия заявки для оптимистической блокировки: tickets.version
+
+Раньше входило в 0002. Колонка добавляется, только если ее еще нет
+(базы, созданные create_all уже с этой моделью или обновленные до 0002).
+
+Revision ID: 0001e
+Revises: 0001d
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001e"
+down_revision = "0001d"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if "version" not in {c["name"] for c in sa.inspect(op.get_bind()).get_columns("tickets")}:
+        op.add_column("tickets", sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+
+
+def downgrade():
+    with op.batch_alter_table("tickets") as batch:
+        batch.drop_column("version")
@@ -0,0 +1,30 @@
+"""Таблица счетчиков для дашборда (STATS_COUNTERS): ticket_counters
+
+Когда-то здесь же были индексы, колонки вложений, поиск и версия заявки — теперь у каждого
+изменения своя ревизия (0001a–0001e). Таблица создается, только если ее еще нет
+(базы, созданные create_all уже с этой моделью).
+
+Revision ID: 0002
+Revises: 0001e
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001e"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if "ticket_counters" not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            "ticket_counters",
+            sa.Column("key", sa.String(), primary_key=True),
+            sa.Column("value", sa.BigInteger(), nullable=False),
+        )
+
+
+def downgrade():
+    op.drop_table("ticket_counters")
@@ -0,0 +1,40 @@
+"""Архив закрытых заявок: tickets_archive
+
+Закрытые давно заявки переносятся сюда вместе с отчетами (python -m app.manage archive),
+рабочая таблица tickets остается небольшой. Отчеты хранятся в той же строке JSON-массивом —
+архивная заявка читается целиком по первичному ключу и больше не меняется.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "tickets_archive",
+        # id заявки сохраняется: ссылки /ticket/<id> продолжают работать
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("status", sa.String()),
+        sa.Column("creator_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("assignee_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("last_editor_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+        sa.Column("version", sa.Integer(), nullable=False, server_default="1"),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("reports", sa.JSON(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("tickets_archive")
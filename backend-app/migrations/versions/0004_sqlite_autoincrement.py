@@ -0,0 +1,53 @@
+"""SQLite: AUTOINCREMENT для tickets и reports
+
+Без AUTOINCREMENT SQLite выдает новой строке max(rowid) + 1, поэтому после переноса заявок
+с наибольшими id в архив (и их удаления из tickets) новая заявка получала id архивной —
+ссылка /ticket/<id> вела не туда, а отчеты в архиве и в reports смешивались.
+С AUTOINCREMENT номера не переиспользуются; счетчик sqlite_sequence начинаем
+с наибольшего id, в том числе из архива. На Postgres последовательности и так не откатываются.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+# Наибольший уже выданный id: рабочая таблица и архив
+_LAST_IDS = {
+    "tickets": """SELECT max(coalesce((SELECT max(id) FROM tickets), 0),
+                             coalesce((SELECT max(id) FROM tickets_archive), 0))""",
+    "reports": """SELECT max(coalesce((SELECT max(id) FROM reports), 0),
+                             coalesce((SELECT max(json_extract(r.value, '$.id'))
+                                       FROM tickets_archive, json_each(tickets_archive.reports) AS r), 0))""",
+}
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != "sqlite":
+        return
+    for table, last_id in _LAST_IDS.items():
+        sql = bind.execute(sa.text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                           {"name": table}).scalar()
+        if "AUTOINCREMENT" not in sql.upper():
+            # Пересоздание таблицы удаляет ее триггеры (синхронизация FTS5 из 0001d) — ставим их заново
+            triggers = bind.execute(sa.text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = :name"),
+                                    {"name": table}).scalars().all()
+            with op.batch_alter_table(table, recreate="always", table_kwargs={"sqlite_autoincrement": True}):
+                pass
+            for trigger in triggers:
+                op.execute(trigger)
+        op.execute(sa.text("DELETE FROM sqlite_sequence WHERE name = :name").bindparams(name=table))
+        op.execute(sa.text(f"INSERT INTO sqlite_sequence (name, seq) VALUES (:name, ({last_id}))")
+                   .bindparams(name=table))
+
+
+def downgrade():
+    # Таблица с AUTOINCREMENT совместима со старым кодом — пересоздавать обратно незачем
+    pass
@@ -0,0 +1,166 @@
+"""
+Общие фикстуры тестов бэкенда.
+
+Настройки приложения читаются из окружения при импорте app.*, поэтому окружение задается
+здесь, до первого импорта: база — SQLite-файл во временном каталоге со схемой из миграций
+(как python -m app.manage migrate), object storage — локальный S3 (moto).
+Пароли не проверяются: токены выдаются напрямую, без /auth/login и bcrypt.
+"""
+import os
+import shutil
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+TMP_DIR = tempfile.mkdtemp(prefix="helpdesk-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{TMP_DIR}/helpdesk.db",
+    "DB_ASYNC": "false",
+    "AUTH_SECRET": "test-secret",
+    "METRICS_TOKEN": "test-metrics-token",
+    "HASH_WORKERS": "0",
+    "EVENTS_BACKEND": "memory",
+    "UPLOAD_SPOOL_DIR": TMP_DIR,
+    "UPLOAD_BACKOFF_SECONDS": "0.01",
+    "LOG_LEVEL": "WARNING",
+})
+for name in ("DATABASE_REPLICA_URL", "ASYNC_DATABASE_URL", "REDIS_URL", "S3_ENDPOINT_URL", "SLOW_REQUEST_MS"):
+    os.environ.pop(name, None)
+
+import logging  # noqa: E402
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import delete, event  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+from sqlalchemy.pool import NullPool  # noqa: E402
+
+from app import cache, crud, manage, models, schemas, security, storage  # noqa: E402
+from app.database import DATABASE_URL, SessionLocal, engine, get_db, get_read_db, to_async_url  # noqa: E402
+from app.main import app  # noqa: E402
+
+# Дочерние таблицы раньше родительских
+TABLES = (models.Report, models.Ticket, models.TicketArchive, models.TicketCounter, models.User)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    with engine.begin() as connection:
+        manage.migrate(connection)
+    yield
+    engine.dispose()
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    """Каждый тест начинает с пустой базы и пустых кэшей"""
+    with engine.begin() as connection:
+        for model in TABLES:
+            connection.execute(delete(model))
+    cache.ticket_lists.clear()
+    security.principals.clear()
+    storage.presigned_urls.clear()
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client():
+    # with — чтобы отработали startup/shutdown: очередь загрузок, лента событий
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def async_engine():
+    """
+    Роуты получают AsyncSession на aiosqlite, как при DB_ASYNC=true: тот же SQLite-файл,
+    подставляется через dependency_overrides
+    """
+    async_engine = create_async_engine(to_async_url(DATABASE_URL), poolclass=NullPool)
+    session_factory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def get_async_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = get_async_db
+    app.dependency_overrides[get_read_db] = get_async_db
+    yield async_engine
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def make_user(db):
+    def make(username, is_admin=False, is_staff=False):
+        user = schemas.UserCreate(username=username, password="-", is_admin=is_admin, is_staff=is_staff)
+        return crud.create_user(db, user, password_hash="-")
+    return make
+
+
+@pytest.fixture
+def make_ticket(db):
+    def make(creator, title="Printer is broken", description="Paper jam on the 3rd floor", **fields):
+        ticket = models.Ticket(title=title, description=description, creator_id=creator.id, **fields)
+        db.add(ticket)
+        db.commit()
+        return ticket
+    return make
+
+
+@pytest.fixture
+def auth():
+    """Заголовки запроса от имени пользователя"""
+    def headers(user):
+        return {"Authorization": f"Bearer {security.issue_token(user.id)}"}
+    return headers
+
+
+@pytest.fixture
+def count_statements():
+    """Список SQL-запросов, выполненных движком внутри with"""
+    @contextmanager
+    def count(target=engine):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(target, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(target, "before_cursor_execute", before_cursor_execute)
+    return count
+
+
+@pytest.fixture(scope="session")
+def s3_endpoint():
+    from moto.server import ThreadedMotoServer
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # журнал каждого запроса moto
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield f"http://{host}:{port}"
+    server.stop()
+
+
+@pytest.fixture
+def s3(s3_endpoint, monkeypatch):
+    """Пустой bucket в локальном S3; storage.s3_client() смотрит в него"""
+    monkeypatch.setattr(storage, "S3_ENDPOINT_URL", s3_endpoint)
+    monkeypatch.setattr(storage, "OCI_REGION", "us-east-1")
+    monkeypatch.setattr(storage, "OCI_ACCESS_KEY", "testing")
+    monkeypatch.setattr(storage, "OCI_SECRET_KEY", "testing")
+    monkeypatch.setattr(storage, "OCI_BUCKET_NAME", f"helpdesk-{uuid.uuid4().hex[:12]}")
+    monkeypatch.setattr(storage, "_s3_client", None)
+    client = storage.s3_client()
+    client.create_bucket(Bucket=storage.OCI_BUCKET_NAME)
+    return client
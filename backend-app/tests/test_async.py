@@ -0,0 +1,85 @@
+"""
+Одни и те же сценарии API в обоих режимах сессий: обычная Session в пуле потоков
+и AsyncSession на aiosqlite (DB_ASYNC=true, см. фикстуру async_engine)
+"""
+import pytest
+
+from app.database import engine
+
+
+@pytest.fixture(params=["sync", "async"])
+def mode(request):
+    if request.param == "async":
+        request.getfixturevalue("async_engine")
+    return request.param
+
+
+def test_ticket_lifecycle(mode, client, make_user, auth):
+    alice = make_user("alice")
+    bob = make_user("bob", is_staff=True)
+
+    created = client.post("/tickets/", headers=auth(alice), json={"title": "VPN is down", "description": "Since 9am"})
+    assert created.status_code == 200
+    ticket = created.json()
+    assert ticket["creator"]["username"] == "alice"
+    assert ticket["status"] == "new"
+
+    page = client.get("/tickets/", headers=auth(alice)).json()
+    assert [t["id"] for t in page["items"]] == [ticket["id"]]
+
+    claimed = client.post("/tickets/claim", headers=auth(bob)).json()
+    assert [t["id"] for t in claimed] == [ticket["id"]]
+    assert claimed[0]["assignee"]["username"] == "bob"
+
+    updated = client.put(f"/tickets/{ticket['id']}", headers=auth(bob),
+                         json={"status": "resolved", "version": claimed[0]["version"]})
+    assert updated.status_code == 200
+    assert updated.json()["status"] == "resolved"
+    assert updated.json()["last_editor"]["username"] == "bob"
+    stale = client.put(f"/tickets/{ticket['id']}", headers=auth(bob),
+                       json={"status": "closed", "version": claimed[0]["version"]})
+    assert stale.status_code == 409
+
+    report = client.post(f"/tickets/{ticket['id']}/reports", headers=auth(bob), data={"comment": "Restarted the gateway"})
+    assert report.status_code == 200
+    reports = client.get(f"/tickets/{ticket['id']}/reports", headers=auth(alice)).json()
+    assert [r["comment"] for r in reports] == ["Restarted the gateway"]
+
+    view = client.get(f"/tickets/{ticket['id']}/view", headers=auth(alice))
+    assert view.json()["ticket"]["status"] == "resolved"
+    assert len(view.json()["reports"]) == 1
+    not_modified = client.get(f"/tickets/{ticket['id']}/view", headers={**auth(alice), "If-None-Match": view.headers["ETag"]})
+    assert not_modified.status_code == 304
+
+    stats = client.get("/tickets/stats", headers=auth(bob)).json()
+    assert stats["total"] == 1
+
+
+def test_bulk_operations(mode, client, make_user, make_ticket, auth):
+    admin = make_user("root", is_admin=True)
+    ids = [make_ticket(admin, title=f"Ticket {i}").id for i in range(3)]
+
+    result = client.post("/tickets/bulk/status", headers=auth(admin), json={"ids": ids + [10 ** 6], "status": "closed"}).json()
+    assert (result["succeeded"], result["failed"]) == (3, 1)
+
+    imported = client.post("/tickets/bulk/import", headers=auth(admin),
+                           json=[{"title": "Imported"}, {"title": ""}]).json()
+    assert (imported["succeeded"], imported["failed"]) == (1, 1)
+
+    deleted = client.post("/tickets/bulk/delete", headers=auth(admin), json={"ids": ids}).json()
+    assert deleted["succeeded"] == 3
+    assert [t["title"] for t in client.get("/tickets/", headers=auth(admin)).json()["items"]] == ["Imported"]
+
+
+def test_async_mode_does_not_touch_sync_engine(async_engine, client, count_statements, make_user, make_ticket, auth):
+    user = make_user("alice")
+    ticket_id = make_ticket(user).id
+    headers = auth(user)
+
+    with count_statements(engine) as sync_statements, count_statements(async_engine.sync_engine) as async_statements:
+        assert client.get("/tickets/", headers=headers).status_code == 200
+        assert client.get(f"/tickets/{ticket_id}/view", headers=headers).status_code == 200
+        assert client.put(f"/tickets/{ticket_id}", headers=headers, json={"title": "Printer is on fire"}).status_code == 200
+
+    assert sync_statements == []
+    assert async_statements
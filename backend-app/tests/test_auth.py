@@ -0,0 +1,39 @@
+"""Вход (/auth/login): неизвестный логин проверяется так же, как известный"""
+import pytest
+
+from app import hashing
+
+
+@pytest.fixture
+def verified(monkeypatch):
+    """Хэши, с которыми проверялся пароль; bcrypt подменен — проверка всегда неуспешна"""
+    calls = []
+    monkeypatch.setattr(hashing, "_dummy_hash", None)
+    monkeypatch.setattr(hashing, "hash_password", lambda password: f"dummy:{password}")
+    monkeypatch.setattr(hashing, "verify_and_update",
+                        lambda password, password_hash: calls.append((password, password_hash)) or (False, None))
+    return calls
+
+
+def test_unknown_user_waits_for_bcrypt_too(client, make_user, verified):
+    make_user("alice")
+
+    known = client.post("/auth/login", json={"username": "alice", "password": "wrong"})
+    unknown = client.post("/auth/login", json={"username": "mallory", "password": "guess"})
+    again = client.post("/auth/login", json={"username": "trudy", "password": "guess2"})
+
+    assert [r.status_code for r in (known, unknown, again)] == [401] * 3
+    assert unknown.json() == known.json()
+    assert [password for password, _ in verified] == ["wrong", "guess", "guess2"]
+    # Хэш-заглушка создается один раз и не совпадает с чьим-то настоящим
+    assert verified[1][1] == verified[2][1] == hashing._dummy_hash
+    assert verified[1][1].startswith("dummy:") and verified[0][1] == "-"
+
+
+def test_unknown_user_gets_503_when_the_hash_pool_is_busy(client, verified, monkeypatch):
+    monkeypatch.setattr(hashing, "_pending", hashing.HASH_MAX_PENDING)
+
+    resp = client.post("/auth/login", json={"username": "mallory", "password": "guess"})
+
+    assert resp.status_code == 503
+    assert verified == []
@@ -0,0 +1,97 @@
+"""Кэш списков заявок и общий счетчик версий в Redis (fakeredis вместо настоящего сервера)"""
+import asyncio
+
+import fakeredis
+import pytest
+import redis
+
+from app import cache
+
+METRICS = {"Authorization": "Bearer test-metrics-token"}
+
+
+class LoopGuardRedis(fakeredis.FakeRedis):
+    """Запоминает вызовы из потока, где крутится event loop: синхронный Redis там запрещен"""
+    calls_on_loop = []
+
+    def execute_command(self, *args, **options):
+        try:
+            asyncio.get_running_loop()
+            self.calls_on_loop.append(args[0])
+        except RuntimeError:
+            pass
+        return super().execute_command(*args, **options)
+
+
+@pytest.fixture
+def shared_redis(monkeypatch):
+    server = fakeredis.FakeServer()
+    LoopGuardRedis.calls_on_loop = []
+    monkeypatch.setattr(cache.tickets_version, "redis", LoopGuardRedis(server=server))
+    return server
+
+
+def test_version_is_shared_between_replicas(shared_redis):
+    other_replica = cache.VersionCounter("tickets", fakeredis.FakeRedis(server=shared_redis))
+    before = cache.tickets_version.get()
+
+    other_replica.bump()
+
+    assert cache.tickets_version.get() == before + 1
+
+
+def test_unavailable_redis_disables_the_cache():
+    unreachable = redis.Redis(host="127.0.0.1", port=1, socket_timeout=0.1, socket_connect_timeout=0.1)
+    counter = cache.VersionCounter("tickets", unreachable)
+
+    assert counter.get() is None
+    counter.bump()  # не бросает: запись не должна падать из-за кэша
+    assert asyncio.run(counter.aget()) is None
+
+
+def test_list_is_cached_until_a_write(client, shared_redis, make_user, auth):
+    user = make_user("alice")
+    headers = auth(user)
+    client.post("/tickets/", headers=headers, json={"title": "First", "description": "-"})
+
+    first = client.get("/tickets/", headers=headers)
+    hits = cache.ticket_lists.hits
+    assert client.get("/tickets/", headers=headers).content == first.content
+    assert cache.ticket_lists.hits == hits + 1
+
+    client.post("/tickets/", headers=headers, json={"title": "Second", "description": "-"})
+
+    titles = [t["title"] for t in client.get("/tickets/", headers=headers).json()["items"]]
+    assert titles == ["Second", "First"]
+    assert client.get("/cache/stats", headers=METRICS).json()["ticket_lists"]["shared"] is True
+
+
+def test_list_bypasses_cache_when_redis_is_down(client, make_user, auth, monkeypatch):
+    unreachable = redis.Redis(host="127.0.0.1", port=1, socket_timeout=0.1, socket_connect_timeout=0.1)
+    monkeypatch.setattr(cache.tickets_version, "redis", unreachable)
+    user = make_user("alice")
+    headers = auth(user)
+    client.post("/tickets/", headers=headers, json={"title": "First", "description": "-"})
+
+    for _ in range(2):
+        assert len(client.get("/tickets/", headers=headers).json()["items"]) == 1
+    assert len(cache.ticket_lists) == 0
+
+
+@pytest.mark.parametrize("db_mode", ["sync", "async"])
+def test_redis_is_not_called_on_the_event_loop(db_mode, request, client, shared_redis, make_user, make_ticket, auth):
+    if db_mode == "async":
+        request.getfixturevalue("async_engine")
+    staff = make_user("bob", is_staff=True)
+    headers = auth(staff)
+    ticket_id = make_ticket(staff).id
+    version = cache.tickets_version.get()
+
+    client.get("/tickets/", headers=headers)
+    client.put(f"/tickets/{ticket_id}", headers=headers, json={"status": "in_progress"})
+    client.post(f"/tickets/{ticket_id}/reports", headers=headers, data={"comment": "On it"})
+    client.post("/tickets/bulk/status", headers=headers, json={"ids": [ticket_id], "status": "closed"})
+    client.get("/cache/stats", headers=METRICS)
+
+    assert cache.tickets_version.get() == version + 3
+    assert LoopGuardRedis.calls_on_loop == []
@@ -0,0 +1,82 @@
+"""
+Параллельные сотрудники забирают заявки (crud.claim_tickets) на настоящем Postgres:
+FOR UPDATE SKIP LOCKED на SQLite не проверить. База берется из TEST_POSTGRES_URL
+(отдельная, схема public пересоздается), без нее тест пропускается
+"""
+import os
+import threading
+
+import pytest
+from sqlalchemy import create_engine, exc, select, text
+from sqlalchemy.orm import Session
+
+from app import crud, manage, models
+
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+CLAIMERS = 8
+TICKETS = 300
+
+
+@pytest.fixture(scope="module")
+def pg_engine():
+    if not TEST_POSTGRES_URL:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    pg_engine = create_engine(TEST_POSTGRES_URL, pool_size=CLAIMERS + 2)
+    try:
+        with pg_engine.begin() as connection:
+            connection.execute(text("DROP SCHEMA public CASCADE"))
+            connection.execute(text("CREATE SCHEMA public"))
+            manage.migrate(connection)
+    except exc.OperationalError as e:
+        pg_engine.dispose()
+        pytest.skip(f"Postgres is unavailable: {e}")
+    yield pg_engine
+    pg_engine.dispose()
+
+
+@pytest.fixture
+def seeded(pg_engine):
+    """Сотрудники и TICKETS свободных заявок; возвращает (id сотрудников, id заявок)"""
+    with Session(pg_engine) as db:
+        db.execute(text("TRUNCATE reports, tickets, users RESTART IDENTITY CASCADE"))
+        creator = models.User(username="alice", password_hash="-")
+        staff = [models.User(username=f"staff{i}", password_hash="-", is_staff=True) for i in range(CLAIMERS)]
+        db.add_all([creator, *staff])
+        db.flush()
+        db.add_all(models.Ticket(title=f"Ticket {i}", description="-", creator_id=creator.id) for i in range(TICKETS))
+        db.commit()
+        return [u.id for u in staff], set(db.scalars(select(models.Ticket.id)))
+
+
+def test_parallel_claims_never_overlap(pg_engine, seeded):
+    staff_ids, ticket_ids = seeded
+    claimed = {user_id: [] for user_id in staff_ids}
+    errors = []
+    start = threading.Barrier(CLAIMERS)
+
+    def claimer(user_id):
+        try:
+            with Session(pg_engine) as db:
+                start.wait()
+                while batch := crud.claim_tickets(db, user_id, limit=3):
+                    claimed[user_id].extend(t.id for t in batch)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=claimer, args=(user_id,)) for user_id in staff_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(60)
+
+    assert errors == []
+    all_claimed = [ticket_id for ids in claimed.values() for ticket_id in ids]
+    assert len(all_claimed) == len(set(all_claimed)), "a ticket was claimed twice"
+    assert set(all_claimed) == ticket_ids
+    # Работа распределилась, а не досталась одному потоку, пока остальные ждали блокировку
+    assert sum(1 for ids in claimed.values() if ids) > 1
+
+    with Session(pg_engine) as db:
+        rows = db.execute(select(models.Ticket.id, models.Ticket.assignee_id, models.Ticket.status)).all()
+    owner = {ticket_id: user_id for user_id, ids in claimed.items() for ticket_id in ids}
+    assert all(row.assignee_id == owner[row.id] and row.status == "in_progress" for row in rows)
@@ -0,0 +1,110 @@
+"""Сжатие ответов по Accept-Encoding (app/compression.py)"""
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from app import compression
+
+BIG = {"items": ["x" * 40] * 100}
+
+
+def chunks():
+    yield b'{"part": 1}\n' * 200
+    yield b'{"part": 2}\n' * 200
+
+
+demo = Starlette(routes=[
+    Route("/big", lambda request: JSONResponse(BIG)),
+    Route("/small", lambda request: JSONResponse({"ok": True})),
+    Route("/png", lambda request: Response(b"\x89PNG" * 1000, media_type="image/png")),
+    Route("/encoded", lambda request: Response(gzip.compress(b"a" * 5000), media_type="text/plain",
+                                               headers={"Content-Encoding": "gzip"})),
+    Route("/stream", lambda request: StreamingResponse(chunks(), media_type="application/x-ndjson")),
+    Route("/sse", lambda request: Response(b"data: x\n\n" * 500, media_type="text/event-stream")),
+])
+demo.add_middleware(compression.CompressionMiddleware)
+
+
+@pytest.fixture
+def demo_client():
+    return TestClient(demo)
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("gzip", "gzip"),
+    ("br", "br"),
+    ("gzip, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("br;q=0, gzip;q=0.1", "gzip"),
+    ("gzip;q=0", None),
+    ("*", "br"),
+    ("*;q=0", None),
+    ("identity", None),
+    ("GZIP;Q=1", "gzip"),
+    ("gzip;q=bogus", None),
+    ("", None),
+])
+def test_choose_encoding(accept, expected):
+    assert compression.choose_encoding(accept) == expected
+
+
+def test_gzip_only_without_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert compression.choose_encoding("br, gzip;q=0.5") == "gzip"
+    assert compression.choose_encoding("br") is None
+
+
+@pytest.mark.parametrize("accept", ["gzip", "br"])
+def test_large_json_is_compressed(demo_client, accept):
+    resp = demo_client.get("/big", headers={"Accept-Encoding": accept})
+
+    assert resp.headers["content-encoding"] == accept
+    assert "Accept-Encoding" in resp.headers["vary"]
+    assert int(resp.headers["content-length"]) < len(resp.content)
+    assert resp.json() == BIG  # httpx сам распаковывает тело
+
+
+@pytest.mark.parametrize("path, accept", [
+    ("/big", "identity"),  # клиент не принимает сжатие
+    ("/small", "gzip"),  # меньше COMPRESS_MIN_BYTES
+    ("/png", "gzip"),  # не текстовый тип
+    ("/stream", "gzip"),  # потоковый ответ из нескольких кусков
+    ("/sse", "gzip"),  # лента событий
+])
+def test_left_as_is(demo_client, path, accept):
+    resp = demo_client.get(path, headers={"Accept-Encoding": accept})
+
+    assert "content-encoding" not in resp.headers
+    assert "vary" not in resp.headers
+
+
+def test_already_encoded_response_is_not_compressed_twice(demo_client):
+    resp = demo_client.get("/encoded", headers={"Accept-Encoding": "br, gzip"})
+
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.content == b"a" * 5000
+
+
+def test_threshold_is_configurable(demo_client, monkeypatch):
+    monkeypatch.setattr(compression, "COMPRESS_MIN_BYTES", 5)
+    assert demo_client.get("/small", headers={"Accept-Encoding": "gzip"}).headers["content-encoding"] == "gzip"
+
+    monkeypatch.setattr(compression, "COMPRESS_MIN_BYTES", 0)
+    assert "content-encoding" not in demo_client.get("/big", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_ticket_list_is_compressed(client, make_user, make_ticket, auth):
+    user = make_user("alice")
+    for i in range(20):
+        make_ticket(user, title=f"Ticket {i}")
+
+    plain = client.get("/tickets/", headers={**auth(user), "Accept-Encoding": "identity"})
+    packed = client.get("/tickets/", headers={**auth(user), "Accept-Encoding": "gzip"})
+
+    assert packed.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in packed.headers["vary"]
+    assert packed.content == plain.content
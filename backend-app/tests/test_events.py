@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+from app import events
+from app.routers.events import format_event
+
+
+def event(ticket_id, creator_id, assignee_id=None):
+    return {"type": events.TICKET_UPDATED,
+            "ticket": {"id": ticket_id, "creator_id": creator_id, "assignee_id": assignee_id}}
+
+
+def drain(subscriber):
+    items = []
+    while not subscriber.queue.empty():
+        items.append(subscriber.queue.get_nowait())
+    return items
+
+
+def test_events_are_filtered_by_visibility():
+    async def scenario():
+        broadcaster = events.Broadcaster()
+        alice = broadcaster.subscribe(1, privileged=False)
+        staff = broadcaster.subscribe(2, privileged=True)
+
+        broadcaster.dispatch(event(10, creator_id=1))
+        broadcaster.dispatch(event(11, creator_id=3))
+        broadcaster.dispatch(event(12, creator_id=3, assignee_id=1))
+        broadcaster.dispatch({"type": events.TICKETS_IMPORTED, "count": 5})
+
+        assert [e["ticket"]["id"] for e in drain(alice)] == [10, 12]
+        assert len(drain(staff)) == 4
+
+    asyncio.run(scenario())
+
+
+def test_overflow_leaves_resync_with_last_id(monkeypatch):
+    monkeypatch.setattr(events, "EVENTS_QUEUE_SIZE", 3)
+
+    async def scenario():
+        broadcaster = events.Broadcaster()
+        slow = broadcaster.subscribe(1, privileged=False)
+        for ticket_id in range(5):
+            broadcaster.dispatch(event(ticket_id, creator_id=1))
+
+        resync, *rest = drain(slow)
+        assert resync == {"type": events.RESYNC, "id": 4}
+        assert [e["ticket"]["id"] for e in rest] == [4]
+
+    asyncio.run(scenario())
+
+
+def test_resync_reaches_non_staff_subscribers():
+    async def scenario():
+        broadcaster = events.Broadcaster()
+        alice = broadcaster.subscribe(1, privileged=False)
+
+        broadcaster.dispatch({"type": events.RESYNC})
+
+        assert [e["type"] for e in drain(alice)] == [events.RESYNC]
+
+    asyncio.run(scenario())
+
+
+def test_sse_format():
+    data = {"type": events.RESYNC, "id": 7}
+    assert format_event(data) == f"id: 7\nevent: resync\ndata: {json.dumps(data)}\n\n"
+    # Без id строка id: не пишется — иначе браузер сбросил бы Last-Event-ID
+    assert format_event({"type": events.RESYNC}).startswith("event: resync\n")
@@ -0,0 +1,129 @@
+"""Потоковая выгрузка /tickets/export (app/export.py)"""
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import crud, export, models
+
+
+def ndjson(resp):
+    return [json.loads(line) for line in resp.text.splitlines()]
+
+
+def rows(resp):
+    return list(csv.DictReader(io.StringIO(resp.text)))
+
+
+@pytest.fixture
+def people(make_user):
+    return make_user("alice"), make_user("bob", is_staff=True), make_user("carol")
+
+
+def test_csv_and_ndjson_rows(client, auth, people, make_ticket):
+    alice, bob, _ = people
+    first = make_ticket(alice, title="VPN", description="Нет, \"доступа\"\nс утра", assignee_id=bob.id)
+    second = make_ticket(alice, title="Printer")
+
+    records = ndjson(client.get("/tickets/export", headers=auth(bob), params={"format": "ndjson"}))
+    assert [r["id"] for r in records] == [first.id, second.id]
+    assert records[0] == {
+        "id": first.id, "title": "VPN", "description": "Нет, \"доступа\"\nс утра", "status": "new",
+        "created_at": first.created_at.isoformat(), "updated_at": None, "creator_id": alice.id,
+        "creator": "alice", "assignee_id": bob.id, "assignee": "bob", "version": 1,
+    }
+
+    resp = client.get("/tickets/export", headers=auth(bob))
+    assert resp.headers["content-type"].startswith("text/csv")
+    assert resp.text.splitlines()[0] == ",".join(export.TICKET_FIELDS)
+    table = rows(resp)
+    assert [(r["id"], r["title"], r["assignee"]) for r in table] == [(str(first.id), "VPN", "bob"),
+                                                                     (str(second.id), "Printer", "")]
+    assert table[0]["description"] == "Нет, \"доступа\"\nс утра"
+
+
+def test_reports_stay_with_their_ticket_across_batches(client, db, auth, people, make_ticket, monkeypatch):
+    alice, bob, _ = people
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 2)
+    tickets = [make_ticket(alice, title=f"T{i}") for i in range(5)]
+    expected = {}
+    for i, ticket in enumerate(tickets):
+        # У T1 отчетов нет, у остальных — по i штук
+        expected[ticket.id] = [crud.create_report(db, ticket.id, f"{ticket.title}/{n}").id
+                               for n in range(i if i != 1 else 0)]
+
+    records = ndjson(client.get("/tickets/export", headers=auth(bob),
+                                params={"format": "ndjson", "include_reports": True}))
+    assert {r["id"]: [report["id"] for report in r["reports"]] for r in records} == expected
+    assert all(report["comment"].startswith(r["title"] + "/") for r in records for report in r["reports"])
+
+    table = rows(client.get("/tickets/export", headers=auth(bob), params={"include_reports": True}))
+    # Строка на отчет, заявка без отчетов — одна строка с пустыми колонками отчета
+    assert len(table) == sum(max(len(ids), 1) for ids in expected.values())
+    assert [r["report_id"] for r in table if r["id"] == str(tickets[1].id)] == [""]
+    assert [r["report_comment"] for r in table if r["id"] == str(tickets[3].id)] == ["T3/0", "T3/1", "T3/2"]
+
+
+def test_gzip_body_decompresses(client, auth, people, make_ticket):
+    alice, bob, _ = people
+    for i in range(50):
+        make_ticket(alice, title=f"Ticket {i}")
+
+    plain = client.get("/tickets/export", headers=auth(bob), params={"format": "ndjson"})
+    packed = client.get("/tickets/export", headers={**auth(bob), "Accept-Encoding": "identity"},
+                        params={"format": "ndjson", "gzip": True})
+
+    assert packed.headers["content-type"] == "application/gzip"
+    assert packed.headers["content-disposition"].endswith('.ndjson.gz"')
+    assert gzip.decompress(packed.content) == plain.content
+
+
+def test_non_staff_exports_only_their_tickets(client, auth, people, make_ticket):
+    alice, bob, carol = people
+    own = make_ticket(alice, title="Mine")
+    assigned = make_ticket(carol, title="Assigned to alice", assignee_id=alice.id)
+    make_ticket(carol, title="Someone else's")
+
+    visible = [r["id"] for r in ndjson(client.get("/tickets/export", headers=auth(alice),
+                                                  params={"format": "ndjson"}))]
+    assert visible == [own.id, assigned.id]
+    # Фильтр не расширяет видимость
+    assert ndjson(client.get("/tickets/export", headers=auth(alice),
+                             params={"format": "ndjson", "creator_id": carol.id})) == [
+        r for r in ndjson(client.get("/tickets/export", headers=auth(alice), params={"format": "ndjson"}))
+        if r["id"] == assigned.id
+    ]
+
+
+def test_archived_tickets_only_on_request(client, db, auth, people, make_ticket):
+    alice, bob, carol = people
+    active = make_ticket(alice, title="Active")
+    old = make_ticket(alice, title="Old", status="closed", updated_at=datetime.utcnow() - timedelta(days=30))
+    foreign = make_ticket(carol, title="Carol's", status="closed", updated_at=datetime.utcnow() - timedelta(days=30))
+    report_id = crud.create_report(db, old.id, "Заменили картридж").id
+    ids = active.id, old.id, foreign.id
+    assert crud.archive_closed_tickets(db, datetime.utcnow() - timedelta(days=1), batch_size=10) == 2
+    assert db.get(models.TicketArchive, ids[1]) is not None
+
+    assert [r["id"] for r in ndjson(client.get("/tickets/export", headers=auth(bob),
+                                               params={"format": "ndjson"}))] == [ids[0]]
+
+    records = ndjson(client.get("/tickets/export", headers=auth(bob),
+                                params={"format": "ndjson", "include_archived": True, "include_reports": True}))
+    assert [r["id"] for r in records] == list(ids)
+    assert records[0]["archived_at"] is None and records[0]["reports"] == []
+    assert records[1]["archived_at"] is not None
+    assert [(r["id"], r["comment"]) for r in records[1]["reports"]] == [(report_id, "Заменили картридж")]
+    assert set(records[1]["reports"][0]) == set(export.REPORT_FIELDS)
+
+    table = rows(client.get("/tickets/export", headers=auth(bob), params={"include_archived": True}))
+    assert list(table[0]) == export.ARCHIVE_FIELDS
+    assert [(r["id"], bool(r["archived_at"])) for r in table] == [(str(ids[0]), False), (str(ids[1]), True),
+                                                                  (str(ids[2]), True)]
+
+    # Архив подчиняется тем же правилам видимости
+    assert [r["id"] for r in ndjson(client.get("/tickets/export", headers=auth(alice),
+                                               params={"format": "ndjson", "include_archived": True}))] == list(ids[:2])
@@ -0,0 +1,44 @@
+"""Readiness-проба: проверяется тот движок базы, через который идут запросы"""
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import database, health
+
+
+@pytest.fixture(autouse=True)
+def fresh_results():
+    health._results.clear()
+    yield
+    health._results.clear()
+
+
+def test_ready_on_sync_engine(client):
+    resp = client.get("/health/ready")
+
+    assert resp.status_code == 200
+    assert resp.json()["checks"]["database"]["status"] == "ok"
+
+
+def test_async_mode_pings_the_async_engine(client, async_engine, count_statements, monkeypatch):
+    monkeypatch.setattr(database, "DB_ASYNC", True)
+    monkeypatch.setattr(database, "async_engine", async_engine)
+
+    with count_statements() as sync_statements, count_statements(async_engine.sync_engine) as async_statements:
+        resp = client.get("/health/ready")
+
+    assert resp.status_code == 200
+    # Свои запросы к sync-движку здесь может делать только очередь загрузок в фоне
+    assert "SELECT 1" not in sync_statements
+    assert async_statements == ["SELECT 1"]
+
+
+def test_broken_async_engine_is_not_ready(client, monkeypatch):
+    broken = create_async_engine("sqlite+aiosqlite:////nonexistent/helpdesk.db", poolclass=NullPool)
+    monkeypatch.setattr(database, "DB_ASYNC", True)
+    monkeypatch.setattr(database, "async_engine", broken)
+
+    resp = client.get("/health/ready")
+
+    assert resp.status_code == 503
+    assert resp.json()["checks"]["database"]["status"] == "error"
@@ -0,0 +1,44 @@
+"""Учет SQL в метриках, журнал медленных запросов и доступ к служебным эндпоинтам (app/metrics.py)"""
+import pytest
+from sqlalchemy import exc, text
+
+from app import metrics, security
+from app.database import engine
+
+
+@pytest.fixture
+def request_stats():
+    stats = metrics.RequestStats(keep_log=True)
+    token = metrics._request_stats.set(stats)
+    yield stats
+    metrics._request_stats.reset(token)
+
+
+def test_failed_statement_is_counted_and_does_not_skew_the_next(request_stats):
+    with engine.connect() as conn:
+        with pytest.raises(exc.OperationalError):
+            conn.execute(text("SELECT * FROM no_such_table"))
+        conn.rollback()
+        conn.execute(text("SELECT 1"))
+
+    assert request_stats.statements == 2
+    assert [sql for _, sql in request_stats.log] == ["SELECT * FROM no_such_table", "SELECT 1"]
+    assert all(ms < 1000 for ms, _ in request_stats.log)
+
+
+OPS_ENDPOINTS = ["/metrics", "/cache/stats", "/db/pool", "/events/stats"]
+
+
+@pytest.mark.parametrize("path", OPS_ENDPOINTS)
+def test_ops_endpoints_require_the_metrics_token(client, path):
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get(path, headers={"Authorization": "Bearer test-metrics-token"}).status_code == 200
+
+
+@pytest.mark.parametrize("app_env, status", [("production", 404), ("dev", 200)])
+def test_ops_endpoints_without_a_token_are_off_outside_dev(client, monkeypatch, app_env, status):
+    monkeypatch.setattr(security, "METRICS_TOKEN", None)
+    monkeypatch.setattr(security, "APP_ENV", app_env)
+
+    assert [client.get(path).status_code for path in OPS_ENDPOINTS] == [status] * len(OPS_ENDPOINTS)
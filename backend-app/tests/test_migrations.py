@@ -0,0 +1,51 @@
+"""Миграции по одной ревизии: каждая применяется (и откатывается) сама по себе, итог совпадает с моделями"""
+import pytest
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, inspect
+
+from app import manage
+from app.database import Base
+
+
+@pytest.fixture
+def migrate(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/steps.db")
+    config = Config(manage.ALEMBIC_INI)
+    config.attributes["configure_logger"] = False
+
+    def run(fn, revision):
+        with engine.begin() as connection:
+            config.attributes["connection"] = connection
+            fn(config, revision)
+
+    yield run, engine
+    engine.dispose()
+
+
+def revisions():
+    script = ScriptDirectory.from_config(Config(manage.ALEMBIC_INI))
+    return [r.revision for r in reversed(list(script.walk_revisions()))]
+
+
+def test_revisions_apply_one_by_one(migrate):
+    run, engine = migrate
+    for revision in revisions():
+        run(command.upgrade, revision)
+
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        assert {c.name for c in table.columns} <= {c["name"] for c in inspector.get_columns(table.name)}, table.name
+        expected = {i.name for i in table.indexes}
+        assert expected <= {i["name"] for i in inspector.get_indexes(table.name)}, table.name
+
+
+def test_downgrade_to_base_and_back(migrate):
+    run, engine = migrate
+    run(command.upgrade, "head")
+    for revision in reversed(["base", *revisions()[:-1]]):
+        run(command.downgrade, revision)
+    assert set(inspect(engine).get_table_names()) <= {"alembic_version"}
+
+    run(command.upgrade, "head")
@@ -0,0 +1,55 @@
+"""Число SQL-запросов на страницу списка не должно зависеть от числа заявок на ней (нет N+1)"""
+import pytest
+
+from app import cache, crud, schemas
+
+
+@pytest.fixture
+def tickets(make_user, make_ticket):
+    """30 заявок с разными автором, исполнителем и последним редактором"""
+    users = [make_user(f"user{i}", is_staff=i % 2 == 0) for i in range(6)]
+    for i in range(30):
+        make_ticket(users[i % 6], title=f"Ticket {i}", assignee_id=users[(i + 1) % 6].id,
+                    last_editor_id=users[(i + 2) % 6].id)
+    return users
+
+
+def test_ticket_page_is_one_statement(db, tickets, count_statements):
+    for limit in (1, 10, 30):
+        with count_statements() as statements:
+            rows, _ = crud.get_tickets(db, is_staff=True, limit=limit)
+        assert len(rows) == limit
+        assert len(statements) == 1
+
+
+def test_all_tickets_load_users_with_the_ticket(db, tickets, count_statements):
+    with count_statements() as statements:
+        loaded = crud.get_all_tickets(db)
+        # Сериализация обращается к creator/assignee/last_editor каждой заявки
+        responses = [schemas.TicketResponse.model_validate(t) for t in loaded]
+
+    assert len(responses) == 30
+    assert all(r.assignee and r.last_editor for r in responses)
+    assert len(statements) == 1
+
+
+def test_api_statement_count_is_constant_per_page(client, auth, tickets, count_statements):
+    headers = auth(tickets[0])
+    client.get("/tickets/", headers=headers, params={"limit": 2})  # прогрев: принципал, соединение
+
+    counts = {}
+    for limit in (1, 10, 25):
+        cache.ticket_lists.clear()  # считаем запросы к базе, а не попадания в кэш списков
+        with count_statements() as statements:
+            resp = client.get("/tickets/", headers=headers, params={"limit": limit})
+        assert resp.status_code == 200
+        assert len(resp.json()["items"]) == limit
+        counts[limit] = len(statements)
+
+    next_cursor = resp.json()["next_cursor"]
+    with count_statements() as statements:
+        resp = client.get("/tickets/", headers=headers, params={"limit": 25, "cursor": next_cursor})
+    assert len(resp.json()["items"]) == 5
+    counts["cursor"] = len(statements)
+
+    assert set(counts.values()) == {1}, counts
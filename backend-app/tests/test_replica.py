@@ -0,0 +1,81 @@
+"""Чтение с реплики (app/database.py): без DATABASE_REPLICA_URL — основная база, запись — всегда основная"""
+import asyncio
+import os
+import subprocess
+import sys
+
+from fastapi.routing import APIRoute
+
+from app import database
+from app.database import engine, get_db, get_read_db
+from app.main import app
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+def dependencies(dependant):
+    for dependency in dependant.dependencies:
+        yield dependency.call
+        yield from dependencies(dependency)
+
+
+def test_read_db_falls_back_to_primary_without_replica_url():
+    assert database.DATABASE_REPLICA_URL is None
+    assert not database.reads_from_replica()
+
+    async def bind():
+        sessions = get_read_db()
+        db = await sessions.__anext__()
+        try:
+            return db.get_bind()
+        finally:
+            await sessions.aclose()
+
+    assert asyncio.run(bind()) is engine
+
+
+def test_replica_url_gets_its_own_engine():
+    # Движки создаются при импорте — проверяем в отдельном процессе с другим окружением
+    code = ("from app import database; "
+            "print(database.reads_from_replica(), database.read_engine.url.database, database.engine.url.database)")
+    env = {**os.environ, "DATABASE_REPLICA_URL": "sqlite:////tmp/replica.db"}
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.dirname(__file__))).stdout.split()
+    assert out[0] == "True"
+    assert out[1] == "/tmp/replica.db" and out[2] != out[1]
+
+
+def test_write_routes_do_not_depend_on_read_db():
+    routes = [r for r in app.routes if isinstance(r, APIRoute) and r.methods & WRITE_METHODS]
+    assert routes
+    for route in routes:
+        assert get_read_db not in set(dependencies(route.dependant)), route.path
+    assert any(get_db in set(dependencies(route.dependant)) for route in routes)
+
+
+def test_write_requests_never_open_a_replica_session(client, auth, make_user, make_ticket):
+    alice, bob, root = make_user("alice"), make_user("bob", is_staff=True), make_user("root", is_admin=True)
+    opened = []
+
+    async def replica():
+        opened.append(True)
+        async for db in database._session(database.ReadSessionLocal, database.AsyncReadSessionLocal):
+            yield db
+
+    app.dependency_overrides[get_read_db] = replica
+    try:
+        ticket_id = client.post("/tickets/", headers=auth(alice), json={"title": "VPN", "description": "-"}).json()["id"]
+        other_id = make_ticket(alice).id
+        client.put(f"/tickets/{ticket_id}", headers=auth(bob), json={"status": "in_progress"})
+        client.post(f"/tickets/{ticket_id}/reports", headers=auth(alice), data={"comment": "Still broken"})
+        client.post("/tickets/claim", headers=auth(bob))
+        client.post("/tickets/bulk/status", headers=auth(bob), json={"ids": [ticket_id], "status": "closed"})
+        client.post("/tickets/bulk/import", headers=auth(root), json=[{"title": "Imported"}])
+        client.delete(f"/tickets/{other_id}", headers=auth(root))
+        assert opened == []
+
+        # Сама подмена работает: список заявок читается через get_read_db
+        assert client.get("/tickets/", headers=auth(alice)).status_code == 200
+        assert opened == [True]
+    finally:
+        app.dependency_overrides.pop(get_read_db, None)
@@ -0,0 +1,103 @@
+"""Полнотекстовый поиск на SQLite: FTS5-таблицы из миграции 0001d и триггеры, которые их обновляют"""
+import pytest
+
+from app import crud, models
+
+
+def search(db, q, user=None, **kwargs):
+    privileged = user is None
+    items, next_offset = crud.search_tickets(db, q, user_id=user.id if user else None,
+                                             is_staff=privileged, **kwargs)
+    return [t.title for t in items], next_offset
+
+
+def add_report(db, ticket, comment):
+    db.add(models.Report(ticket_id=ticket.id, comment=comment))
+    db.commit()
+
+
+def test_more_relevant_ticket_comes_first(db, make_user, make_ticket):
+    user = make_user("alice")
+    make_ticket(user, title="Laptop is slow", description="Sometimes the VPN client hangs on start, " + "filler " * 30)
+    make_ticket(user, title="VPN is down", description="VPN does not connect since the morning")
+    make_ticket(user, title="Printer", description="Out of toner")
+
+    assert search(db, "vpn") == (["VPN is down", "Laptop is slow"], None)
+
+
+def test_all_words_are_required(db, make_user, make_ticket):
+    user = make_user("alice")
+    make_ticket(user, title="VPN is down", description="Office network")
+    make_ticket(user, title="VPN is slow", description="Home network")
+
+    assert search(db, "vpn home")[0] == ["VPN is slow"]
+
+
+def test_report_comments_are_searched(db, make_user, make_ticket):
+    user = make_user("alice")
+    ticket = make_ticket(user, title="Printer is broken")
+    add_report(db, ticket, "Replaced the fuser unit")
+
+    assert search(db, "fuser")[0] == ["Printer is broken"]
+
+
+def test_only_visible_tickets_are_found(db, make_user, make_ticket):
+    alice, bob = make_user("alice"), make_user("bob")
+    make_ticket(alice, title="Alice cannot print")
+    make_ticket(bob, title="Bob cannot print")
+    make_ticket(bob, title="Bob asks alice to print", assignee_id=alice.id)
+
+    assert sorted(search(db, "print", user=alice)[0]) == ["Alice cannot print", "Bob asks alice to print"]
+    assert len(search(db, "print")[0]) == 3
+
+
+def test_pages_do_not_overlap(db, make_user, make_ticket):
+    user = make_user("alice")
+    for i in range(5):
+        make_ticket(user, title=f"Monitor {i} flickers")
+
+    seen, offset = [], 0
+    while offset is not None:
+        titles, offset = search(db, "monitor", limit=2, offset=offset)
+        seen += titles
+    assert sorted(seen) == [f"Monitor {i} flickers" for i in range(5)]
+
+
+def test_index_follows_updates_and_deletes(client, db, make_user, make_ticket, auth):
+    user = make_user("alice")
+    admin = make_user("root", is_admin=True)
+    ticket = make_ticket(user, title="Keyboard is sticky")
+    add_report(db, ticket, "Spilled coffee")
+
+    client.put(f"/tickets/{ticket.id}", headers=auth(user), json={"title": "Mouse is sticky"})
+    assert search(db, "keyboard")[0] == []
+    assert search(db, "mouse")[0] == ["Mouse is sticky"]
+
+    client.delete(f"/tickets/{ticket.id}", headers=auth(admin))
+    assert search(db, "mouse")[0] == []
+    assert search(db, "coffee")[0] == []
+
+
+@pytest.mark.parametrize("q, found", [
+    ('"vpn', True), ("vpn*", True), ("(vpn)", True), ("vpn -", True), ("vpn:", True),
+    # Операторы FTS5 ищутся как обычные слова — в заявке их нет
+    ("vpn NOT", False), ("title:vpn", False), ("NEAR(vpn", False),
+    ('"', False), ("*", False), ("...", False),
+])
+def test_fts5_syntax_in_query_is_plain_text(db, make_user, make_ticket, q, found):
+    make_ticket(make_user("alice"), title="VPN is down")
+
+    assert search(db, q)[0] == (["VPN is down"] if found else [])
+
+
+def test_search_endpoint(client, make_user, make_ticket, auth):
+    user = make_user("alice")
+    make_ticket(user, title="Монитор мерцает", description="После обновления драйвера")
+
+    resp = client.get("/tickets/search", headers=auth(user), params={"q": "драйвера"})
+
+    assert resp.status_code == 200
+    assert [t["title"] for t in resp.json()["items"]] == ["Монитор мерцает"]
+    assert resp.json()["items"][0]["creator"]["username"] == "alice"
+    assert resp.json()["next_offset"] is None
+    assert client.get("/tickets/search", headers=auth(user), params={"q": ""}).status_code == 422
@@ -0,0 +1,68 @@
+"""Быстрый путь списков (app/serialization.py) дает те же байты, что pydantic через TicketResponse"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import crud, schemas, serialization
+
+USERS = {
+    "creator": (1, "alice", False, False),
+    "assignee": (2, "bob", False, True),
+    "last_editor": (3, "root", True, True),
+}
+
+
+def row(created_at, updated_at=None, users=("creator",), **fields):
+    values = {"id": 7, "title": "VPN", "description": "Не подключается", "status": "new", "creator_id": 1,
+              "assignee_id": None, "last_editor_id": None, "created_at": created_at, "updated_at": updated_at,
+              "version": 3, **fields}
+    columns = list(values.values())
+    for role in ("creator", "assignee", "last_editor"):
+        columns += USERS[role] if role in users else (None, None, None, None)
+    return tuple(columns), values
+
+
+def as_model(values, users):
+    nested = {role: dict(zip(("id", "username", "is_admin", "is_staff"), USERS[role])) for role in users}
+    return schemas.TicketResponse(**values, **nested)
+
+
+@pytest.mark.parametrize("created_at", [
+    datetime(2026, 1, 1, 0, 0, tzinfo=timezone.utc),
+    datetime(2026, 1, 1, 12, 30, 5, 123456, tzinfo=timezone.utc),
+    datetime(2026, 1, 1, 12, 30, 5, tzinfo=timezone(timedelta(hours=3))),
+    datetime(2026, 1, 1, 12, 30, 5),  # SQLite отдает время без зоны
+], ids=["utc", "utc-micro", "offset", "naive"])
+def test_page_bytes_match_pydantic(created_at):
+    full, full_values = row(created_at, created_at + timedelta(minutes=1), users=("creator", "assignee", "last_editor"),
+                            assignee_id=2, last_editor_id=3, status="in_progress")
+    bare, bare_values = row(created_at, id=8)
+
+    expected = schemas.TicketPage(
+        items=[as_model(full_values, ("creator", "assignee", "last_editor")), as_model(bare_values, ("creator",))],
+        next_cursor="abc",
+    ).model_dump_json().encode()
+
+    assert serialization.ticket_page([full, bare], "abc") == expected
+
+
+def test_search_page_bytes_match_pydantic():
+    created_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    columns, values = row(created_at)
+
+    expected = schemas.TicketSearchPage(items=[as_model(values, ("creator",))], next_offset=None).model_dump_json()
+
+    assert serialization.ticket_search_page([columns], None) == expected.encode()
+
+
+def test_rows_from_the_database_match_orm_path(db, make_user, make_ticket):
+    alice, bob = make_user("alice"), make_user("bob", is_staff=True)
+    make_ticket(alice, title="Assigned", assignee_id=bob.id, last_editor_id=bob.id)
+    make_ticket(alice, title="Bare", description="")
+
+    rows, next_cursor = crud.get_tickets(db, is_staff=True, limit=10)
+    orm = sorted(crud.get_all_tickets(db), key=lambda t: (t.created_at, t.id), reverse=True)
+    expected = schemas.TicketPage(items=[schemas.TicketResponse.model_validate(t) for t in orm],
+                                  next_cursor=next_cursor).model_dump_json()
+
+    assert serialization.ticket_page(rows, next_cursor) == expected.encode()
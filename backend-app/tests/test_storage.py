@@ -0,0 +1,112 @@
+import hashlib
+import io
+import os
+import time
+
+import httpx
+import pytest
+
+from app import models, storage
+
+
+def wait_for_attachment(client, headers, ticket_id, report_id, timeout=10.0):
+    """Ждет, пока фоновая очередь допишет состояние вложения"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        reports = client.get(f"/tickets/{ticket_id}/reports", headers=headers).json()
+        state = next(r["attachment_state"] for r in reports if r["id"] == report_id)
+        if state not in (models.ATTACHMENT_PENDING, models.ATTACHMENT_UPLOADING):
+            return state
+        time.sleep(0.05)
+    raise AssertionError(f"attachment of report {report_id} is still {state}")
+
+
+def test_upload_and_download(s3):
+    key = storage.blob_key(hashlib.sha256(b"log line\n").hexdigest())
+    assert not storage.blob_exists(key)
+
+    size = storage.upload_fileobj(io.BytesIO(b"log line\n"), key, "text/plain")
+
+    assert size == 9
+    assert storage.blob_exists(key)
+    obj = s3.get_object(Bucket=storage.OCI_BUCKET_NAME, Key=key)
+    assert obj["Body"].read() == b"log line\n"
+    assert obj["ContentType"] == "text/plain"
+
+
+def test_large_file_is_uploaded_in_parts(s3, tmp_path):
+    path = tmp_path / "bundle.bin"
+    path.write_bytes(os.urandom(2 * storage.UPLOAD_PART_SIZE + 1024))
+
+    with open(path, "rb") as f:
+        storage.upload_fileobj(f, "blobs/bundle", "application/octet-stream")
+
+    # ETag multipart-объекта — "<md5>-<число частей>"
+    head = s3.head_object(Bucket=storage.OCI_BUCKET_NAME, Key="blobs/bundle")
+    assert head["ETag"].strip('"').endswith("-3")
+    body = s3.get_object(Bucket=storage.OCI_BUCKET_NAME, Key="blobs/bundle")["Body"].read()
+    assert body == path.read_bytes()
+
+
+def test_upload_over_limit_is_rejected(s3, monkeypatch):
+    monkeypatch.setattr(storage, "UPLOAD_MAX_BYTES", 8)
+
+    with pytest.raises(storage.UploadTooLarge):
+        storage.upload_fileobj(io.BytesIO(b"0123456789"), "blobs/too-large")
+    assert not storage.blob_exists("blobs/too-large")
+
+
+def test_presigned_url_serves_original_name(s3):
+    storage.upload_fileobj(io.BytesIO(b"%PDF-1.4"), "blobs/report")
+
+    hits = storage.presigned_urls.hits
+    url, expires_in = storage.presigned_get_url("blobs/report", "отчет.pdf", "application/pdf")
+
+    assert expires_in == storage.PRESIGN_TTL
+    resp = httpx.get(url)
+    assert resp.status_code == 200
+    assert resp.content == b"%PDF-1.4"
+    assert resp.headers["content-type"] == "application/pdf"
+    assert "filename*=UTF-8''%D0%BE%D1%82%D1%87%D0%B5%D1%82.pdf" in resp.headers["content-disposition"]
+    # Повторная ссылка — из кэша, без подписи заново
+    assert storage.presigned_get_url("blobs/report", "отчет.pdf", "application/pdf")[0] == url
+    assert storage.presigned_urls.hits == hits + 1
+
+
+def test_report_attachment_end_to_end(client, s3, make_user, make_ticket, auth):
+    user = make_user("alice")
+    ticket = make_ticket(user)
+    headers = auth(user)
+    content = os.urandom(300 * 1024)
+
+    resp = client.post(f"/tickets/{ticket.id}/reports", headers=headers, data={"comment": "logs attached"},
+                       files={"file": ("app.log", content, "text/plain")})
+
+    assert resp.status_code == 200
+    assert resp.json()["attachment_state"] == models.ATTACHMENT_PENDING
+    report_id = resp.json()["report_id"]
+    assert wait_for_attachment(client, headers, ticket.id, report_id) == models.ATTACHMENT_DONE
+
+    attachment = client.get(f"/tickets/{ticket.id}/reports/{report_id}/attachment", headers=headers)
+    assert attachment.status_code == 200
+    download = httpx.get(attachment.json()["url"])
+    assert download.content == content
+    assert 'filename*=UTF-8\'\'app.log' in download.headers["content-disposition"]
+
+    # Тот же файл во втором отчете не грузится повторно: объект адресуется хэшем содержимого
+    again = client.post(f"/tickets/{ticket.id}/reports", headers=headers, data={"comment": "same logs"},
+                        files={"file": ("copy.log", content, "text/plain")})
+    assert again.json()["attachment_state"] == models.ATTACHMENT_DONE
+    assert s3.list_objects_v2(Bucket=storage.OCI_BUCKET_NAME)["KeyCount"] == 1
+
+
+def test_report_attachment_over_limit(client, s3, make_user, make_ticket, auth, monkeypatch):
+    monkeypatch.setattr(storage, "UPLOAD_MAX_BYTES", 1024)
+    user = make_user("alice")
+    ticket = make_ticket(user)
+
+    resp = client.post(f"/tickets/{ticket.id}/reports", headers=auth(user), data={"comment": "too big"},
+                       files={"file": ("dump.bin", b"x" * 2048, "application/octet-stream")})
+
+    assert resp.status_code == 413
+    assert client.get(f"/tickets/{ticket.id}/reports", headers=auth(user)).json() == []
@@ -0,0 +1,84 @@
+"""PUT /tickets/{id}: правила ролей и версия в одном UPDATE ... RETURNING (crud.update_ticket)"""
+import pytest
+
+from app import models
+
+
+@pytest.fixture
+def people(make_user):
+    return make_user("alice"), make_user("bob", is_staff=True), make_user("carol", is_staff=True)
+
+
+def row(db, ticket_id):
+    db.expire_all()
+    t = db.get(models.Ticket, ticket_id)
+    return {"title": t.title, "description": t.description, "status": t.status,
+            "assignee_id": t.assignee_id, "last_editor_id": t.last_editor_id, "version": t.version}
+
+
+def test_stale_version_is_409_and_row_is_unchanged(client, db, auth, people, make_ticket):
+    alice, bob, _ = people
+    ticket_id = make_ticket(alice).id
+    taken = client.put(f"/tickets/{ticket_id}", headers=auth(bob), json={"status": "in_progress", "version": 1})
+    assert taken.status_code == 200
+    before = row(db, ticket_id)
+
+    resp = client.put(f"/tickets/{ticket_id}", headers=auth(alice), json={"title": "Stale edit", "version": 1})
+
+    assert resp.status_code == 409
+    assert row(db, ticket_id) == before
+
+
+def test_current_version_passes_and_is_bumped(client, db, auth, people, make_ticket):
+    alice, _, _ = people
+    ticket_id = make_ticket(alice).id
+
+    resp = client.put(f"/tickets/{ticket_id}", headers=auth(alice), json={"title": "Fresh edit", "version": 1})
+
+    assert resp.status_code == 200
+    assert (resp.json()["title"], resp.json()["version"]) == ("Fresh edit", 2)
+
+
+def test_creator_edits_text_but_not_status_or_assignee(client, db, auth, people, make_ticket):
+    alice, _, _ = people
+    ticket_id = make_ticket(alice).id
+
+    resp = client.put(f"/tickets/{ticket_id}", headers=auth(alice),
+                      json={"title": "New title", "description": "New text", "status": "in_progress"})
+
+    assert resp.status_code == 200
+    assert row(db, ticket_id) == {"title": "New title", "description": "New text", "status": "new",
+                                  "assignee_id": None, "last_editor_id": alice.id, "version": 2}
+
+
+def test_creator_cannot_edit_a_closed_ticket(client, db, auth, people, make_ticket):
+    alice, _, _ = people
+    ticket_id = make_ticket(alice, status="closed").id
+
+    client.put(f"/tickets/{ticket_id}", headers=auth(alice), json={"title": "Reopen me"})
+
+    assert row(db, ticket_id)["title"] == "Printer is broken"
+
+
+def test_staff_changes_status_and_takes_the_ticket(client, db, auth, people, make_ticket):
+    alice, bob, _ = people
+    ticket_id = make_ticket(alice).id
+
+    resp = client.put(f"/tickets/{ticket_id}", headers=auth(bob),
+                      json={"status": "in_progress", "title": "Staff title"})
+
+    assert resp.status_code == 200
+    # Текст заявки правит только автор
+    assert row(db, ticket_id) == {"title": "Printer is broken", "description": "Paper jam on the 3rd floor",
+                                  "status": "in_progress", "assignee_id": bob.id, "last_editor_id": bob.id,
+                                  "version": 2}
+
+
+def test_staff_does_not_steal_an_assigned_ticket(client, db, auth, people, make_ticket):
+    alice, bob, carol = people
+    ticket_id = make_ticket(alice, assignee_id=bob.id).id
+
+    client.put(f"/tickets/{ticket_id}", headers=auth(carol), json={"status": "in_progress"})
+    client.put(f"/tickets/{ticket_id}", headers=auth(carol), json={"status": "closed"})
+
+    assert (row(db, ticket_id)["status"], row(db, ticket_id)["assignee_id"]) == ("closed", bob.id)
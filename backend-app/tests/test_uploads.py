@@ -0,0 +1,145 @@
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+from app import crud, models, storage, uploads
+from app.main import app
+
+
+def make_report(db, ticket, state, content=b"", created_at=None):
+    report = models.Report(ticket_id=ticket.id, comment="logs", file_name="app.log", content_type="text/plain",
+                           file_path=storage.blob_key(hashlib.sha256(content).hexdigest()), attachment_state=state)
+    if created_at:
+        report.created_at = created_at
+    db.add(report)
+    db.commit()
+    return report
+
+
+def wait_for_state(db, report_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        db.expire_all()
+        state = db.get(models.Report, report_id).attachment_state
+        if state not in crud.UPLOADS_IN_FLIGHT:
+            return state
+        time.sleep(0.05)
+    raise AssertionError(f"report {report_id} is still {state}")
+
+
+def test_interrupted_upload_is_requeued_on_startup(db, s3, make_user, make_ticket):
+    ticket = make_ticket(make_user("alice"))
+    # Процесс упал посреди загрузки: отчет в uploading, файл остался в каталоге очереди
+    report = make_report(db, ticket, models.ATTACHMENT_UPLOADING, b"stack trace")
+    with open(uploads.spool_path(report.id), "wb") as f:
+        f.write(b"stack trace")
+
+    with TestClient(app):
+        assert wait_for_state(db, report.id) == models.ATTACHMENT_DONE
+
+    obj = s3.get_object(Bucket=storage.OCI_BUCKET_NAME, Key=report.file_path)
+    assert obj["Body"].read() == b"stack trace"
+    assert not os.path.exists(uploads.spool_path(report.id))
+
+
+def test_lost_upload_is_failed_only_when_stale(db, make_user, make_ticket):
+    ticket = make_ticket(make_user("alice"))
+    hour_ago = datetime.now(timezone.utc) - timedelta(hours=1)
+    lost = make_report(db, ticket, models.ATTACHMENT_PENDING, b"lost", created_at=hour_ago)
+    # Свежая загрузка без файла здесь может еще идти у другой реплики
+    fresh = make_report(db, ticket, models.ATTACHMENT_PENDING, b"fresh")
+    done = make_report(db, ticket, models.ATTACHMENT_DONE, b"done", created_at=hour_ago)
+
+    assert uploads.UploadQueue().recover() == (0, 1)
+
+    db.expire_all()
+    assert db.get(models.Report, lost.id).attachment_state == models.ATTACHMENT_FAILED
+    assert db.get(models.Report, fresh.id).attachment_state == models.ATTACHMENT_PENDING
+    assert db.get(models.Report, fresh.id).created_at is not None
+    assert db.get(models.Report, done.id).attachment_state == models.ATTACHMENT_DONE
+
+
+def test_recover_skips_jobs_already_queued(db, make_user, make_ticket):
+    ticket = make_ticket(make_user("alice"))
+    report = make_report(db, ticket, models.ATTACHMENT_PENDING, b"queued")
+    path = uploads.spool_path(report.id)
+    with open(path, "wb") as f:
+        f.write(b"queued")
+    upload_queue = uploads.UploadQueue()  # без воркеров: задачи остаются в очереди
+
+    assert upload_queue.submit(uploads.UploadJob(report.id, path, report.file_path)) is True
+    assert upload_queue.recover() == (0, 0)
+    assert upload_queue.qsize() == 1
+    os.remove(path)
+
+
+def test_spooled_file_is_named_after_report(client, db, s3, make_user, make_ticket, auth, monkeypatch):
+    user = make_user("alice")
+    ticket = make_ticket(user)
+    # Воркеры заняты: файл ждет в каталоге очереди под именем отчета
+    monkeypatch.setattr(uploads.upload_queue, "submit", lambda job: True)
+
+    resp = client.post(f"/tickets/{ticket.id}/reports", headers=auth(user), data={"comment": "logs"},
+                       files={"file": ("app.log", b"spooled", "text/plain")})
+
+    report_id = resp.json()["report_id"]
+    with open(uploads.spool_path(report_id), "rb") as f:
+        assert f.read() == b"spooled"
+    os.remove(uploads.spool_path(report_id))
+
+
+def spool_files():
+    return {name for name in os.listdir(uploads.UPLOAD_SPOOL_DIR) if name.startswith("upload-")}
+
+
+def test_form_body_is_written_to_the_spool_dir_once(client, make_user, make_ticket, auth, monkeypatch):
+    user = make_user("alice")
+    ticket = make_ticket(user)
+    monkeypatch.setattr(uploads.upload_queue, "submit", lambda job: True)
+    spooled = []
+    spool = uploads.spool
+
+    def spy(fileobj):
+        path, content_hash, size = spool(fileobj)
+        spooled.append((type(fileobj), os.stat(path).st_ino))
+        return path, content_hash, size
+    monkeypatch.setattr(uploads, "spool", spy)
+
+    big = os.urandom(3 * 1024 * 1024)  # больше порога, с которого разбор формы пишет на диск
+    for body in (big, b"small"):
+        resp = client.post(f"/tickets/{ticket.id}/reports", headers=auth(user), data={"comment": "logs"},
+                           files={"file": ("app.log", body, "text/plain")})
+        path = uploads.spool_path(resp.json()["report_id"])
+        with open(path, "rb") as f:
+            assert f.read() == body
+        # Тот же файл, что создал разбор формы, — переименован, а не скопирован
+        assert spooled[-1] == (uploads.SpoolFile, os.stat(path).st_ino)
+        os.remove(path)
+
+
+def test_unclaimed_form_body_is_removed(client, make_user, make_ticket, auth):
+    alice, carol = make_user("alice"), make_user("carol")
+    ticket = make_ticket(alice)
+    before = spool_files()
+
+    resp = client.post(f"/tickets/{ticket.id}/reports", headers=auth(carol), data={"comment": "logs"},
+                       files={"file": ("app.log", os.urandom(3 * 1024 * 1024), "text/plain")})
+
+    assert resp.status_code == 404
+    assert spool_files() == before
+
+
+def test_spool_copies_other_files(tmp_path):
+    source = tmp_path / "report.txt"
+    source.write_bytes(b"plain file")
+
+    with open(source, "rb") as f:
+        path, content_hash, size = uploads.spool(f)
+
+    assert (content_hash, size) == (hashlib.sha256(b"plain file").hexdigest(), 10)
+    with open(path, "rb") as f:
+        assert f.read() == b"plain file"
+    os.remove(path)
@@ -0,0 +1,68 @@
+"""Страница заявки /tickets/{id}/view: ETag и 304 по If-None-Match"""
+import pytest
+
+from app import crud, models
+
+
+@pytest.fixture
+def people(make_user):
+    return make_user("alice"), make_user("bob", is_staff=True), make_user("carol")
+
+
+def view(client, headers, ticket_id, etag=None):
+    if etag:
+        headers = {**headers, "If-None-Match": etag}
+    return client.get(f"/tickets/{ticket_id}/view", headers=headers)
+
+
+def test_matching_etag_gives_empty_304(client, auth, people, make_ticket, count_statements):
+    alice, _, _ = people
+    ticket_id = make_ticket(alice).id
+    first = view(client, auth(alice), ticket_id)
+    etag = first.headers["ETag"]
+
+    with count_statements() as statements:
+        resp = view(client, auth(alice), ticket_id, etag)
+
+    assert resp.status_code == 304
+    assert resp.content == b""
+    assert resp.headers["ETag"] == etag
+    # Только агрегат для ETag — отчеты (а значит и страница) не загружаются
+    assert not any("FROM reports" in sql for sql in statements)
+    # Один из нескольких тегов и устаревший тег
+    assert view(client, auth(alice), ticket_id, f'"stale", {etag}').status_code == 304
+    assert view(client, auth(alice), ticket_id, '"stale"').status_code == 200
+
+
+def test_etag_changes_after_report_and_update(client, db, auth, people, make_ticket):
+    alice, bob, _ = people
+    ticket_id = make_ticket(alice).id
+    tags = [view(client, auth(alice), ticket_id).headers["ETag"]]
+
+    report_id = client.post(f"/tickets/{ticket_id}/reports", headers=auth(alice),
+                            data={"comment": "Still broken"}).json()["report_id"]
+    tags.append(view(client, auth(alice), ticket_id).headers["ETag"])
+
+    client.put(f"/tickets/{ticket_id}", headers=auth(bob), json={"status": "in_progress"})
+    tags.append(view(client, auth(alice), ticket_id).headers["ETag"])
+
+    crud.set_attachment_state(db, report_id, models.ATTACHMENT_FAILED)
+    tags.append(view(client, auth(alice), ticket_id).headers["ETag"])
+
+    assert len(set(tags)) == len(tags)
+    # Старый тег больше не подходит — клиент получает новую страницу
+    resp = view(client, auth(alice), ticket_id, tags[0])
+    assert resp.status_code == 200
+    assert resp.json()["ticket"]["status"] == "in_progress"
+    assert [r["comment"] for r in resp.json()["reports"]] == ["Still broken"]
+
+
+def test_invisible_ticket_is_404_even_with_its_etag(client, auth, people, make_ticket):
+    alice, _, carol = people
+    ticket_id = make_ticket(alice).id
+    etag = view(client, auth(alice), ticket_id).headers["ETag"]
+
+    resp = view(client, auth(carol), ticket_id, etag)
+    assert resp.status_code == 404
+    assert "etag" not in resp.headers
+    assert view(client, auth(carol), ticket_id + 100, etag).status_code == 404
@@ -0,0 +1,73 @@
+"""Чужие заявки по прямой ссылке: для пользователя без прав их нет (404), в том числе в архиве"""
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import crud, models
+
+
+@pytest.fixture
+def tickets(db, make_user, make_ticket):
+    """Заявка alice (рабочая и архивная) с отчетом; bob ее не видит, сотрудник видит"""
+    alice, bob, staff = make_user("alice"), make_user("bob"), make_user("carol", is_staff=True)
+    active = make_ticket(alice, title="Active")
+    archived = make_ticket(alice, title="Archived", status="closed",
+                           updated_at=datetime.utcnow() - timedelta(days=1))
+    for ticket in (active, archived):
+        db.add(models.Report(ticket_id=ticket.id, comment="Secret", file_path="blobs/x", file_name="x.txt",
+                             attachment_state=models.ATTACHMENT_DONE))
+    db.commit()
+    ids = {"active": active.id, "archived": archived.id}
+    report_ids = {i: db.query(models.Report.id).filter_by(ticket_id=i).scalar() for i in ids.values()}
+    assert crud.archive_closed_tickets(db, datetime.utcnow(), batch_size=10) == 1
+    return alice, bob, staff, ids, report_ids
+
+
+@pytest.mark.parametrize("state", ["active", "archived"])
+def test_other_users_ticket_is_not_found(client, auth, tickets, state):
+    _, bob, _, ids, report_ids = tickets
+    ticket_id = ids[state]
+    headers = auth(bob)
+
+    assert client.get(f"/tickets/{ticket_id}", headers=headers).status_code == 404
+    assert client.get(f"/tickets/{ticket_id}/view", headers=headers).status_code == 404
+    assert client.get(f"/tickets/{ticket_id}/reports", headers=headers).status_code == 404
+    attachment = f"/tickets/{ticket_id}/reports/{report_ids[ticket_id]}/attachment"
+    assert client.get(attachment, headers=headers).status_code == 404
+    assert client.post(f"/tickets/{ticket_id}/reports", headers=headers, data={"comment": "Hi"}).status_code == 404
+    assert client.put(f"/tickets/{ticket_id}", headers=headers, json={"title": "Mine"}).status_code == 404
+
+
+def test_update_does_not_touch_other_users_ticket(client, db, auth, tickets):
+    _, bob, _, ids, _ = tickets
+
+    client.put(f"/tickets/{ids['active']}", headers=auth(bob), json={"title": "Mine", "version": 1})
+
+    ticket = db.get(models.Ticket, ids["active"])
+    assert (ticket.title, ticket.version, ticket.last_editor_id) == ("Active", 1, None)
+    assert db.query(models.Report).filter_by(ticket_id=ids["active"]).count() == 1
+
+
+@pytest.mark.parametrize("state", ["active", "archived"])
+def test_owner_and_staff_see_the_ticket(client, auth, tickets, state):
+    alice, _, staff, ids, _ = tickets
+    ticket_id = ids[state]
+
+    for user in (alice, staff):
+        assert client.get(f"/tickets/{ticket_id}", headers=auth(user)).json()["id"] == ticket_id
+        assert client.get(f"/tickets/{ticket_id}/view", headers=auth(user)).status_code == 200
+        assert [r["comment"] for r in client.get(f"/tickets/{ticket_id}/reports", headers=auth(user)).json()] == ["Secret"]
+
+
+@pytest.mark.parametrize("app_env, fails", [("production", True), ("dev", False)])
+def test_missing_auth_secret(app_env, fails):
+    env = {k: v for k, v in os.environ.items() if k != "AUTH_SECRET"}
+    env["APP_ENV"] = app_env
+    result = subprocess.run([sys.executable, "-c", "import app.security"], env=env,
+                            cwd=os.path.dirname(os.path.dirname(__file__)), capture_output=True, text=True)
+
+    assert (result.returncode != 0) == fails
+    assert "AUTH_SECRET is not set" in result.stderr
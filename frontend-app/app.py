@@ -1,12 +1,85 @@
+import logging
 import os
-from flask import Flask, render_template, request, redirect, url_for, session, flash
-import requests
+import threading
+import uuid
+from flask import Flask, Response, render_template, request, redirect, url_for, session, flash, jsonify, stream_with_context
+from backend_client import BackendClient
+import compression
+import metrics
+
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+                    format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'dev-secret')
+metrics.init_app(app)
+# После метрик: after_request выполняются в обратном порядке, время страницы включает сжатие
+compression.init_app(app)
 
 # Получаем URL бэкенда
 BACKEND_URL = os.getenv('BACKEND_URL', 'http://localhost:8000')
+backend = BackendClient(
+    BACKEND_URL,
+    timeout=(3.05, float(os.getenv('BACKEND_TIMEOUT', 10))),
+    pool_size=int(os.getenv('BACKEND_POOL_SIZE', 20)),
+)
+
+# Ленты событий держат соединение с бэкендом, пока открыта страница: у них свой пул,
+# чтобы не вытеснять keep-alive соединения обычных вызовов. Сверх EVENTS_MAX_STREAMS
+# отвечаем 503 (браузер переподключится сам) — страницам должны оставаться соединения воркера.
+# Место ушедшего клиента освобождается, когда не удается отдать ему очередной keepalive бэкенда
+EVENTS_MAX_STREAMS = int(os.getenv('EVENTS_MAX_STREAMS', 800))
+events_backend = BackendClient(BACKEND_URL, pool_size=EVENTS_MAX_STREAMS, retries=0, max_workers=1)
+event_streams = threading.BoundedSemaphore(EVENTS_MAX_STREAMS)
+
+# Лимит размера вложения (должен совпадать с UPLOAD_MAX_BYTES бэкенда).
+# Werkzeug сам отвечает 413 на тело больше лимита, а файлы крупнее 500KB держит во временном файле, не в памяти
+UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', 100 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 256 * 1024
+app.config['MAX_CONTENT_LENGTH'] = UPLOAD_MAX_BYTES + 1024 * 1024  # + запас на поля формы
+
+
+def stream_multipart(fields, file_field, file):
+    """
+    Собирает multipart/form-data тело генератором: файл читается кусками по UPLOAD_CHUNK_SIZE
+    и уходит в бэкенд chunked-запросом, целиком в памяти он не оказывается.
+    Возвращает (генератор тела, Content-Type).
+    """
+    boundary = uuid.uuid4().hex
+
+    def body():
+        for name, value in fields.items():
+            yield (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+                   f'{value}\r\n').encode('utf-8')
+        if file:
+            filename = file.filename.replace('"', '%22')
+            content_type = file.mimetype or 'application/octet-stream'
+            yield (f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+                   f'Content-Type: {content_type}\r\n\r\n').encode('utf-8')
+            while True:
+                chunk = file.stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+            yield b'\r\n'
+        yield f'--{boundary}--\r\n'.encode('utf-8')
+
+    return body(), f'multipart/form-data; boundary={boundary}'
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    flash('File is too large', 'error')
+    return redirect(request.referrer or url_for('dashboard'))
+
+@app.before_request
+def drop_legacy_session():
+    # Сессия без токена бэкенда (вход до перехода на токены) — просим войти заново
+    if 'user_id' in session and 'token' not in session:
+        session.clear()
+
+def backend_token():
+    return session.get('token')
 
 @app.route('/')
 def index():
@@ -20,14 +93,17 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
         try:
-            resp = requests.post(f"{BACKEND_URL}/auth/login", json={"username": username, "password": password})
+            resp = backend.post("/auth/login", json={"username": username, "password": password})
             if resp.status_code == 200:
                 user = resp.json()
                 session['user_id'] = user['id']
+                session['token'] = user['access_token']
                 session['username'] = user['username']
                 session['is_admin'] = user['is_admin']
                 session['is_staff'] = user.get('is_staff', False)
                 return redirect(url_for('dashboard'))
+            elif resp.status_code == 503:
+                flash('Too many logins right now, try again in a few seconds', 'error')
             else:
                 flash('Invalid credentials', 'error')
         except Exception as e:
@@ -39,27 +115,57 @@ def logout():
     session.clear()
     return redirect(url_for('login'))
 
+# Фильтры дашборда, которые прокидываются в GET /tickets/ как есть
+DASHBOARD_FILTERS = ('status', 'assignee_id', 'creator_id', 'created_from', 'created_to')
+
 @app.route('/dashboard') # В Flask используется @app.route, а не @router.get
 def dashboard():
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
-    # Подготавливаем параметры для бэкенда
-    params = {
-        'user_id': session['user_id'],
-        'is_admin': str(session.get('is_admin', False)).lower(),
-        'is_staff': str(session.get('is_staff', False)).lower()
-    }
+    filters = {k: request.args[k] for k in DASHBOARD_FILTERS if request.args.get(k)}
+    cursor = request.args.get('cursor')
+    query = request.args.get('q', '').strip()
+    offset = request.args.get('offset', 0, type=int)
+
+    # Подготавливаем параметры для бэкенда; пользователя бэкенд берет из токена
+    params = dict(filters)
+    token = backend_token()
+    if cursor:
+        params['cursor'] = cursor
     
+    next_cursor = None
+    next_offset = None
+    if query:
+        # Полнотекстовый поиск: страницы по релевантности, а не по дате
+        list_call = lambda: backend.get("/tickets/search", params={'q': query, 'offset': offset}, token=token)
+    else:
+        # Вызываем бэкенд: он отдает одну страницу и курсор следующей
+        list_call = lambda: backend.get("/tickets/", params=params, token=token)
+    # Статистика для шапки — параллельно со списком
+    stats_call = lambda: backend.get("/tickets/stats", token=token)
     try:
-        # Вызываем бэкенд
-        resp = requests.get(f"{BACKEND_URL}/tickets/", params=params, timeout=5)
-        tickets = resp.json() if resp.status_code == 200 else []
+        resp, stats_resp = backend.gather(list_call, stats_call)
+        if resp.status_code == 401:
+            # Токен истек — заново через логин
+            session.clear()
+            return redirect(url_for('login'))
+        if resp.status_code == 200:
+            page = resp.json()
+            tickets = page['items']
+            next_cursor = page.get('next_cursor')
+            next_offset = page.get('next_offset')
+        else:
+            tickets = []
+        stats = stats_resp.json() if stats_resp.status_code == 200 else None
     except Exception as e:
-        print(f"Error: {e}")
+        logger.warning("Dashboard backend call failed: %s", e)
         tickets = []
+        stats = None
         
-    return render_template('dashboard.html', tickets=tickets, user=session)
+    return render_template('dashboard.html', tickets=tickets, user=session, stats=stats,
+                           filters=filters, cursor=cursor, next_cursor=next_cursor,
+                           query=query, offset=offset, next_offset=next_offset)
 # --- Создание тикета ---
 @app.route('/create_ticket', methods=['POST'])
 def create_ticket():
@@ -71,18 +177,74 @@ def create_ticket():
     
     data = {
         "title": title,
-        "description": description,
-        "creator_id": session['user_id']
+        "description": description
     }
     
     try:
-        requests.post(f"{BACKEND_URL}/tickets/", json=data)
+        backend.post("/tickets/", json=data, token=backend_token())
         flash('Ticket created!', 'success')
     except:
         flash('Error creating ticket', 'error')
         
     return redirect(url_for('dashboard'))
 
+# --- Взять следующую свободную заявку (для сотрудников) ---
+@app.route('/claim', methods=['POST'])
+def claim_ticket():
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+
+    try:
+        resp = backend.post("/tickets/claim", token=backend_token())
+        claimed = resp.json() if resp.status_code == 200 else []
+        if resp.status_code != 200:
+            flash(f'Error claiming ticket: {resp.text}', 'error')
+        elif claimed:
+            flash(f"Ticket #{claimed[0]['id']} is yours", 'success')
+            return redirect(url_for('ticket_detail', ticket_id=claimed[0]['id']))
+        else:
+            flash('No free tickets right now', 'success')
+    except Exception:
+        flash('Network error claiming ticket', 'error')
+
+    return redirect(url_for('dashboard'))
+
+# --- Массовые действия над выбранными заявками ---
+@app.route('/bulk', methods=['POST'])
+def bulk_action():
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+
+    ids = request.form.getlist('ids', type=int)
+    action = request.form.get('action', '')
+    if not ids:
+        flash('No tickets selected', 'error')
+        return redirect(url_for('dashboard'))
+
+    kind, _, value = action.partition(':')
+    if kind == 'status':
+        path, body = "/tickets/bulk/status", {"ids": ids, "status": value}
+    elif kind == 'assign':
+        path, body = "/tickets/bulk/assign", {"ids": ids, "assignee_id": session['user_id'] if value == 'me' else None}
+    elif kind == 'delete':
+        path, body = "/tickets/bulk/delete", {"ids": ids}
+    else:
+        flash('Unknown action', 'error')
+        return redirect(url_for('dashboard'))
+
+    try:
+        resp = backend.post(path, json=body, token=backend_token())
+        if resp.status_code == 200:
+            result = resp.json()
+            flash(f"Done: {result['succeeded']}, failed: {result['failed']}",
+                  'success' if not result['failed'] else 'error')
+        else:
+            flash(f'Error: {resp.text}', 'error')
+    except Exception:
+        flash('Network error', 'error')
+
+    return redirect(url_for('dashboard'))
+
 # --- Удаление тикета ---
 @app.route('/ticket/<int:ticket_id>/delete', methods=['POST'])
 def delete_ticket(ticket_id):
@@ -90,9 +252,8 @@ def delete_ticket(ticket_id):
         return redirect(url_for('login'))
         
     try:
-        # Для удаления тоже нужно передавать, кто удаляет (админ)
-        params = {'user_id': session['user_id'], 'is_admin': session['is_admin']}
-        requests.delete(f"{BACKEND_URL}/tickets/{ticket_id}", params=params)
+        # Кто удаляет, бэкенд знает по токену
+        backend.delete(f"/tickets/{ticket_id}", token=backend_token())
         flash('Ticket deleted', 'success')
     except:
         flash('Error deleting ticket', 'error')
@@ -106,18 +267,16 @@ def update_ticket(ticket_id):
         return redirect(url_for('login'))
     
     status = request.form.get('status')
-    
-    # ВАЖНО: Передаем user_id в параметрах, иначе Бэкенд вернет ошибку 422
-    params = {
-        'user_id': session['user_id'],
-        'is_admin': session['is_admin'],
-        'is_staff': session.get('is_staff', False)
-    }
+    # Версия заявки, которую видел пользователь: если ее успели изменить, бэкенд вернет 409
+    version = request.form.get('version', type=int)
     
     try:
-        resp = requests.put(f"{BACKEND_URL}/tickets/{ticket_id}", json={"status": status}, params=params)
+        resp = backend.put(f"/tickets/{ticket_id}", json={"status": status, "version": version},
+                           token=backend_token())
         if resp.status_code == 200:
             flash('Status updated', 'success')
+        elif resp.status_code == 409:
+            flash('The ticket was changed by someone else. Review the current state and try again.', 'error')
         else:
             flash(f'Error updating status: {resp.text}', 'error')
     except:
@@ -131,13 +290,13 @@ def ticket_detail(ticket_id):
     if 'user_id' not in session:
         return redirect(url_for('login'))
     try:
-        t_resp = requests.get(f"{BACKEND_URL}/tickets/{ticket_id}")
-        r_resp = requests.get(f"{BACKEND_URL}/tickets/{ticket_id}/reports")
+        # Заявка, пользователи и отчеты — одним запросом; неизменившуюся страницу бэкенд подтверждает 304
+        status_code, view = backend.get_json_cached(f"/tickets/{ticket_id}/view", token=backend_token())
         
-        if t_resp.status_code != 200:
+        if status_code != 200:
             return "Ticket Not Found", 404
             
-        return render_template('ticket_detail.html', ticket=t_resp.json(), reports=r_resp.json())
+        return render_template('ticket_detail.html', ticket=view['ticket'], reports=view['reports'])
     except Exception as e:
         # Если ты увидишь этот текст на экране, значит код ОБНОВИЛСЯ успешно
         return f"Frontend Error (v7): {str(e)}", 500
@@ -149,13 +308,23 @@ def add_report(ticket_id):
     
     comment = request.form.get('comment')
     file = request.files.get('file')
+    if file and not file.filename:
+        file = None
     
-    files = {'file': (file.filename, file.read())} if file and file.filename else None
-    data = {'comment': comment}
+    body, content_type = stream_multipart({'comment': comment}, 'file', file)
     
     try:
-        requests.post(f"{BACKEND_URL}/tickets/{ticket_id}/reports", data=data, files=files)
-        flash('Report added', 'success')
+        resp = backend.post(f"/tickets/{ticket_id}/reports", data=body,
+                            headers={'Content-Type': content_type}, timeout=(5, 300), token=backend_token())
+        if resp.status_code == 200:
+            if resp.json().get('attachment_state') == 'failed':
+                flash('Report added, but the file could not be queued for upload', 'error')
+            else:
+                flash('Report added', 'success')
+        elif resp.status_code == 413:
+            flash('File is too large', 'error')
+        else:
+            flash(f'Error adding report: {resp.text}', 'error')
     except:
         flash('Error adding report', 'error')
         
@@ -179,12 +348,12 @@ def admin():
         is_staff = True if request.form.get('is_staff') == 'on' else False
 
         try:
-            resp = requests.post(f"{BACKEND_URL}/auth/users", json={
+            resp = backend.post("/auth/users", json={
                 "username": username,
                 "password": password,
                 "is_admin": is_admin,
                 "is_staff": is_staff
-            }, timeout=5)
+            }, token=backend_token())
             
             if resp.status_code == 200:
                 flash(f'User {username} created successfully!', 'success')
@@ -195,22 +364,118 @@ def admin():
 
     return render_template('admin.html')
 
-@app.route('/media/<path:filename>')
-def serve_media(filename):
+@app.route('/admin/import', methods=['POST'])
+def import_tickets():
+    if 'user_id' not in session or not session.get('is_admin'):
+        return redirect(url_for('dashboard'))
+
+    file = request.files.get('file')
+    if not file or not file.filename:
+        flash('Choose a CSV file', 'error')
+        return redirect(url_for('admin'))
+
+    body, content_type = stream_multipart({}, 'file', file)
+    try:
+        resp = backend.post("/tickets/bulk/import/csv", data=body, headers={'Content-Type': content_type},
+                            timeout=(5, 300), token=backend_token())
+        if resp.status_code == 200:
+            result = resp.json()
+            errors = [f"row {r['index'] + 1}: {r['error']}" for r in result['results'] if not r['ok']][:5]
+            flash(f"Imported {result['succeeded']} tickets, failed: {result['failed']}"
+                  + (f" ({'; '.join(errors)})" if errors else ''), 'success' if not result['failed'] else 'error')
+        else:
+            flash(f'Import error: {resp.text}', 'error')
+    except Exception as e:
+        flash(f'Connection error: {str(e)}', 'error')
+
+    return redirect(url_for('admin'))
+
+@app.route('/export')
+def export_tickets():
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+
+    params = {
+        'format': request.args.get('format', 'csv'),
+        'include_reports': request.args.get('include_reports', 'false'),
+        'include_archived': request.args.get('include_archived', 'false'),
+        'gzip': request.args.get('gzip', 'false'),
+        **{k: request.args[k] for k in DASHBOARD_FILTERS if request.args.get(k)}
+    }
+    try:
+        resp = backend.get("/tickets/export", params=params, stream=True, timeout=(5, 300), token=backend_token())
+    except Exception as e:
+        return f"Backend unavailable: {str(e)}", 502
+    if resp.status_code != 200:
+        resp.close()
+        return "Export failed", resp.status_code
+
+    def body():
+        # Пересылаем байты как есть (в т.ч. gzip), не собирая выгрузку в памяти
+        try:
+            yield from resp.raw.stream(64 * 1024, decode_content=False)
+        finally:
+            resp.close()
+
+    return Response(stream_with_context(body()), content_type=resp.headers['Content-Type'],
+                    headers={'Content-Disposition': resp.headers['Content-Disposition']})
+
+@app.route('/events')
+def ticket_events():
+    """SSE-лента изменений заявок: проксируем поток бэкенда (сервис бэкенда снаружи не доступен)"""
     if 'user_id' not in session:
         return "Unauthorized", 401
-    
-    namespace = os.getenv('OCI_NAMESPACE')
-    bucket_name = os.getenv('OCI_BUCKET_NAME')
-    region = os.getenv('OCI_REGION', 'il-jerusalem-1')
 
-    if not namespace or not bucket_name:
-        return "Error: Cloud storage configuration is missing", 500
-    
-    oci_url = f"https://objectstorage.{region}.oraclecloud.com/n/{namespace}/b/{bucket_name}/o/{filename}"
-    return redirect(oci_url)
+    if not event_streams.acquire(blocking=False):
+        return "Too many event streams", 503
+    try:
+        # Бэкенд шлет keepalive раз в 15 секунд, так что минуты тишины — уже обрыв
+        resp = events_backend.get("/events/stream", stream=True, timeout=(3.05, 60), token=backend_token())
+    except Exception as e:
+        event_streams.release()
+        return f"Backend unavailable: {str(e)}", 502
+    if resp.status_code != 200:
+        resp.close()
+        event_streams.release()
+        return "Event stream is not available", resp.status_code
+
+    def body():
+        yield from resp.iter_content(chunk_size=None)
+
+    response = Response(stream_with_context(body()), content_type='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Вызывается при закрытии ответа, даже если клиент ушел до первого байта
+    response.call_on_close(resp.close)
+    response.call_on_close(event_streams.release)
+    return response
+
+@app.route('/media/<int:ticket_id>/<int:report_id>')
+def serve_media(ticket_id, report_id):
+    if 'user_id' not in session:
+        return "Unauthorized", 401
+
+    # Бакет приватный: бэкенд выдает подписанную ссылку (из своего кэша, если она свежая)
+    try:
+        resp = backend.get(f"/tickets/{ticket_id}/reports/{report_id}/attachment", token=backend_token())
+    except Exception as e:
+        return f"Backend unavailable: {str(e)}", 502
+    if resp.status_code != 200:
+        return "File is not available", resp.status_code
+
+    response = redirect(resp.json()['url'])
+    # Пока ссылка действительна, браузер повторно открывает файл без похода к нам
+    response.headers['Cache-Control'] = resp.headers.get('Cache-Control', 'private, no-cache')
+    return response
+
+@app.route('/internal/backend-stats')
+def backend_stats():
+    """Задержки вызовов бэкенда по эндпоинтам (только для админов)"""
+    if not session.get('is_admin'):
+        return "Forbidden", 403
+    return jsonify(backend.stats())
 
 if __name__ == '__main__':
+    # Локальный запуск; в контейнере — gunicorn с воркером gevent (gunicorn.conf.py)
     app.run(host='0.0.0.0', port=5000)
 
 
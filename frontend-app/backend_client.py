@@ -0,0 +1,141 @@
+"""
+Общий клиент бэкенда для Flask-фронтенда.
+
+Один requests.Session на процесс: keep-alive соединения переиспользуются между запросами
+страниц, у каждого вызова есть таймаут, идемпотентные GET повторяются при сетевых сбоях
+и 502/503/504, а независимые вызовы можно выполнить параллельно через gather().
+"""
+import contextvars
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+
+# /tickets/15/reports -> /tickets/{id}/reports: статистика по эндпоинтам, а не по каждой заявке
+_ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+
+class BackendClient:
+    def __init__(self, base_url, timeout=(3.05, 10), pool_size=20, retries=2, max_workers=8, etag_cache_size=256):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Внутри кластера сеть дешевле процессора: бэкенд не сжимает ответы фронтенду,
+        # фронтенду не нужно их распаковывать (наружу страницы сжимает compression.py)
+        self.session.headers['Accept-Encoding'] = 'identity'
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.2,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({'GET', 'HEAD'}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='backend')
+        self._lock = threading.Lock()
+        # path -> (ETag, JSON-тело) для условных GET; небольшой LRU
+        self._etag_cache = OrderedDict()
+        self.etag_cache_size = etag_cache_size
+        self._stats = defaultdict(lambda: {'count': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                           'recent': deque(maxlen=500)})
+
+    def request(self, method, path, timeout=None, token=None, **kwargs):
+        """token — токен сессии пользователя из /auth/login, уходит в Authorization"""
+        if token:
+            kwargs['headers'] = {**(kwargs.get('headers') or {}), 'Authorization': f'Bearer {token}'}
+        name = f"{method} {_ID_SEGMENT.sub('/{id}', path)}"
+        started = time.perf_counter()
+        error = True
+        try:
+            resp = self.session.request(method, self.base_url + path, timeout=timeout or self.timeout, **kwargs)
+            error = resp.status_code >= 500
+            return resp
+        finally:
+            self._record(name, (time.perf_counter() - started) * 1000, error)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request('PUT', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
+
+    def get_json_cached(self, path, **kwargs):
+        """
+        GET с ревалидацией: повторно отправляет сохраненный ETag в If-None-Match
+        и на 304 отдает закэшированное тело. Возвращает (status_code, json или None)
+        """
+        with self._lock:
+            cached = self._etag_cache.get(path)
+        headers = dict(kwargs.pop('headers', None) or {})
+        if cached:
+            headers['If-None-Match'] = cached[0]
+        resp = self.get(path, headers=headers, **kwargs)
+
+        if resp.status_code == 304 and cached:
+            with self._lock:
+                self._etag_cache.move_to_end(path)
+            return 200, cached[1]
+        if resp.status_code != 200:
+            with self._lock:
+                self._etag_cache.pop(path, None)
+            return resp.status_code, None
+
+        body = resp.json()
+        etag = resp.headers.get('ETag')
+        if etag:
+            with self._lock:
+                self._etag_cache[path] = (etag, body)
+                self._etag_cache.move_to_end(path)
+                while len(self._etag_cache) > self.etag_cache_size:
+                    self._etag_cache.popitem(last=False)
+        return 200, body
+
+    def gather(self, *calls):
+        """
+        Выполняет независимые вызовы параллельно: gather(lambda: client.get(a), lambda: client.get(b)).
+        Возвращает результаты в том же порядке; первое исключение пробрасывается.
+        """
+        # Копия контекста — чтобы вызовы учитывались в метриках страницы, которая их сделала
+        futures = [self._executor.submit(contextvars.copy_context().run, call) for call in calls]
+        return [future.result() for future in futures]
+
+    def _record(self, name, elapsed_ms, error):
+        metrics.observe_backend_call(name, elapsed_ms, error)
+        with self._lock:
+            stat = self._stats[name]
+            stat['count'] += 1
+            stat['errors'] += int(error)
+            stat['total_ms'] += elapsed_ms
+            stat['max_ms'] = max(stat['max_ms'], elapsed_ms)
+            stat['recent'].append(elapsed_ms)
+
+    def stats(self):
+        """Задержки по эндпоинтам; перцентили считаются по последним 500 вызовам"""
+        with self._lock:
+            result = {}
+            for name, stat in self._stats.items():
+                recent = sorted(stat['recent'])
+                result[name] = {
+                    'count': stat['count'],
+                    'errors': stat['errors'],
+                    'avg_ms': round(stat['total_ms'] / stat['count'], 2),
+                    'p50_ms': round(recent[len(recent) // 2], 2),
+                    'p95_ms': round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 2),
+                    'max_ms': round(stat['max_ms'], 2),
+                }
+            return result
@@ -0,0 +1,39 @@
+"""
+gzip-сжатие страниц по Accept-Encoding браузера (фронтенд смотрит наружу через LoadBalancer).
+
+Сжимаются готовые ответы текстовых типов от COMPRESS_MIN_BYTES; потоковые ответы
+(SSE-лента, выгрузка, вложения) отдаются как есть.
+"""
+import gzip
+import os
+
+from flask import request
+
+# 0 — сжатие выключено
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 5))
+
+COMPRESSIBLE_TYPES = ('text/html', 'text/css', 'text/plain', 'text/csv', 'application/json', 'application/javascript')
+
+
+def _accepts_gzip():
+    for item in request.headers.get('Accept-Encoding', '').lower().split(','):
+        name, _, params = item.strip().partition(';')
+        if name.strip() in ('gzip', '*'):
+            return params.strip() not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+def init_app(app):
+    @app.after_request
+    def _compress(response):
+        if (not COMPRESS_MIN_BYTES or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers or not response.mimetype.startswith(COMPRESSIBLE_TYPES)):
+            return response
+        response.vary.add('Accept-Encoding')
+        body = response.get_data()
+        if len(body) < COMPRESS_MIN_BYTES or not _accepts_gzip():
+            return response
+        response.set_data(gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+        return response
@@ -0,0 +1,17 @@
+"""
+Настройки gunicorn для фронтенда (CMD в Dockerfile).
+
+Воркер gevent: каждое соединение обслуживает гринлет, а не поток, поэтому открытые ленты
+событий (/events — SSE, живут часами) занимают только память, а страницы не ждут свободного потока.
+requests и потоки BackendClient.gather работают поверх gevent через monkey-patching воркера.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = "gevent"
+# Один процесс: метрики Prometheus (/metrics) живут в памяти процесса, масштабируемся репликами
+workers = int(os.getenv('WEB_WORKERS', 1))
+# Одновременных соединений на воркер, вместе с лентами событий (их лимит — EVENTS_MAX_STREAMS в app.py)
+worker_connections = int(os.getenv('WEB_WORKER_CONNECTIONS', 1000))
+# Даем открытым лентам закрыться при остановке пода; браузер переподключится к другой реплике
+graceful_timeout = 10
@@ -0,0 +1,99 @@
+"""
+Метрики Prometheus фронтенда (GET /metrics) и журнал медленных страниц.
+
+- страницы: гистограмма задержки и счетчик ответов по правилу маршрута Flask
+  (/ticket/<int:ticket_id>, а не по каждой заявке), число запросов в обработке;
+- вызовы бэкенда: задержка по эндпоинту бэкенда (см. backend_client.py) и их число на страницу.
+
+SLOW_REQUEST_MS > 0 включает журнал: страница дольше порога пишется в лог вместе
+с вызовами бэкенда, которые она сделала.
+"""
+import contextvars
+import hmac
+import logging
+import os
+import time
+
+from flask import Response, abort, g, request
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+logger = logging.getLogger(__name__)
+
+# 0 — журнал медленных страниц выключен
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 0))
+# Фронтенд смотрит наружу через LoadBalancer: /metrics отдается только
+# с Authorization: Bearer <METRICS_TOKEN> (bearer_token в конфиге scrape Prometheus).
+# Без токена /metrics выключен; открыт только в dev
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+APP_ENV = os.getenv('APP_ENV', 'production')
+
+HTTP_REQUESTS = Counter('http_requests_total', 'HTTP responses', ['method', 'route', 'status'])
+HTTP_LATENCY = Histogram('http_request_duration_seconds', 'HTTP request latency', ['method', 'route'],
+                         buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+HTTP_IN_FLIGHT = Gauge('http_requests_in_flight', 'HTTP requests being processed')
+BACKEND_LATENCY = Histogram('backend_request_duration_seconds', 'Backend API call latency', ['endpoint'],
+                            buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+BACKEND_ERRORS = Counter('backend_request_errors_total', 'Backend API calls that failed or returned 5xx',
+                         ['endpoint'])
+BACKEND_CALLS_PER_REQUEST = Histogram('http_request_backend_calls', 'Backend API calls per page', ['route'],
+                                      buckets=(0, 1, 2, 3, 5, 10, 20))
+
+# Вызовы бэкенда текущей страницы: [(эндпоинт, мс)]. Вызовы из BackendClient.gather
+# выполняются в других потоках с копией контекста и пишут в тот же список
+_request_calls = contextvars.ContextVar('request_calls', default=None)
+
+
+def observe_backend_call(name, elapsed_ms, error):
+    BACKEND_LATENCY.labels(name).observe(elapsed_ms / 1000)
+    if error:
+        BACKEND_ERRORS.labels(name).inc()
+    calls = _request_calls.get()
+    if calls is not None:
+        calls.append((name, round(elapsed_ms, 1)))
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+def init_app(app):
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+        _request_calls.set([])
+        HTTP_IN_FLIGHT.inc()
+
+    @app.after_request
+    def _record(response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        HTTP_IN_FLIGHT.dec()
+        elapsed = time.perf_counter() - started
+        calls = _request_calls.get() or []
+        route = _route()
+        HTTP_REQUESTS.labels(request.method, route, str(response.status_code)).inc()
+        HTTP_LATENCY.labels(request.method, route).observe(elapsed)
+        BACKEND_CALLS_PER_REQUEST.labels(route).observe(len(calls))
+        if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+            logger.warning('Slow request %s %s -> %s in %.0f ms, %d backend calls:\n%s',
+                           request.method, request.path, response.status_code, elapsed * 1000, len(calls),
+                           '\n'.join(f'  [{ms} ms] {name}' for name, ms in calls) or '  (no backend calls)')
+        return response
+
+    @app.teardown_request
+    def _release(exc):
+        # after_request не вызывается, если обработчик упал с исключением
+        if g.pop('metrics_started', None) is not None:
+            HTTP_IN_FLIGHT.dec()
+            HTTP_REQUESTS.labels(request.method, _route(), '500').inc()
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        if not METRICS_TOKEN:
+            if APP_ENV != 'dev':
+                abort(404)
+        elif not hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                     f'Bearer {METRICS_TOKEN}'.encode()):
+            abort(401)
+        return Response(generate_latest(), content_type=CONTENT_TYPE_LATEST)